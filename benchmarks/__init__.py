@@ -0,0 +1 @@
+"""Performance measurements, run with `python -m benchmarks.<name>`"""
@@ -0,0 +1,78 @@
+"""
+Times working out change against the budget a purchase can spend on
+it: a repeated question answered from the cache, greedy change from a
+well stocked machine, and the search a machine running short of some
+denominations falls back to. Exits with 1 if any of them goes over.
+
+    python -m benchmarks.change --calls 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict
+
+from vending_machine.core import change
+from vending_machine.core.change import FLOAT, make_change
+
+BUDGET_MICROSECONDS = 50
+
+# Out of $5 bills, $1 bills and nickels, so most amounts need the search.
+SHORT = {**FLOAT, 500: 0, 100: 0, 5: 0}
+
+
+def microseconds_per_call(
+    calls: int, coins: Dict[int, int], cached: bool = False
+) -> float:
+    """
+    Average time make_change takes for amounts up to $20.
+    """
+
+    amounts = [1 + index * 7919 % 2000 for index in range(calls)]
+    if cached:
+        for amount in amounts:
+            make_change(amount, coins)
+    clear: Callable[[], None] = (
+        (lambda: None) if cached else change._make_change.cache_clear
+    )  # pylint: disable=protected-access
+
+    started = time.perf_counter()
+    for amount in amounts:
+        clear()
+        make_change(amount, coins)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def run(calls: int) -> dict:  # pylint: disable=missing-docstring
+    results = {
+        "cached": microseconds_per_call(calls, FLOAT, cached=True),
+        "greedy": microseconds_per_call(calls, FLOAT),
+        "search": microseconds_per_call(calls, SHORT),
+    }
+
+    return {
+        "calls": calls,
+        "budget_microseconds": BUDGET_MICROSECONDS,
+        "microseconds_per_call": {
+            name: round(micros, 2) for name, micros in results.items()
+        },
+        "within_budget": all(
+            micros <= BUDGET_MICROSECONDS for micros in results.values()
+        ),
+    }
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    results = run(args.calls)
+    print(json.dumps(results))
+    if not results["within_budget"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
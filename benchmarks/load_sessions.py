@@ -0,0 +1,83 @@
+"""
+Load test for the asyncio session server. Opens a few thousand customer
+sessions at once against an in-process server, has every one of them
+deposit, buy something and collect change, and reports throughput.
+
+    python -m benchmarks.load_sessions --connections 2000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import time
+
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.server.sessions import SessionClient, SessionServer
+
+
+def raise_file_limit(connections: int) -> None:
+    """
+    Every session needs a socket on both ends, so make sure the process
+    is allowed to have that many open.
+    """
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, 2 * connections + 100))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+async def customer(port: int, rounds: int) -> int:
+    """
+    One customer keeping their session open for every round.
+    :return: Number of requests made
+    """
+
+    client = await SessionClient.connect("127.0.0.1", port)
+    for _ in range(rounds):
+        await client.send(op="deposit", amount="2")
+        await client.send(op="purchase", position="A1")
+        await client.send(op="dispense")
+    await client.close()
+
+    return 3 * rounds
+
+
+async def run(
+    connections: int, rounds: int
+) -> dict:  # pylint: disable=missing-docstring
+    machine = VendingMachine(stock=connections * rounds)
+    server = SessionServer(machine)
+    listening = await server.start("127.0.0.1", 0)
+    port = listening.sockets[0].getsockname()[1]
+
+    started = time.perf_counter()
+    requests = await asyncio.gather(
+        *(customer(port, rounds) for _ in range(connections))
+    )
+    elapsed = time.perf_counter() - started
+
+    listening.close()
+    await listening.wait_closed()
+
+    return {
+        "connections": connections,
+        "requests": sum(requests),
+        "purchases": len(machine.purchases),
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(sum(requests) / elapsed),
+    }
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    raise_file_limit(args.connections)
+    print(json.dumps(asyncio.run(run(args.connections, args.rounds))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Measures how many bytes each purchase in a machine's history takes,
+comparing a list of objects like purchases used to be (a __dict__, their
+own position string and a Decimal price) against the array backed
+PurchaseLog.
+
+    python -m benchmarks.memory --purchases 1000000
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Callable
+
+from vending_machine.core.purchase import Purchase, PurchaseLog
+from vending_machine.utils.money import Money
+
+
+class DictPurchase:  # pylint: disable=too-few-public-methods
+    """
+    Purchase as it was before, with a per instance __dict__.
+    """
+
+    def __init__(self, position: str, price: Decimal, timestamp: float):
+        self.position = position
+        self.price = price
+        self.timestamp = timestamp
+
+
+def dumped_purchases(count: int):
+    """
+    Purchases the way they come out of a state file: every one of them
+    parsed into its own strings.
+    """
+
+    started = time.time()
+    positions = [f"{column}{row}" for column in "ABC" for row in range(1, 6)]
+    for index in range(count):
+        yield {
+            "position": "".join(positions[index % len(positions)]),
+            "price": "".join(["1.", "75"]),
+            "timestamp": started + index,
+        }
+
+
+def before(count: int) -> list:  # pylint: disable=missing-docstring
+    return [
+        DictPurchase(dumped["position"], Decimal(dumped["price"]), dumped["timestamp"])
+        for dumped in dumped_purchases(count)
+    ]
+
+
+def after(count: int) -> PurchaseLog:  # pylint: disable=missing-docstring
+    log = PurchaseLog()
+    for dumped in dumped_purchases(count):
+        log.append(
+            Purchase(
+                dumped["position"], Money.parse(dumped["price"]), dumped["timestamp"]
+            )
+        )
+    return log
+
+
+def bytes_per_purchase(build: Callable[[int], object], count: int) -> float:
+    """
+    Memory still held by what build returned, divided by count.
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    built = build(count)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+
+    return size / count
+
+
+def run(purchases: int) -> dict:  # pylint: disable=missing-docstring
+    before_bytes = bytes_per_purchase(before, purchases)
+    after_bytes = bytes_per_purchase(after, purchases)
+
+    return {
+        "purchases": purchases,
+        "before_bytes_per_purchase": round(before_bytes, 1),
+        "after_bytes_per_purchase": round(after_bytes, 1),
+        "reduction": round(before_bytes / after_bytes, 2),
+    }
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--purchases", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.purchases)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compares keeping money as integer cents (Money) against the Decimal
+arithmetic balances used to go through: rounding the balance with
+to_money on every read, comparing and subtracting Decimals on purchase
+and stringifying them to save.
+
+    python -m benchmarks.money --purchases 200000
+"""
+
+import argparse
+import json
+import time
+from decimal import Decimal
+
+from vending_machine.core.exceptions import InsufficientFundsError, OutOfStockError
+from vending_machine.core.item import Item
+from vending_machine.core.purchase import Purchase
+from vending_machine.utils.money import Money, to_money
+
+
+class DecimalItem:
+    """
+    Item.purchase as it was when prices and balances were Decimals.
+    """
+
+    def __init__(self, price: Decimal, remaining_stock: int):
+        self.price = price
+        self.remaining_stock = remaining_stock
+
+    def purchase(
+        self, balance: Decimal
+    ) -> Decimal:  # pylint: disable=missing-docstring
+        if self.remaining_stock <= 0:
+            raise OutOfStockError()
+        if balance < self.price:
+            raise InsufficientFundsError()
+        self.remaining_stock -= 1
+        return balance - self.price
+
+
+def decimal_purchases(count: int) -> float:
+    """
+    The previous hot path: every purchase read the balance rounded by
+    to_money and paid with Decimals.
+    :return: Seconds taken
+    """
+
+    item = DecimalItem(Decimal("1.75"), count)
+    balance = item.price * count
+    started = time.perf_counter()
+    for _ in range(count):
+        balance = item.purchase(to_money(balance))
+    return time.perf_counter() - started
+
+
+def money_purchases(count: int) -> float:
+    """
+    Purchases through Item.purchase with balances kept in cents.
+    :return: Seconds taken
+    """
+
+    item = Item("Gatorade (Blue)", Money(175), count)
+    balance = item.price * count
+    started = time.perf_counter()
+    for _ in range(count):
+        balance = item.purchase(balance)
+    return time.perf_counter() - started
+
+
+def decimal_serialization(count: int) -> float:
+    """
+    Dumping purchases whose prices were Decimals.
+    :return: Seconds taken
+    """
+
+    price = Decimal("1.75")
+    purchases = [("A1", price) for _ in range(count)]
+    started = time.perf_counter()
+    json.dumps(
+        [
+            {"position": position, "price": str(to_money(price))}
+            for position, price in purchases
+        ]
+    )
+    return time.perf_counter() - started
+
+
+def money_serialization(count: int) -> float:
+    """
+    Dumping purchases through Purchase.to_json. Purchases share their
+    item's price, so its text only gets formatted once.
+    :return: Seconds taken
+    """
+
+    price = Money(175)
+    purchases = [Purchase("A1", price) for _ in range(count)]
+    started = time.perf_counter()
+    json.dumps([purchase.to_json() for purchase in purchases])
+    return time.perf_counter() - started
+
+
+def run(purchases: int) -> dict:  # pylint: disable=missing-docstring
+    results = {"purchases": purchases}
+    for name, decimal_run, money_run in (
+        ("purchase", decimal_purchases, money_purchases),
+        ("serialize", decimal_serialization, money_serialization),
+    ):
+        decimal_seconds = min(decimal_run(purchases) for _ in range(3))
+        money_seconds = min(money_run(purchases) for _ in range(3))
+        results[name] = {
+            "decimal_seconds": round(decimal_seconds, 4),
+            "money_seconds": round(money_seconds, 4),
+            "speedup": round(decimal_seconds / money_seconds, 2),
+        }
+
+    return results
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--purchases", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.purchases)))
+
+
+if __name__ == "__main__":
+    main()
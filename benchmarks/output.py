@@ -0,0 +1,110 @@
+"""
+Times listing every slot of a large machine the way view_items used to
+print (one formatted_print per line, each formatting its own timestamp,
+written and flushed on its own), the buffered way it prints now, and
+with writing handed to a background thread. For the background thread,
+both the time view_items takes to return and the time until everything
+is written are reported.
+
+Output goes to a file, with every write made to take --write-latency
+seconds on top, like a slow terminal or a pipe nobody's reading fast.
+
+    python -m benchmarks.output --slots 10000 --write-latency 0.0001
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.suite import build_machine
+from vending_machine.ui.printer import formatted_print
+from vending_machine.utils import GLOBAL_LOGGER
+from vending_machine.utils.logger import (
+    BackgroundHandler,
+    _swap_handler,
+    stdout_handler,
+)
+
+
+class SlowStream:
+    """
+    Writes to file, taking latency seconds longer every time.
+    """
+
+    def __init__(self, file, latency: float):
+        self.file = file
+        self.latency = latency
+
+    def write(self, text: str) -> None:  # pylint: disable=missing-docstring
+        time.sleep(self.latency)
+        self.file.write(text)
+
+    def flush(self) -> None:  # pylint: disable=missing-docstring
+        self.file.flush()
+
+
+def per_line(machine) -> None:
+    """
+    view_items as it was, one logger call, strftime and flush per slot.
+    """
+
+    items = machine.items
+    for position in machine.grid.find():
+        item = items[position]
+        formatted_print(
+            "{}: {} costs {}, and there are {} units in stock.".format(
+                position, item.name, item.price, item.remaining_stock
+            )
+        )
+        # Formatting the timestamp every line, like it used to.
+        time.strftime("%H:%M:%S")
+
+
+def timed(run: Callable[[], object]) -> float:  # pylint: disable=missing-docstring
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def run(slots: int, write_latency: float) -> dict:  # pylint: disable=missing-docstring
+    machine = build_machine(slots, 0)
+    results = {"slots": slots, "write_latency": write_latency}
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "output.txt"), "w") as file:
+            stream = stdout_handler.setStream(SlowStream(file, write_latency))
+            try:
+                results["per_line_seconds"] = timed(lambda: per_line(machine))
+                results["buffered_seconds"] = timed(machine.view_items)
+
+                background = BackgroundHandler(stdout_handler)
+                _swap_handler(GLOBAL_LOGGER, stdout_handler, background)
+                started = time.perf_counter()
+                machine.view_items()
+                results["background_return_seconds"] = time.perf_counter() - started
+                background.close()
+                results["background_written_seconds"] = time.perf_counter() - started
+                _swap_handler(GLOBAL_LOGGER, background, stdout_handler)
+            finally:
+                stdout_handler.setStream(stream)
+
+    return {
+        key: round(value, 4) if isinstance(value, float) else value
+        for key, value in results.items()
+    }
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slots", type=int, default=10_000)
+    parser.add_argument("--write-latency", type=float, default=0.0001)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.slots, args.write_latency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures peak memory while restocking from manifests of growing size,
+which should stay flat since rows are streamed and folded per slot
+rather than read in whole.
+
+    python -m benchmarks.restock --rows 1000000
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from vending_machine.core.manifest import read_manifest
+from vending_machine.core.vending_machine import VendingMachine
+
+
+def write_manifest(path: str, rows: int) -> None:
+    """
+    Writes a CSV manifest topping up every slot of a default machine in
+    turn, rows times in all.
+    """
+
+    items = list(VendingMachine().items.items())
+    with open(path, "w", newline="") as file:
+        file.write("position,name,price,quantity\n")
+        for index in range(rows):
+            position, item = items[index % len(items)]
+            file.write(f"{position},{item.name},{item.price},1\n")
+
+
+def restock(path: str) -> dict:
+    """
+    Restocks a default machine from the manifest at path, returning the
+    time it takes and the peak memory along the way.
+    """
+
+    started = time.perf_counter()
+    with open(path, newline="") as file:
+        VendingMachine().restock(read_manifest(file))
+    seconds = time.perf_counter() - started
+
+    # Tracing slows everything down, so memory gets its own run.
+    tracemalloc.start()
+    with open(path, newline="") as file:
+        VendingMachine().restock(read_manifest(file))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": round(seconds, 3), "peak_bytes": peak}
+
+
+def run(rows: int) -> dict:  # pylint: disable=missing-docstring
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "manifest.csv")
+        for count in (rows // 100, rows):
+            write_manifest(path, count)
+            results[str(count)] = restock(path)
+
+    return {"rows": results}
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(json.dumps(run(args.rows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Times how long the CLI takes to start against its budget: the wall time
+of `python -m vending_machine view-balance` and `--help` over a bare
+interpreter, and how long importing the CLI takes according to
+`-X importtime`. Exits with 1 if any of them goes over.
+
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from vending_machine import PROJECT_ROOT
+
+# Milliseconds on top of starting a bare interpreter.
+BUDGET_MILLISECONDS = {"view-balance": 80, "--help": 60, "import": 45}
+
+COMMANDS = ("view-balance", "--help")
+
+CACHE = os.path.join(tempfile.gettempdir(), "vending-machine-startup")
+
+
+def environment() -> dict:
+    """
+    The environment the CLI runs in, writing bytecode somewhere so every
+    run after the first uses it, like an installed package would.
+    """
+
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=CACHE)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def best_of(runs: int, arguments: List[str]) -> float:
+    """
+    The fastest wall time in milliseconds out of runs of the interpreter
+    with arguments.
+    """
+
+    timings = []
+    for _ in range(runs + 1):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *arguments],
+            cwd=PROJECT_ROOT,
+            env=environment(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    # The first run writes the bytecode.
+    return min(timings[1:])
+
+
+def import_milliseconds(runs: int) -> float:
+    """
+    The fastest time importing the CLI module takes, as `-X importtime`
+    reports it, leaving out what the interpreter imports on its own.
+    """
+
+    timings = []
+    for _ in range(runs + 1):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                "import vending_machine.__main__",
+            ],
+            cwd=PROJECT_ROOT,
+            env=environment(),
+            stderr=subprocess.PIPE,
+            check=True,
+            universal_newlines=True,
+        ).stderr
+        microseconds = 0
+        for line in output.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].startswith(" vending_machine"):
+                microseconds += int(fields[1])
+        timings.append(microseconds / 1000)
+    return min(timings[1:])
+
+
+def run(runs: int) -> dict:  # pylint: disable=missing-docstring
+    baseline = best_of(runs, ["-c", "pass"])
+    results = {
+        command: best_of(runs, ["-m", "vending_machine", command]) - baseline
+        for command in COMMANDS
+    }
+    results["import"] = import_milliseconds(runs)
+
+    return {
+        "runs": runs,
+        "baseline_milliseconds": round(baseline, 1),
+        "budget_milliseconds": BUDGET_MILLISECONDS,
+        "milliseconds": {name: round(millis, 1) for name, millis in results.items()},
+        "within_budget": all(
+            millis <= BUDGET_MILLISECONDS[name] for name, millis in results.items()
+        ),
+    }
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    print(json.dumps(results))
+    if not results["within_budget"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
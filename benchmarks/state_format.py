@@ -0,0 +1,97 @@
+"""
+Compares saving and loading a machine with a long purchase history as
+one JSON document (json.dump of to_json, json.load and from_json)
+against the binary snapshot format.
+
+    python -m benchmarks.state_format --purchases 1000000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from array import array
+from typing import Callable
+
+from vending_machine.core.purchase import PurchaseLog
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage.binary import BinaryReader, write_binary
+
+
+def build_machine(purchases: int) -> VendingMachine:
+    """
+    A machine with the given number of purchases spread over its slots.
+    """
+
+    machine = VendingMachine(stock=purchases)
+    positions = list(machine.items)
+    started = time.time()
+    log = PurchaseLog.from_columns(
+        positions,
+        array("I", (index % len(positions) for index in range(purchases))),
+        array(
+            "q",
+            (
+                machine.items[positions[index % len(positions)]].price.cents
+                for index in range(purchases)
+            ),
+        ),
+        array("d", (started + index for index in range(purchases))),
+    )
+    machine.purchases = log
+    return machine
+
+
+def timed(run: Callable[[], object]) -> float:  # pylint: disable=missing-docstring
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def run(purchases: int) -> dict:  # pylint: disable=missing-docstring
+    machine = build_machine(purchases)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "state.json")
+        binary_path = os.path.join(directory, "state.bin")
+
+        def save_json():
+            with open(json_path, "w") as file:
+                file.write(json.dumps(machine.to_json()))
+
+        def load_json():
+            with open(json_path) as file:
+                return VendingMachine.from_json(json.load(file))
+
+        results = {
+            "purchases": purchases,
+            "json_save_seconds": timed(save_json),
+            "json_load_seconds": timed(load_json),
+            "binary_save_seconds": timed(lambda: write_binary(binary_path, machine)),
+            "binary_load_seconds": timed(lambda: BinaryReader(binary_path).machine()),
+            "json_bytes": os.path.getsize(json_path),
+            "binary_bytes": os.path.getsize(binary_path),
+        }
+
+    for step in ("save", "load"):
+        results[f"{step}_speedup"] = (
+            results[f"json_{step}_seconds"] / results[f"binary_{step}_seconds"]
+        )
+
+    return {
+        key: round(value, 4) if isinstance(value, float) else value
+        for key, value in results.items()
+    }
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--purchases", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.purchases)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Times the core operations on machines from 15 to 10,000 slots with
+purchase histories from none to a million: loading and dumping the
+machine (from_json, to_json), purchase_item, deposit, view_items with
+and without filters, and paging through view_purchases.
+
+Results are written as JSON, one entry per machine size, purchase count
+and operation. Given the results of another revision with --baseline,
+every operation that got slower by more than --tolerance is listed and
+the run exits with 1. Timings are only comparable between runs on the
+same, otherwise idle, computer.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import string
+import subprocess
+import sys
+import time
+from array import array
+from decimal import Decimal
+from itertools import product
+from typing import Callable, Dict, List, Optional
+
+from vending_machine import PROJECT_ROOT
+from vending_machine.core.item import Item
+from vending_machine.core.purchase import PurchaseLog
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.utils.logger import stdout_handler
+
+SLOTS = (15, 1000, 10_000)
+PURCHASES = (0, 10_000, 1_000_000)
+
+# Operations are called over and over until they've run for this long,
+# to time the fast ones over many calls, and that's done ROUNDS times
+# keeping the fastest, to leave out what else the computer was doing.
+SECONDS_PER_ROUND = 0.1
+ROUNDS = 3
+
+# Purchases listed per page of view_purchases.
+PAGE = 100
+
+
+def columns(count: int) -> List[str]:
+    """
+    The first count column names, A to Z then AA, AB and so on.
+    """
+
+    names: List[str] = []
+    length = 1
+    while len(names) < count:
+        names.extend(
+            "".join(letters)
+            for letters in product(string.ascii_uppercase, repeat=length)
+        )
+        length += 1
+    return names[:count]
+
+
+def build_machine(slots: int, purchases: int) -> VendingMachine:
+    """
+    A machine with the given number of slots, laid out about as wide as
+    it's tall, and purchases spread over them.
+    """
+
+    rows = max(1, int(slots ** 0.5))
+    positions = [
+        f"{column}{row}"
+        for column in columns(-(-slots // rows))
+        for row in range(1, rows + 1)
+    ][:slots]
+    catalog = VendingMachine.vending_machine_items
+    items = {}
+    for index, position in enumerate(positions):
+        stocked = catalog[index % len(catalog)]
+        items[position] = Item(stocked["name"], stocked["price"], 1_000_000)
+
+    started = time.time()
+    log = PurchaseLog.from_columns(
+        positions,
+        array("I", (index % slots for index in range(purchases))),
+        array(
+            "q",
+            (items[positions[index % slots]].price.cents for index in range(purchases)),
+        ),
+        array("d", (started + index for index in range(purchases))),
+    )
+    machine = VendingMachine(items=items, purchases=log)
+    # Works out the sales aggregates up front rather than in whichever
+    # operation happens to need them first.
+    machine.sales  # pylint: disable=pointless-statement
+    return machine
+
+
+def seconds_per_call(operation: Callable[[], object]) -> Dict[str, float]:
+    """
+    Time the operation takes per call in the fastest of ROUNDS rounds,
+    each calling it until it's run for SECONDS_PER_ROUND (and at least
+    once).
+    """
+
+    fastest = None
+    # Like timeit, without collections kicking in partway through.
+    gc.collect()
+    gc.disable()
+    for _ in range(ROUNDS):
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            operation()
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= SECONDS_PER_ROUND:
+                break
+        if fastest is None or elapsed / calls < fastest["seconds_per_call"]:
+            fastest = {"calls": calls, "seconds_per_call": elapsed / calls}
+    gc.enable()
+    return fastest
+
+
+def operations(machine: VendingMachine) -> Dict[str, Callable[[], object]]:
+    """
+    The operations timed on a machine, by name.
+    """
+
+    dumped = machine.to_json()
+    first = next(iter(machine.items))
+    column, row = next(iter(machine.grid.by_coordinates))
+    purchases = len(machine.purchases)
+    machine.deposit(Decimal("1000000"))
+
+    return {
+        "from_json": lambda: VendingMachine.from_json(dumped),
+        "to_json": machine.to_json,
+        "purchase_item": lambda: machine.purchase_item(first),
+        "deposit": lambda: machine.deposit(Decimal("1.00")),
+        "view_items": machine.view_items,
+        "view_items_column": lambda: machine.view_items(column=column),
+        "view_items_row": lambda: machine.view_items(row=row),
+        "view_items_slot": lambda: machine.view_items(column=column, row=row),
+        "view_purchases_first_page": lambda: machine.view_purchases(limit=PAGE),
+        "view_purchases_last_page": lambda: machine.view_purchases(
+            offset=max(0, purchases - PAGE), limit=PAGE
+        ),
+    }
+
+
+def revision() -> Optional[str]:
+    """
+    The git commit being measured, if there is one.
+    """
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            universal_newlines=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    slots: List[int], purchases: List[int]
+) -> dict:  # pylint: disable=missing-docstring
+    results = []
+    for slot_count, purchase_count in product(slots, purchases):
+        machine = build_machine(slot_count, purchase_count)
+        for name, operation in operations(machine).items():
+            results.append(
+                {
+                    "slots": slot_count,
+                    "purchases": purchase_count,
+                    "operation": name,
+                    **seconds_per_call(operation),
+                }
+            )
+
+    return {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> List[dict]:
+    """
+    The operations in results that take more than tolerance (a fraction)
+    longer than they did in baseline.
+    """
+
+    def key(result: dict) -> tuple:
+        return result["slots"], result["purchases"], result["operation"]
+
+    before = {key(result): result for result in baseline["results"]}
+    slower = []
+    for result in results["results"]:
+        previous = before.get(key(result))
+        if previous is None:
+            continue
+        ratio = result["seconds_per_call"] / previous["seconds_per_call"]
+        if ratio > 1 + tolerance:
+            slower.append(
+                {
+                    "slots": result["slots"],
+                    "purchases": result["purchases"],
+                    "operation": result["operation"],
+                    "ratio": round(ratio, 2),
+                }
+            )
+    return slower
+
+
+def sizes(value: str) -> List[int]:  # pylint: disable=missing-docstring
+    return [int(size) for size in value.split(",")]
+
+
+def main():  # pylint: disable=missing-docstring
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--slots", type=sizes, default=list(SLOTS))
+    parser.add_argument("--purchases", type=sizes, default=list(PURCHASES))
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline", help="results of a revision to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # Output goes nowhere rather than being switched off, which would let
+    # the listings skip formatting their lines and time nothing.
+    with open(os.devnull, "w") as null:
+        stream = stdout_handler.setStream(null)
+        try:
+            results = run(args.slots, args.purchases)
+        finally:
+            stdout_handler.setStream(stream)
+    if args.baseline:
+        with open(args.baseline) as file:
+            results["regressions"] = regressions(
+                results, json.load(file), args.tolerance
+            )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    print(json.dumps(results))
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,32 @@
+import json
 import os
+import subprocess
+import sys
 
 import pytest
 from click.testing import CliRunner
 
-from vending_machine import STATE_FILE_LOCATION
+import vending_machine
+from vending_machine import STATE_FILE_LOCATION, JOURNAL_FILE_LOCATION, PROJECT_ROOT
 from vending_machine.__main__ import (
+    cli,
     start,
     destroy,
     view_items,
     view_balance,
     add_money,
     dispense_change,
+    compact,
+    convert,
+    view_purchases,
+    purchase,
+    restock,
+    view_coins,
 )
+from vending_machine.storage import JsonStorage
+from vending_machine.storage.binary import is_binary
+from vending_machine.storage.durability import remove_backups
+from vending_machine.ui import printer
 
 
 @pytest.fixture
@@ -21,13 +36,16 @@ def reset_state():
     and after every run, to make sure that tests run in isolation.
     """
 
-    if os.path.isfile(STATE_FILE_LOCATION):
-        os.remove(STATE_FILE_LOCATION)
+    for path in (STATE_FILE_LOCATION, JOURNAL_FILE_LOCATION):
+        if os.path.isfile(path):
+            os.remove(path)
 
     yield None
 
-    if os.path.isfile(STATE_FILE_LOCATION):
-        os.remove(STATE_FILE_LOCATION)
+    remove_backups(STATE_FILE_LOCATION)
+    for path in (STATE_FILE_LOCATION, JOURNAL_FILE_LOCATION):
+        if os.path.isfile(path):
+            os.remove(path)
 
 
 @pytest.fixture
@@ -140,6 +158,23 @@ def test_view_items_prints_messages_from_position(
     assert result.exit_code == 0
 
 
+def test_view_items_rejects_invalid_position(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Tests to make sure positions that aren't on the machine, including
+    ones with multi-digit rows, log an error instead of a different slot.
+    """
+
+    runner.invoke(start)
+    for position in ["A10", "nonsense"]:
+        caplog.clear()
+        result = runner.invoke(view_items, ["-p", position])
+        assert len(caplog.records) == 1
+        assert "isn't a slot" in caplog.text
+        assert result.exit_code == 0
+
+
 def test_deposit_money(
     runner, reset_state, caplog
 ):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
@@ -202,3 +237,415 @@ def test_dispense_change(
     assert result.exit_code == 0
     assert len(caplog.records) == 1
     assert "0.00" in caplog.text
+
+
+def test_journal_backend_keeps_balance(
+    runner, reset_state, caplog, monkeypatch
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures that with the journal backend, deposits get
+    appended to the journal and are visible to the next command.
+    """
+
+    monkeypatch.setattr(vending_machine, "STORAGE_BACKEND", "journal")
+
+    result = runner.invoke(start)
+    result = runner.invoke(add_money, ["10"])
+    assert os.path.isfile(JOURNAL_FILE_LOCATION)
+    caplog.clear()
+
+    result = runner.invoke(view_balance)
+    assert result.exit_code == 0
+    assert "10.00" in caplog.text
+
+    result = runner.invoke(destroy)
+    assert not os.path.isfile(JOURNAL_FILE_LOCATION)
+
+
+def test_compact_folds_journal(
+    runner, reset_state, caplog, monkeypatch
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures the compact command folds the journal into the
+    snapshot and reports what it did.
+    """
+
+    monkeypatch.setattr(vending_machine, "STORAGE_BACKEND", "journal")
+
+    result = runner.invoke(start)
+    result = runner.invoke(add_money, ["10"])
+    caplog.clear()
+
+    result = runner.invoke(compact)
+    assert result.exit_code == 0
+    assert "Folded 1 journal records" in caplog.text
+    assert not os.path.isfile(JOURNAL_FILE_LOCATION)
+
+
+def test_convert_switches_state_format(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures convert rewrites the state file in the requested
+    format, and the other commands keep reading it either way.
+    """
+
+    runner.invoke(start)
+    runner.invoke(add_money, ["10"])
+
+    result = runner.invoke(convert, ["binary"])
+    assert result.exit_code == 0
+    assert is_binary(STATE_FILE_LOCATION)
+
+    caplog.clear()
+    runner.invoke(view_balance)
+    assert "10.00" in caplog.text
+
+    runner.invoke(convert, ["json"])
+    assert not is_binary(STATE_FILE_LOCATION)
+
+
+def test_damaged_state_falls_back_to_last_good_copy(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures a state file damaged by a crash gets swapped for
+    the last good copy, and the user gets told about it.
+    """
+
+    runner.invoke(start)
+    runner.invoke(add_money, ["10"])
+    runner.invoke(add_money, ["5"])
+    os.truncate(STATE_FILE_LOCATION, os.path.getsize(STATE_FILE_LOCATION) - 10)
+
+    caplog.clear()
+    result = runner.invoke(view_balance)
+    assert result.exit_code == 0
+    assert "last good copy" in caplog.text
+    assert "10.00" in caplog.text
+
+
+def test_damaged_purchases_are_an_error_not_a_traceback(
+    runner, reset_state
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures purchases found damaged partway through a command
+    come out as an error, with the last good copy put back for the next.
+    """
+
+    runner.invoke(start)
+    runner.invoke(add_money, ["10"])
+    runner.invoke(purchase, ["A1"])
+    runner.invoke(purchase, ["B1"])
+    with open(STATE_FILE_LOCATION, "r+b") as file:
+        file.seek(-5, os.SEEK_END)
+        file.write(b"!")
+
+    result = runner.invoke(cli, ["add-money", "1"])
+    assert result.exit_code == 1
+    assert "purchases section" in result.output
+    assert not isinstance(result.exception, ValueError)
+
+    assert runner.invoke(cli, ["view-purchases"]).exit_code == 0
+
+
+@pytest.mark.parametrize("backend", ["json", "journal"])
+def test_parallel_commands_lose_no_deposits(
+    reset_state, backend
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures add-money commands running in parallel, alongside
+    read-only commands, all end up in the balance.
+    """
+
+    environment = dict(os.environ, VENDING_MACHINE_STORAGE=backend)
+
+    def run(*argv):
+        return subprocess.Popen(
+            [sys.executable, "-m", "vending_machine", *argv],
+            cwd=PROJECT_ROOT,
+            env=environment,
+            stdout=subprocess.DEVNULL,
+        )
+
+    assert run("start").wait() == 0
+    commands = [run("add-money", "1") for _ in range(12)]
+    commands += [run("view-balance") for _ in range(4)]
+    assert all(command.wait() == 0 for command in commands)
+
+    output = subprocess.run(
+        [sys.executable, "-m", "vending_machine", "view-balance"],
+        cwd=PROJECT_ROOT,
+        env=environment,
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    assert b"12.00" in output
+
+
+def test_purchase_buys_whole_order_with_one_save(
+    runner, reset_state, caplog, monkeypatch
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures purchase buys every position given, saving the
+    machine once, and buys nothing if the order can't be covered.
+    """
+
+    runner.invoke(start)
+    runner.invoke(add_money, ["5"])
+
+    saves = []
+    save = JsonStorage.save
+    monkeypatch.setattr(
+        JsonStorage, "save", lambda self, machine: saves.append(save(self, machine))
+    )
+
+    caplog.clear()
+    result = runner.invoke(purchase, ["a1", "B2", "B2"])
+    assert result.exit_code == 0
+    assert "SUCCESS" in caplog.text
+    assert len(saves) == 1
+
+    caplog.clear()
+    runner.invoke(purchase, ["A1", "A1", "A1"])
+    assert "Nothing was purchased" in caplog.text
+    assert len(saves) == 1
+
+    caplog.clear()
+    runner.invoke(view_balance)
+    assert "2.25" in caplog.text
+
+
+def test_view_purchases_accepts_paging(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures view-purchases accepts its paging options.
+    """
+
+    result = runner.invoke(start)
+    caplog.clear()
+
+    result = runner.invoke(
+        view_purchases, ["--limit", "5", "--offset", "2", "--since", "2019-10-01"]
+    )
+    assert result.exit_code == 0
+    assert len(caplog.records) == 1
+
+
+@pytest.mark.parametrize("option", ["--limit", "--offset"])
+def test_view_purchases_rejects_negative_paging(
+    runner, reset_state, option
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures negative paging options are a usage error.
+    """
+
+    runner.invoke(start)
+
+    result = runner.invoke(view_purchases, [option, "-1"])
+    assert result.exit_code == 2
+    assert "-1" in result.output
+
+
+def test_restock_from_manifest(
+    runner, reset_state, caplog, tmp_path
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures restock applies a manifest's rows for this machine,
+    and leaves the machine alone when one of them is invalid.
+    """
+
+    runner.invoke(start)
+    manifest = tmp_path / "fleet.ndjson"
+    manifest.write_text(
+        '{"machine": "lobby", "position": "A1", "name": "Gatorade (Blue)", '
+        '"price": "2.00", "quantity": 5}\n'
+        '{"machine": "annex", "position": "A1", "name": "Water", '
+        '"price": "1.00", "quantity": 5}\n'
+    )
+
+    caplog.clear()
+    result = runner.invoke(restock, [str(manifest), "--machine", "lobby"])
+    assert result.exit_code == 0
+    assert "Restocked 1 slots from 1 manifest rows." in caplog.text
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text("position,name,price,quantity\nA1,Water,1.00,lots\n")
+    caplog.clear()
+    runner.invoke(restock, [str(bad)])
+    assert "Nothing was restocked." in caplog.text
+
+    caplog.clear()
+    runner.invoke(view_items, ["-c", "A", "-r", "1"])
+    assert "Gatorade (Blue) costs 2.00, and there are 8 units in stock." in caplog.text
+
+
+def test_view_coins_follows_deposits_and_change(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures view-coins lists what the machine holds, with
+    deposits added and change taken out.
+    """
+
+    runner.invoke(start)
+    runner.invoke(add_money, ["20"])
+    runner.invoke(purchase, ["A1"])
+    runner.invoke(dispense_change)
+
+    caplog.clear()
+    result = runner.invoke(view_coins)
+    assert result.exit_code == 0
+    assert "The machine holds 169.75 in coins and bills." in caplog.text
+    assert "20.00: 1" in caplog.text
+    assert "10.00: 4" in caplog.text
+
+
+def test_startup_leaves_heavy_modules_unimported():
+    """
+    Test case ensures loading the CLI doesn't import storage backends,
+    colors, logging or sockets until a command needs them.
+    """
+
+    heavy = ["colorama", "logging", "socket", "sqlite3", "mmap"]
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, vending_machine.__main__; "
+            f"print([name for name in {heavy!r} if name in sys.modules])",
+        ],
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_ndjson_output_streams_records(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures --output ndjson prints a plain JSON record per slot,
+    status messages included, without colors or timestamps.
+    """
+
+    runner.invoke(cli, ["--output", "ndjson", "start"])
+    caplog.clear()
+    result = runner.invoke(cli, ["--output", "ndjson", "view-items", "-c", "A"])
+    assert result.exit_code == 0
+
+    records = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [record["position"] for record in records] == [
+        f"A{row}" for row in range(1, 6)
+    ]
+    assert records[0] == {
+        "position": "A1",
+        "name": "Gatorade (Blue)",
+        "price": "1.75",
+        "remaining_stock": 3,
+    }
+
+    caplog.clear()
+    runner.invoke(cli, ["--output", "ndjson", "view-items", "-p", "Z9"])
+    assert json.loads(caplog.records[0].getMessage()) == {
+        "status": "error",
+        "message": "Z9 isn't a slot on this machine.",
+    }
+    assert printer.OUTPUT == "text"
+
+
+def test_json_output_lists_as_one_document(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures --output json prints listings as one JSON array,
+    and the balance as an object.
+    """
+
+    runner.invoke(start)
+    runner.invoke(add_money, ["5"])
+    runner.invoke(purchase, ["A1", "B1"])
+
+    caplog.clear()
+    runner.invoke(cli, ["--output", "json", "view-purchases", "--offset", "1"])
+    purchases = json.loads("\n".join(record.getMessage() for record in caplog.records))
+    assert [(row["index"], row["position"], row["price"]) for row in purchases] == [
+        (1, "B1", "0.75")
+    ]
+
+    caplog.clear()
+    runner.invoke(cli, ["--output", "json", "view-balance"])
+    assert json.loads(caplog.records[0].getMessage()) == {"balance": "2.50"}
+
+
+def test_json_output_prints_summaries_as_one_document(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures view-sales and view-coins print one JSON document
+    (one record per line with ndjson) of status and message records.
+    """
+
+    runner.invoke(start)
+    runner.invoke(add_money, ["5"])
+    runner.invoke(purchase, ["A1"])
+
+    caplog.clear()
+    runner.invoke(cli, ["--output", "json", "view-sales", "--verify"])
+    records = json.loads("\n".join(record.getMessage() for record in caplog.records))
+    assert records[0] == {"status": "info", "message": "Sold 1 items for 1.75."}
+    assert records[-1]["status"] == "success"
+
+    caplog.clear()
+    runner.invoke(cli, ["--output", "ndjson", "view-coins"])
+    records = [json.loads(record.getMessage()) for record in caplog.records]
+    assert len(records) > 1
+    assert all(record["status"] == "info" for record in records)
+
+
+def test_batch_runs_commands_with_one_save(
+    runner, reset_state, caplog, monkeypatch
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures batch runs every line against one machine, saving
+    it once at the end, and reports the lines that failed.
+    """
+
+    saves = []
+    commit = JsonStorage.commit
+    monkeypatch.setattr(
+        JsonStorage,
+        "commit",
+        lambda storage, machine: saves.append(1) or commit(storage, machine),
+    )
+
+    commands = "start\nadd-money 5\n\n# a comment\npurchase A1\nadd-money lots\n"
+    result = runner.invoke(cli, ["batch"], input=commands + "view-balance\n")
+
+    assert result.exit_code == 1
+    assert "3.25" in caplog.records[-2].getMessage()
+    assert "Failed on lines 6." in caplog.records[-1].getMessage()
+    assert len(saves) == 1
+    assert str(JsonStorage(STATE_FILE_LOCATION).load().balance) == "3.25"
+
+
+def test_shell_saves_on_exit(
+    runner, reset_state, caplog
+):  # pylint: disable=redefined-outer-name,unused-argument,invalid-name
+    """
+    Test case ensures the shell runs what's typed against one machine
+    until exit, and saves it before leaving.
+    """
+
+    typed = "start\nadd-money 5\npurchase A1\nview-balance\nexit\nadd-money 1\n"
+    result = runner.invoke(
+        cli, ["shell", "--every", "0", "--seconds", "0"], input=typed
+    )
+
+    assert result.exit_code == 0
+    assert "3.25" in caplog.records[-2].getMessage()
+    assert "saved" in caplog.records[-1].getMessage()
+    assert str(JsonStorage(STATE_FILE_LOCATION).load().balance) == "3.25"
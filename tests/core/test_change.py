@@ -0,0 +1,121 @@
+from itertools import product
+from typing import Dict, Optional
+
+import hypothesis.strategies as st
+from hypothesis import given
+
+from vending_machine.core.change import (
+    DENOMINATIONS,
+    FLOAT,
+    breakdown,
+    is_canonical,
+    make_change,
+)
+
+
+def fewest_pieces(cents: int, coins: Dict[int, int]) -> Optional[int]:
+    """
+    The fewest pieces paying the amount, found by trying every
+    combination the inventory allows.
+    """
+
+    denominations = list(coins)
+    counts = [
+        sum(combination)
+        for combination in product(*(range(coins[d] + 1) for d in denominations))
+        if sum(count * d for count, d in zip(combination, denominations)) == cents
+    ]
+    return min(counts) if counts else None
+
+
+def test_breakdown_uses_the_largest_pieces():
+    """
+    Test case ensures deposits are taken to be paid in the fewest pieces.
+    """
+
+    assert breakdown(3841) == {
+        2000: 1,
+        1000: 1,
+        500: 1,
+        100: 3,
+        25: 1,
+        10: 1,
+        5: 1,
+        1: 1,
+    }
+    assert breakdown(0) == {}
+
+
+def test_canonical_systems():
+    """
+    Test case ensures coin systems are told apart by whether greedy
+    change is always the fewest pieces.
+    """
+
+    assert is_canonical(DENOMINATIONS)
+    assert is_canonical((25, 10, 5))
+    # 6 is 3 + 3, but greedy pays 4 + 1 + 1.
+    assert not is_canonical((4, 3, 1))
+    # Greedy can't pay 30 at all, taking a quarter first.
+    assert not is_canonical((25, 10))
+
+
+def test_greedy_change_from_the_float():
+    """
+    Test case ensures change from a well stocked machine is the fewest
+    pieces.
+    """
+
+    assert make_change(825, FLOAT) == {500: 1, 100: 3, 25: 1}
+    assert make_change(0, {}) == {}
+
+
+def test_change_works_around_missing_pieces():
+    """
+    Test case ensures running short of a denomination falls back to
+    other pieces, preferring fewer of them.
+    """
+
+    # Greedy would pay a quarter and five pennies, and run out of those.
+    assert make_change(30, {25: 1, 10: 3, 1: 4}) == {10: 3}
+    assert make_change(6, {4: 5, 3: 5, 1: 5}) == {3: 2}
+
+
+def test_impossible_change():
+    """
+    Test case ensures amounts the inventory can't pay exactly come back
+    as None.
+    """
+
+    assert make_change(30, {25: 1, 1: 4}) is None
+    assert make_change(500, {100: 4}) is None
+    assert make_change(5, {}) is None
+
+
+@given(
+    cents=st.integers(min_value=0, max_value=80),
+    coins=st.dictionaries(
+        st.sampled_from([1, 2, 3, 5, 7, 10, 25, 50]),
+        st.integers(min_value=0, max_value=4),
+        max_size=4,
+    ),
+)
+def test_change_is_always_fewest_pieces(cents: int, coins: Dict[int, int]):
+    """
+    Test case ensures change is exact, fits in the inventory and uses the
+    fewest pieces possible, whatever the coin system.
+    """
+
+    change = make_change(cents, coins)
+    fewest = fewest_pieces(cents, coins)
+
+    if fewest is None:
+        assert change is None
+    else:
+        assert (
+            sum(denomination * count for denomination, count in change.items()) == cents
+        )
+        assert all(
+            count <= coins[denomination] for denomination, count in change.items()
+        )
+        assert sum(change.values()) == fewest
@@ -0,0 +1,50 @@
+import pytest
+
+from vending_machine.core.grid import GridIndex, parse_position
+
+
+def test_parse_position_splits_multi_digit_rows():
+    """
+    Test case ensures every digit after the column is part of the row.
+    """
+
+    assert parse_position("A1") == ("A", 1)
+    assert parse_position("b12") == ("B", 12)
+
+
+@pytest.mark.parametrize("position", ["", "A", "12", "A1B", "1A"])
+def test_parse_position_rejects_non_positions(position: str):
+    """
+    Test case ensures anything not shaped like a position is an error.
+    """
+
+    with pytest.raises(ValueError):
+        parse_position(position)
+
+
+def test_find_returns_matching_positions_in_grid_order():
+    """
+    Test case ensures filters only return exact matches, sorted by
+    column and then by row number.
+    """
+
+    grid = GridIndex(["A10", "B1", "A2", "A1", "B11"])
+
+    assert grid.find() == ["A1", "A2", "A10", "B1", "B11"]
+    assert grid.find(column="A") == ["A1", "A2", "A10"]
+    assert grid.find(row=1) == ["A1", "B1"]
+    assert grid.find("b", 11) == ["B11"]
+    assert grid.find("C", 1) == []
+    assert grid.find(row=3) == []
+
+
+def test_off_grid_positions_are_listed_but_not_filtered():
+    """
+    Test case ensures positions that can't be parsed don't break the
+    index.
+    """
+
+    grid = GridIndex(["A1", "SPECIAL"])
+
+    assert grid.find() == ["A1", "SPECIAL"]
+    assert grid.find(column="SPECIAL") == []
@@ -0,0 +1,131 @@
+import io
+
+import pytest
+
+from vending_machine.core.manifest import RestockRow, guess_format, read_manifest
+from vending_machine.utils.money import Money
+
+CSV = """position,name,price,quantity,machine
+a1,Gatorade (Blue),1.75,10,north
+B2,Oreos,0.50,4,south
+"""
+
+NDJSON = """{"position": "A1", "name": "Gatorade (Blue)", "price": "1.75", "quantity": 10}
+
+{"position": "B2", "name": "Oreos", "price": 0.5, "quantity": "4"}
+"""
+
+
+def test_reads_csv():
+    """
+    Test case ensures CSV rows come out validated, with positions
+    uppercased and prices as Money.
+    """
+
+    rows = list(read_manifest(io.StringIO(CSV.replace(",machine", "")), "csv"))
+
+    assert rows == [
+        RestockRow(2, "A1", "Gatorade (Blue)", Money(175), 10),
+        RestockRow(3, "B2", "Oreos", Money(50), 4),
+    ]
+
+
+def test_reads_ndjson():
+    """
+    Test case ensures NDJSON rows come out the same as CSV ones, blank
+    lines skipped.
+    """
+
+    rows = list(read_manifest(io.StringIO(NDJSON), "ndjson"))
+
+    assert [row[1:] for row in rows] == [
+        ("A1", "Gatorade (Blue)", Money(175), 10),
+        ("B2", "Oreos", Money(50), 4),
+    ]
+    assert rows[1].line == 3
+
+
+def test_picks_out_one_machine():
+    """
+    Test case ensures a fleet manifest only yields the given machine's
+    rows.
+    """
+
+    rows = list(read_manifest(io.StringIO(CSV), "csv", machine="south"))
+
+    assert [row.position for row in rows] == ["B2"]
+
+
+@pytest.mark.parametrize(
+    "manifest, manifest_format",
+    [
+        (CSV, "csv"),
+        (
+            '{"position": "A1", "name": "Oreos", "price": "1", "quantity": 1, '
+            '"machine": "north"}\n',
+            "ndjson",
+        ),
+    ],
+)
+def test_fleet_manifest_needs_a_machine(manifest, manifest_format):
+    """
+    Test case ensures a manifest with a machine column isn't read without
+    saying which machine's rows to use, instead of mixing all of them.
+    """
+
+    with pytest.raises(ValueError) as error:
+        list(read_manifest(io.StringIO(manifest), manifest_format))
+
+    assert "--machine" in str(error.value)
+
+
+def test_is_read_lazily():
+    """
+    Test case ensures rows are read as they're asked for, so a bad row
+    further down doesn't stop the ones before it from being read.
+    """
+
+    rows = read_manifest(
+        io.StringIO(CSV + "C3,Lays,abc,1,north\n"), "csv", machine="north"
+    )
+
+    assert next(rows).position == "A1"
+    with pytest.raises(ValueError):
+        next(rows)
+
+
+@pytest.mark.parametrize(
+    "row, message",
+    [
+        ("A1,Lays,1.00", "missing quantity"),
+        ("A1,,1.00,1", "missing name"),
+        ("11,Lays,1.00,1", "isn't a position"),
+        ("A1,Lays,cheap,1", "isn't a price"),
+        ("A1,Lays,1.00,2.5", "isn't a whole number"),
+        ("A1,Lays,1.00,-1", "negative"),
+        ("A1,Lays,2.00,5000000000", "too large"),
+    ],
+)
+def test_invalid_rows_name_their_line(row, message):
+    """
+    Test case ensures an invalid row raises, saying which line it's on
+    and what's wrong with it.
+    """
+
+    manifest = io.StringIO("position,name,price,quantity\nB1,Oreos,0.50,1\n" + row)
+
+    with pytest.raises(ValueError) as error:
+        list(read_manifest(manifest, "csv"))
+
+    assert "Line 3" in str(error.value)
+    assert message in str(error.value)
+
+
+def test_guess_format():
+    """
+    Test case ensures the format is guessed from the file extension.
+    """
+
+    assert guess_format("fleet.ndjson") == "ndjson"
+    assert guess_format("fleet.JSONL") == "ndjson"
+    assert guess_format("fleet.csv") == "csv"
@@ -0,0 +1,147 @@
+import pytest
+
+from vending_machine.core.purchase import Purchase, PurchaseLog, page
+from vending_machine.utils.money import Money
+
+
+@pytest.fixture
+def purchases():
+    """
+    Ten purchases made one second apart.
+    """
+
+    return [Purchase("A1", Money.parse("1.75"), timestamp=float(i)) for i in range(10)]
+
+
+def test_to_and_from_json_inverse():
+    """
+    Test case ensures a purchase survives being dumped and loaded,
+    timestamp included.
+    """
+
+    purchase = Purchase("B3", Money.parse("0.75"), timestamp=1571410000.25)
+
+    assert Purchase.from_json(purchase.to_json()) == purchase
+
+
+def test_from_json_without_timestamp():
+    """
+    Test case ensures purchases dumped before timestamps existed still load.
+    """
+
+    purchase = Purchase.from_json({"position": "A1", "price": "1.75"})
+
+    assert purchase.timestamp is None
+    assert "timestamp" not in purchase.to_json()
+
+
+@pytest.mark.parametrize(
+    "offset,limit,expected",
+    [(0, None, list(range(10))), (0, 3, [0, 1, 2]), (8, 5, [8, 9]), (12, 1, [])],
+)
+def test_page_slices(
+    purchases, offset, limit, expected
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures offset and limit pick the right slice.
+    """
+
+    assert [
+        int(purchase.timestamp) for purchase in page(purchases, offset, limit)
+    ] == expected
+
+
+@pytest.mark.parametrize(
+    "offset,limit,since",
+    [(0, None, None), (0, 3, None), (8, 5, None), (12, 1, None), (1, 2, 5.0)],
+)
+def test_purchase_log_pages_like_any_list(
+    purchases, offset, limit, since
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures the array backed log's own page method, which
+    starts right at offset, picks the same purchases as paging a list.
+    """
+
+    log = PurchaseLog(purchases)
+
+    assert list(log.page(offset, limit, since)) == list(
+        page(purchases, offset, limit, since)
+    )
+
+
+def test_page_since_applies_before_offset(
+    purchases
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures since filters first, and offset and limit then page
+    through the purchases left.
+    """
+
+    found = page(purchases, offset=1, limit=2, since=5)
+
+    assert [int(purchase.timestamp) for purchase in found] == [6, 7]
+
+
+def test_page_since_skips_purchases_without_timestamp():
+    """
+    Test case ensures purchases of unknown age never match since.
+    """
+
+    purchases = [
+        Purchase("A1", Money.parse("1")),
+        Purchase("A1", Money.parse("1"), 5.0),
+    ]
+
+    assert len(list(page(purchases, since=0))) == 1
+
+
+def test_page_is_lazy():
+    """
+    Test case ensures a page is read incrementally, never consuming more
+    of the history than it returns.
+    """
+
+    consumed = []
+
+    def history():
+        for i in range(1000):
+            consumed.append(i)
+            yield Purchase("A1", Money.parse("1"), float(i))
+
+    first = next(page(history(), offset=2, limit=5))
+
+    assert first.timestamp == 2.0
+    assert consumed == [0, 1, 2]
+
+
+def test_purchase_log_reads_back_what_was_appended(purchases):
+    """
+    Test case ensures the array backed log hands back equal purchases,
+    whether iterated, indexed or compared against a list.
+    """
+
+    purchases.append(Purchase("B12", Money.parse("0.50")))
+    log = PurchaseLog(purchases)
+
+    assert len(log) == 11
+    assert list(log) == purchases
+    assert log == purchases
+    assert log[0] == purchases[0]
+    assert log[-1].position == "B12"
+    assert log[-1].timestamp is None
+    with pytest.raises(IndexError):
+        log[11]  # pylint: disable=pointless-statement
+
+
+def test_purchase_log_stores_positions_and_prices_once(purchases):
+    """
+    Test case ensures repeated positions get one slot id, and purchases
+    at the same price share a Money.
+    """
+
+    log = PurchaseLog(purchases)
+
+    assert log.positions == ["A1"]
+    assert list(log.slots) == [0] * 10
+    assert log[0].price is log[5].price
@@ -0,0 +1,66 @@
+from vending_machine.core.item import Item
+from vending_machine.core.purchase import Purchase
+from vending_machine.core.sales import SalesAggregates, Tally
+from vending_machine.utils.money import Money
+
+
+def test_record_updates_every_tally():
+    """
+    Test case ensures one purchase counts towards the total, its
+    position and its item.
+    """
+
+    sales = SalesAggregates()
+    sales.record("A1", "Chips", Money.parse("1.25"))
+    sales.record("B1", "Chips", Money.parse("1.25"))
+
+    assert sales.units == 2
+    assert sales.revenue == Money.parse("2.50")
+    assert sales.by_position["A1"] == Tally(1, Money.parse("1.25"))
+    assert sales.by_item["Chips"] == Tally(2, Money.parse("2.50"))
+
+
+def test_from_purchases_matches_recording():
+    """
+    Test case ensures recomputing from the history gives the same result
+    as recording purchases as they happen.
+    """
+
+    items = {"A1": Item("Chips", Money.parse("1.25"), 5)}
+    purchases = [Purchase("A1", Money.parse("1.25")) for _ in range(3)]
+
+    recorded = SalesAggregates()
+    for purchase in purchases:
+        recorded.record(purchase.position, "Chips", purchase.price)
+
+    assert SalesAggregates.from_purchases(purchases, items) == recorded
+
+
+def test_to_and_from_json_inverse():
+    """
+    Test case ensures the aggregates survive being dumped and loaded.
+    """
+
+    sales = SalesAggregates()
+    sales.record("A1", "Chips", Money.parse("1.25"))
+
+    assert SalesAggregates.from_json(sales.to_json()) == sales
+
+
+def test_drift_describes_differences():
+    """
+    Test case ensures drift lists every tally that doesn't match, and
+    nothing when they all do.
+    """
+
+    expected = SalesAggregates()
+    expected.record("A1", "Chips", Money.parse("1.25"))
+    actual = SalesAggregates.from_json(expected.to_json())
+
+    assert actual.drift(expected) == []
+
+    actual.by_position["A1"].units = 7
+    problems = actual.drift(expected)
+
+    assert len(problems) == 1
+    assert "position A1" in problems[0]
@@ -0,0 +1,222 @@
+import threading
+from decimal import Decimal
+
+import pytest
+from click.testing import CliRunner
+
+from vending_machine import __main__ as main
+from vending_machine.__main__ import cli
+from vending_machine.server.client import absolute_paths, forward, request
+from vending_machine.server.daemon import Daemon
+from vending_machine.storage import JsonStorage
+from vending_machine.storage.binary import is_binary
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """
+    JSON storage in a temporary directory, without a machine yet.
+    """
+
+    return JsonStorage(str(tmp_path / "state.json"))
+
+
+@pytest.fixture
+def daemon(storage, tmp_path):  # pylint: disable=redefined-outer-name
+    """
+    A daemon serving from a background thread for the duration of a test.
+    """
+
+    daemon = Daemon(cli, storage, str(tmp_path / "vm.sock"))
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+
+    yield daemon
+
+    daemon.shutdown()
+    thread.join()
+
+
+def test_request_without_daemon_returns_none(tmp_path):
+    """
+    Test case ensures commands fall back to running locally if nothing
+    is listening.
+    """
+
+    assert request(["view-balance"], str(tmp_path / "missing.sock")) is None
+
+
+def test_commands_run_against_resident_machine(
+    daemon: Daemon
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures commands sent to the daemon share one machine and
+    their output comes back to the client.
+    """
+
+    exit_code, lines = request(["start"], daemon.socket_path)
+    assert exit_code == 0
+    assert "Vending machine created" in lines[0]
+
+    request(["add-money", "10"], daemon.socket_path)
+    exit_code, lines = request(["view-balance"], daemon.socket_path)
+
+    assert exit_code == 0
+    assert len(lines) == 1
+    assert "10.00" in lines[0]
+
+
+def test_usage_errors_come_back_to_client(
+    daemon: Daemon
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures bad command lines don't take the daemon down.
+    """
+
+    exit_code, lines = request(["add-money", "lots"], daemon.socket_path)
+
+    assert exit_code != 0
+    assert "lots" in lines[0]
+    assert request(["view-balance"], daemon.socket_path) is not None
+
+
+def test_changes_persist_on_shutdown(
+    storage: JsonStorage, tmp_path
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures everything changed in memory ends up on disk once
+    the daemon stops.
+    """
+
+    daemon = Daemon(cli, storage, str(tmp_path / "vm.sock"))
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+
+    request(["start"], daemon.socket_path)
+    request(["add-money", "10"], daemon.socket_path)
+    request(["dispense-change"], daemon.socket_path)
+    request(["add-money", "2.5"], daemon.socket_path)
+
+    daemon.shutdown()
+    thread.join()
+
+    assert storage.load().balance == Decimal("2.50")
+
+
+def test_forward_prints_output(
+    daemon: Daemon, capsys
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures forward prints what the daemon sent back, and
+    leaves the serve command and help to the local process.
+    """
+
+    assert forward(["start"], daemon.socket_path) == 0
+    assert "Vending machine created" in capsys.readouterr().out
+
+    assert forward(["serve"], daemon.socket_path) is None
+    assert forward(["--output", "json", "batch"], daemon.socket_path) is None
+    assert forward(["view-balance", "--help"], daemon.socket_path) is None
+
+
+def test_files_are_sent_as_absolute_paths(tmp_path, monkeypatch):
+    """
+    Test case ensures the manifest of a forwarded restock names the same
+    file for the daemon, which has a working directory of its own.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    manifest = str(tmp_path / "fleet.csv")
+
+    assert absolute_paths(["restock", "fleet.csv"]) == ["restock", manifest]
+    assert absolute_paths(
+        ["--output", "json", "restock", "--format", "csv", "fleet.csv"]
+    ) == ["--output", "json", "restock", "--format", "csv", manifest]
+    assert absolute_paths(["add-money", "2"]) == ["add-money", "2"]
+
+
+def test_unexpected_errors_come_back_to_client(
+    daemon: Daemon, monkeypatch
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a command failing with something other than a
+    click exception gets an error response, and the daemon keeps going.
+    """
+
+    request(["start"], daemon.socket_path)
+
+    def broken_load():
+        raise OSError("disk on fire")
+
+    monkeypatch.setattr(daemon.resident, "load", broken_load)
+    exit_code, lines = request(["view-balance"], daemon.socket_path)
+
+    assert exit_code == 1
+    assert "disk on fire" in lines[-1]
+    monkeypatch.undo()
+    assert request(["view-balance"], daemon.socket_path)[0] == 0
+
+
+def test_storage_stays_locked_while_serving(
+    daemon: Daemon, storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures another process can't change the machine while the
+    daemon holds it, so the daemon's next flush can't overwrite that.
+    """
+
+    request(["start"], daemon.socket_path)
+    request(["add-money", "1"], daemon.socket_path)
+
+    deposited = threading.Event()
+
+    def deposit_elsewhere():
+        other = JsonStorage(storage.path)
+        with other.locked():
+            machine = other.load()
+            machine.deposit(Decimal("10"))
+            other.commit(machine)
+        deposited.set()
+
+    thread = threading.Thread(target=deposit_elsewhere)
+    thread.start()
+    assert not deposited.wait(0.2)
+
+    daemon.shutdown()
+    thread.join()
+    assert storage.load().balance == Decimal("11.00")
+
+
+def test_convert_saves_the_resident_machine(
+    daemon: Daemon, storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures convert run through the daemon rewrites the state
+    it serves, without waiting on the daemon's own lock, and later
+    changes keep that format.
+    """
+
+    request(["start"], daemon.socket_path)
+    request(["add-money", "10"], daemon.socket_path)
+
+    assert request(["convert", "binary"], daemon.socket_path)[0] == 0
+    request(["add-money", "1"], daemon.socket_path)
+    daemon.shutdown()
+
+    assert is_binary(storage.path)
+    assert storage.load().balance == Decimal("11.00")
+
+
+def test_local_only_commands_refuse_while_serving(
+    daemon: Daemon, monkeypatch
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures commands that can't be forwarded stop with an error
+    while a daemon is running, rather than wait for its lock.
+    """
+
+    monkeypatch.setattr(main, "SOCKET_LOCATION", daemon.socket_path)
+    result = CliRunner().invoke(cli, ["batch"], input="add-money 1\n")
+
+    assert result.exit_code == 1
+    assert "Stop it first" in result.output
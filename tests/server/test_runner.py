@@ -0,0 +1,140 @@
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.__main__ import cli
+from vending_machine.server.runner import CommandRunner
+from vending_machine.storage import JsonStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """
+    JSON storage in a temporary directory, without a machine yet.
+    """
+
+    return JsonStorage(str(tmp_path / "state.json"))
+
+
+def test_changes_are_saved_every_so_often(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures the runner only saves after every so many changes,
+    and saves what's left when it's closed.
+    """
+
+    runner = CommandRunner(cli, storage, every=2)
+    assert runner.run(["start"]) == 0
+    runner.run(["add-money", "1"])
+    runner.run(["view-balance"])
+    assert storage.load().balance == Decimal("0.00")
+
+    runner.run(["add-money", "2"])
+    assert storage.load().balance == Decimal("3.00")
+
+    runner.run(["add-money", "4"])
+    assert storage.load().balance == Decimal("3.00")
+    runner.close()
+
+    assert storage.load().balance == Decimal("7.00")
+    assert runner.saves == 2
+
+
+def test_bad_lines_fail_without_stopping_the_runner(
+    storage: JsonStorage, caplog
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures usage errors and commands that can't be nested come
+    back as exit codes, with the reason printed.
+    """
+
+    runner = CommandRunner(cli, storage)
+    runner.run(["start"])
+
+    assert runner.run(["add-money", "lots"]) != 0
+    assert runner.run(["--output", "json", "serve"]) != 0
+    assert "serve can't be run from here" in caplog.text
+    assert runner.run(["add-money", "1"]) == 0
+
+    runner.close()
+    assert storage.load().balance == Decimal("1.00")
+
+
+def test_unexpected_errors_fail_only_their_line(
+    storage: JsonStorage, caplog, monkeypatch
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a command failing with something other than a
+    click exception prints an error and exits with 1, and the runner
+    keeps going.
+    """
+
+    runner = CommandRunner(cli, storage)
+    runner.run(["start"])
+
+    def broken_load():
+        raise OSError("disk on fire")
+
+    monkeypatch.setattr(runner.resident, "load", broken_load)
+    assert runner.run(["view-balance"]) == 1
+    assert "view-balance failed: disk on fire" in caplog.text
+
+    monkeypatch.undo()
+    assert runner.run(["add-money", "1"]) == 0
+    runner.close()
+    assert storage.load().balance == Decimal("1.00")
+
+
+def test_changes_are_saved_every_so_many_seconds(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures changes get saved on a timer while the runner sits
+    idle, without waiting for more commands or for it to close.
+    """
+
+    runner = CommandRunner(cli, storage, seconds=0.01)
+    try:
+        runner.run(["start"])
+        runner.run(["add-money", "1"])
+
+        deadline = time.monotonic() + 5
+        while runner.saves == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert storage.load().balance == Decimal("1.00")
+    finally:
+        runner.close()
+
+
+def test_storage_stays_locked_until_closed(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures another process can't change the machine while the
+    runner has it loaded, so the runner's save can't overwrite that.
+    """
+
+    runner = CommandRunner(cli, storage)
+    runner.run(["start"])
+    runner.run(["add-money", "1"])
+
+    deposited = threading.Event()
+
+    def deposit_elsewhere():
+        other = JsonStorage(storage.path)
+        with other.locked():
+            machine = other.load()
+            machine.deposit(Decimal("10"))
+            other.commit(machine)
+        deposited.set()
+
+    thread = threading.Thread(target=deposit_elsewhere)
+    thread.start()
+    assert not deposited.wait(0.2)
+
+    runner.close()
+    thread.join()
+    assert storage.load().balance == Decimal("11.00")
@@ -0,0 +1,217 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.server.sessions import (
+    CustomerSession,
+    SessionClient,
+    SessionServer,
+)
+from vending_machine.storage import JournalStorage, JsonStorage
+
+
+@pytest.fixture
+def server():
+    """
+    Session server around a fresh machine, without any storage.
+    """
+
+    return SessionServer(VendingMachine())
+
+
+def test_sessions_have_separate_balances(
+    server: SessionServer
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures money deposited in one session can't be spent or
+    dispensed from another.
+    """
+
+    first, second = CustomerSession(), CustomerSession()
+
+    server.handle(first, {"op": "deposit", "amount": "5"})
+
+    assert not server.handle(second, {"op": "purchase", "position": "A1"})["ok"]
+    assert server.handle(second, {"op": "dispense"})["change"] == "0.00"
+    assert server.handle(first, {"op": "purchase", "position": "A1"})["ok"]
+    assert server.handle(first, {"op": "dispense"})["change"] == "3.25"
+
+
+def test_purchases_share_inventory(
+    server: SessionServer
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures purchases from every session come out of the same
+    stock and end up in the same purchase log.
+    """
+
+    for _ in range(2):
+        session = CustomerSession()
+        server.handle(session, {"op": "deposit", "amount": "5"})
+        server.handle(session, {"op": "purchase", "position": "A1"})
+
+    assert server.machine.items["A1"].remaining_stock == 1
+    assert len(server.machine.purchases) == 2
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"op": "deposit", "amount": "-1"},
+        {"op": "deposit", "amount": "lots"},
+        {"op": "purchase", "position": "ABC123"},
+        {"op": "refund"},
+        ["deposit", "2"],
+        "balance",
+        None,
+    ],
+)
+def test_bad_requests_get_errors(
+    server: SessionServer, message
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures invalid requests are answered with an error
+    instead of changing anything.
+    """
+
+    session = CustomerSession()
+    response = server.handle(session, message)
+
+    assert not response["ok"]
+    assert response["error"]
+    assert session.balance == Decimal(0)
+
+
+def test_concurrent_sessions_never_oversell(tmp_path):
+    """
+    Test case ensures that when many sessions race for the last few
+    items over real connections, exactly as many purchases succeed as
+    there was stock, and the result gets checkpointed.
+    """
+
+    storage = JsonStorage(str(tmp_path / "state.json"))
+    server = SessionServer(VendingMachine(stock=3), storage)
+
+    async def customer(port):
+        client = await SessionClient.connect("127.0.0.1", port)
+        await client.send(op="deposit", amount="2")
+        response = await client.send(op="purchase", position="A1")
+        await client.close()
+        return response["ok"]
+
+    async def scenario():
+        listening = await server.start("127.0.0.1", 0)
+        port = listening.sockets[0].getsockname()[1]
+        results = await asyncio.gather(*(customer(port) for _ in range(50)))
+        listening.close()
+        await listening.wait_closed()
+        return results
+
+    results = asyncio.run(scenario())
+    server.checkpoint()
+
+    assert results.count(True) == 3
+    assert storage.load().items["A1"].remaining_stock == 0
+    assert len(storage.load().purchases) == 3
+
+
+def test_purchases_reach_the_journal_as_they_happen(tmp_path):
+    """
+    Test case ensures session purchases go through the machine's change
+    records, so the journal has them before any checkpoint, without the
+    machine's own balance being charged.
+    """
+
+    storage = JournalStorage(
+        snapshot_path=str(tmp_path / "state.json"),
+        journal_path=str(tmp_path / "state.journal"),
+    )
+    storage.save(VendingMachine())
+    server = SessionServer(storage.load(), storage)
+
+    session = CustomerSession()
+    server.handle(session, {"op": "deposit", "amount": "2"})
+    assert server.handle(session, {"op": "purchase", "position": "A1"})["ok"]
+
+    loaded = JournalStorage(storage.snapshot_path, storage.journal_path).load()
+    assert loaded.items["A1"].remaining_stock == 2
+    assert len(loaded.purchases) == 1
+    assert loaded.sales.by_position["A1"].units == 1
+    assert loaded.balance == Decimal("0")
+    assert session.balance == Decimal("0.25")
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"op": "purchase", "position": ["A1"]},
+        {"op": "purchase"},
+        {"op": "deposit", "amount": ["2"]},
+        {"op": "deposit", "amount": 2},
+        {"op": "deposit"},
+    ],
+)
+def test_malformed_fields_get_errors(
+    server: SessionServer, message
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures positions and amounts of the wrong type are
+    answered with an error instead of failing the connection.
+    """
+
+    response = server.handle(CustomerSession(), message)
+
+    assert not response["ok"]
+    assert response["error"]
+
+
+def test_sessions_pay_with_the_machines_coins():
+    """
+    Test case ensures deposits go into the machine's coins and change
+    comes out of them, refusing purchases it couldn't give change for.
+    """
+
+    server = SessionServer(VendingMachine(coins={}))
+    session = CustomerSession()
+    server.handle(session, {"op": "deposit", "amount": "5"})
+
+    assert server.machine.coins == {500: 1}
+    assert not server.handle(session, {"op": "purchase", "position": "A1"})["ok"]
+    assert str(session.balance) == "5.00"
+
+    server.handle(CustomerSession(), {"op": "deposit", "amount": "3.25"})
+    assert server.handle(session, {"op": "purchase", "position": "A1"})["ok"]
+    assert server.handle(session, {"op": "dispense"})["change"] == "3.25"
+    assert server.machine.coins == {500: 1, 100: 0, 25: 0}
+    assert str(server.machine.balance) == "0.00"
+
+
+def test_requests_that_fail_unexpectedly_keep_the_connection(server, monkeypatch):
+    """
+    Test case ensures a request failing with an unexpected error gets an
+    error response, and the session carries on.
+    """
+
+    def fail(*_):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server.machine, "take_payment", fail)
+
+    async def scenario():
+        listening = await server.start("127.0.0.1", 0)
+        client = await SessionClient.connect(
+            "127.0.0.1", listening.sockets[0].getsockname()[1]
+        )
+        failed = await client.send(op="deposit", amount="2")
+        balance = await client.send(op="balance")
+        await client.close()
+        listening.close()
+        await listening.wait_closed()
+        return failed, balance
+
+    failed, balance = asyncio.run(scenario())
+
+    assert failed == {"ok": False, "error": "Error: boom"}
+    assert balance == {"ok": True, "balance": "0.00"}
@@ -0,0 +1,143 @@
+import zlib
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.core.purchase import Purchase
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import JsonStorage, JournalStorage
+from vending_machine.storage.binary import (
+    HEADER,
+    MAGIC,
+    SECTION,
+    BinaryReader,
+    is_binary,
+    write_binary,
+)
+from vending_machine.utils.money import Money
+
+
+@pytest.fixture
+def machine():
+    """
+    A machine with a balance, a few purchases (one from before purchases
+    had timestamps) and sales to match.
+    """
+
+    machine = VendingMachine()
+    machine.deposit(Decimal("10"))
+    for position in ("A1", "B2", "C3", "A1"):
+        machine.purchase_item(position)
+    machine.sales  # pylint: disable=pointless-statement
+    machine.purchases.append(Purchase("B2", Money.parse("1.25")))
+    return machine
+
+
+def test_round_trip_is_lossless(
+    machine: VendingMachine, tmp_path
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures everything to_json covers comes back out of a
+    binary snapshot unchanged, along with any extra header fields.
+    """
+
+    path = str(tmp_path / "state.bin")
+    write_binary(path, machine, journal_seq=12)
+
+    reader = BinaryReader(path)
+    loaded = reader.machine()
+
+    assert is_binary(path)
+    assert reader.header["journal_seq"] == 12
+    assert reader.header["purchase_count"] == 5
+    assert loaded.to_json() == machine.to_json()
+    assert loaded.purchases[-1].timestamp is None
+
+
+def test_converts_between_formats_losslessly(
+    machine: VendingMachine, tmp_path
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a JSON snapshot converted to binary and back is
+    the same machine, and that loading detects the format by itself.
+    """
+
+    path = str(tmp_path / "state.json")
+    JsonStorage(path, state_format="json").save(machine)
+
+    storage = JsonStorage(path, state_format="binary")
+    storage.save(storage.load())
+    assert is_binary(path)
+
+    storage = JsonStorage(path, state_format="json")
+    loaded = storage.load()
+    assert loaded.to_json() == machine.to_json()
+
+    storage.save(loaded)
+    assert not is_binary(path)
+    assert JsonStorage(path).load().to_json() == machine.to_json()
+
+
+def test_journal_replays_on_binary_snapshots(tmp_path):
+    """
+    Test case ensures the journal's sequence number survives in binary
+    snapshots, so journaled changes are applied exactly once.
+    """
+
+    storage = JournalStorage(
+        snapshot_path=str(tmp_path / "state.json"),
+        journal_path=str(tmp_path / "state.journal"),
+        state_format="binary",
+    )
+    storage.save(VendingMachine())
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_item("A1")
+    storage.compact(machine)
+    machine.purchase_item("A2")
+
+    loaded = storage.load()
+    assert is_binary(storage.snapshot_path)
+    assert loaded.balance == Decimal("1.50")
+    assert len(loaded.purchases) == 2
+
+
+def test_unknown_sections_are_skipped(
+    machine: VendingMachine, tmp_path
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures sections added by later releases don't stop older
+    readers.
+    """
+
+    path = str(tmp_path / "state.bin")
+    write_binary(path, machine)
+    with open(path, "ab") as file:
+        file.write(SECTION.pack(b"NEWS", 3, zlib.crc32(b"abc")) + b"abc")
+
+    assert BinaryReader(path).machine().to_json() == machine.to_json()
+
+
+def test_rejects_truncated_and_newer_files(
+    machine: VendingMachine, tmp_path
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures damaged files and files from a newer format
+    version raise instead of loading a partial machine.
+    """
+
+    path = str(tmp_path / "state.bin")
+    write_binary(path, machine)
+    with open(path, "rb") as file:
+        data = file.read()
+
+    with open(path, "wb") as file:
+        file.write(data[:-7])
+    with pytest.raises(ValueError):
+        BinaryReader(path)
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, 99) + data[HEADER.size :])
+    with pytest.raises(ValueError):
+        BinaryReader(path)
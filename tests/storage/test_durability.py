@@ -0,0 +1,310 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+import vending_machine
+from vending_machine.core.exceptions import CorruptStateError
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import JournalStorage, JsonStorage, SqliteStorage, snapshot
+from vending_machine.storage.binary import BinaryReader
+from vending_machine.storage.durability import atomic_write, backup_path, resolve
+from vending_machine.storage.snapshot import SnapshotReader, open_snapshot
+
+
+def make_machine(purchases: int) -> VendingMachine:
+    """
+    A machine with some money in it and the given number of purchases.
+    """
+
+    machine = VendingMachine()
+    machine.deposit(Decimal("10"))
+    for _ in range(purchases):
+        machine.purchase_item("A1")
+    return machine
+
+
+def damage(path: str, offset: int) -> None:
+    """
+    Flips a byte in the file at path.
+    """
+
+    with open(path, "r+b") as file:
+        file.seek(offset)
+        byte = file.read(1)
+        file.seek(offset)
+        file.write(bytes([byte[0] ^ 0xFF]))
+
+
+def sales_offset(path: str) -> int:
+    """
+    Where the sales section of the snapshot at path starts.
+    """
+
+    reader = open_snapshot(path)
+    if isinstance(reader, BinaryReader):
+        return reader.sections[b"SALE"][0]
+    return reader.span("sales")[0]
+
+
+def test_atomic_write_keeps_backup(tmp_path):
+    """
+    Test case ensures replacing a file keeps the old one as its backup,
+    and that a write that fails leaves the file alone.
+    """
+
+    path = str(tmp_path / "state")
+    for content in (b"first", b"second"):
+        with atomic_write(path) as file:
+            file.write(content)
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as file:
+            file.write(b"third")
+            raise RuntimeError("crashed while writing")
+
+    with open(path, "rb") as file:
+        assert file.read() == b"second"
+    with open(backup_path(path), "rb") as file:
+        assert file.read() == b"first"
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_unknown_durability_level():
+    """
+    Test case ensures a typo in the durability level is reported
+    instead of silently picking one.
+    """
+
+    assert resolve("flush") == "flush"
+    with pytest.raises(ValueError):
+        resolve("always")
+
+
+@pytest.mark.parametrize("state_format", ["json", "binary"])
+def test_truncated_snapshot_falls_back_to_backup(tmp_path, state_format):
+    """
+    Test case ensures a snapshot cut short by a crash gets replaced by
+    the last good one when loading.
+    """
+
+    path = str(tmp_path / "state.json")
+    storage = JsonStorage(path, state_format=state_format)
+    storage.save(make_machine(1))
+    storage.save(make_machine(2))
+    os.truncate(path, os.path.getsize(path) - 10)
+
+    storage = JsonStorage(path)
+    machine = storage.load()
+
+    assert storage.recovered
+    assert len(machine.purchases) == 1
+    assert machine.balance == Decimal("8.25")
+    assert os.path.isfile(path + ".corrupt")
+    # The restored copy loads cleanly from then on.
+    storage = JsonStorage(path)
+    assert len(storage.load().purchases) == 1
+    assert not storage.recovered
+
+
+@pytest.mark.parametrize("state_format", ["json", "binary"])
+def test_corrupt_snapshot_falls_back_to_backup(tmp_path, state_format):
+    """
+    Test case ensures a byte flipped in the middle of a snapshot is
+    caught by its checksums.
+    """
+
+    path = str(tmp_path / "state.json")
+    storage = JsonStorage(path, state_format=state_format)
+    storage.save(make_machine(0))
+    storage.save(make_machine(3))
+    damage(path, sales_offset(path) + 2)
+
+    storage = JsonStorage(path)
+    machine = storage.load()
+
+    assert storage.recovered
+    assert len(machine.purchases) == 0
+
+
+def test_corrupt_header_is_detected(tmp_path):
+    """
+    Test case ensures a damaged balance in the header doesn't go
+    unnoticed.
+    """
+
+    path = str(tmp_path / "state.json")
+    JsonStorage(path).save(make_machine(0))
+    with open(path, "rb") as file:
+        content = file.read()
+    with open(path, "wb") as file:
+        file.write(content.replace(b'"10.00"', b'"90.00"', 1))
+
+    with pytest.raises(ValueError):
+        SnapshotReader(path)
+
+
+def test_damaged_snapshot_without_backup_raises(tmp_path):
+    """
+    Test case ensures a damaged snapshot with nothing to fall back to
+    raises instead of loading a partial machine.
+    """
+
+    path = str(tmp_path / "state.json")
+    JsonStorage(path).save(make_machine(2))
+    os.truncate(path, os.path.getsize(path) - 1)
+
+    with pytest.raises(ValueError):
+        JsonStorage(path).load()
+
+
+def test_corrupt_purchases_are_caught_when_read(tmp_path):
+    """
+    Test case ensures the purchases, which aren't read when loading,
+    are checked when read through and never copied into the next
+    snapshot.
+    """
+
+    path = str(tmp_path / "state.json")
+    JsonStorage(path).save(make_machine(3))
+    damage(path, os.path.getsize(path) - 5)
+
+    storage = JsonStorage(path)
+    machine = storage.load()
+    assert not storage.recovered
+
+    with pytest.raises(ValueError):
+        list(machine.purchases)
+
+    machine.deposit(Decimal("1"))
+    with pytest.raises(ValueError):
+        storage.save(machine)
+    assert not os.path.exists(path + ".tmp")
+
+
+@pytest.mark.parametrize("use", ["page", "save"])
+def test_corrupt_purchases_fall_back_to_backup(tmp_path, use):
+    """
+    Test case ensures purchases found damaged after loading raise before
+    any of them gets used, and put the backup back for the next load.
+    """
+
+    path = str(tmp_path / "state.json")
+    JsonStorage(path).save(make_machine(2))
+    JsonStorage(path).save(make_machine(3))
+    damage(path, os.path.getsize(path) - 5)
+
+    storage = JsonStorage(path)
+    machine = storage.load()
+    with pytest.raises(CorruptStateError) as error:
+        if use == "page":
+            next(machine.purchases.page(0, 1))
+        else:
+            storage.save(machine)
+    assert "last good copy" in str(error.value)
+
+    storage = JsonStorage(path)
+    assert len(storage.load().purchases) == 2
+    assert os.path.isfile(path + ".corrupt")
+
+
+def test_pages_only_check_the_blocks_they_read(tmp_path, monkeypatch):
+    """
+    Test case ensures a page of purchases doesn't need the whole section
+    read and checked first, while reading into a damaged block still
+    raises before any of it gets used.
+    """
+
+    monkeypatch.setattr(snapshot, "CHUNK_SIZE", 64)
+    path = str(tmp_path / "state.json")
+    machine = VendingMachine(stock=10)
+    machine.deposit(Decimal("20"))
+    for _ in range(10):
+        machine.purchase_item("A1")
+    JsonStorage(path).save(machine)
+    damage(path, os.path.getsize(path) - 5)
+
+    purchases = JsonStorage(path).load().purchases
+    assert [purchase.position for purchase in purchases.page(0, 2)] == ["A1", "A1"]
+    with pytest.raises(CorruptStateError):
+        list(purchases.page(8, 2))
+
+
+@pytest.mark.parametrize("chunk_size", [64, snapshot.CHUNK_SIZE])
+def test_copied_purchases_keep_valid_block_checksums(tmp_path, monkeypatch, chunk_size):
+    """
+    Test case ensures purchases appended to ones copied across from the
+    previous snapshot extend its block checksums, filling up its last
+    block first.
+    """
+
+    monkeypatch.setattr(snapshot, "CHUNK_SIZE", chunk_size)
+    path = str(tmp_path / "state.json")
+    storage = JsonStorage(path)
+    storage.save(make_machine(3))
+
+    machine = storage.load()
+    for position in ["B1", "B2", "B3", "B4", "B5"]:
+        machine.purchase_item(position)
+    storage.save(machine)
+
+    reader = SnapshotReader(path)
+    reader.verify("purchases")
+    positions = [purchase.position for purchase in storage.load().purchases]
+    assert positions == ["A1"] * 3 + ["B1", "B2", "B3", "B4", "B5"]
+
+
+def test_copied_purchases_keep_a_valid_checksum(tmp_path):
+    """
+    Test case ensures purchases copied across from the previous snapshot
+    carry on its checksum, so the next load still checks out.
+    """
+
+    path = str(tmp_path / "state.json")
+    storage = JsonStorage(path)
+    storage.save(make_machine(2))
+
+    machine = storage.load()
+    machine.purchase_item("B1")
+    storage.save(machine)
+
+    reader = SnapshotReader(path)
+    reader.verify("purchases")
+    assert reader.header["purchase_count"] == 3
+
+
+@pytest.mark.parametrize("durability", ["none", "flush", "fsync"])
+def test_journal_durability_levels(tmp_path, monkeypatch, durability):
+    """
+    Test case ensures every durability level has the journal written
+    out once the machine is committed.
+    """
+
+    monkeypatch.setattr(vending_machine, "DURABILITY", durability)
+    snapshot_path = str(tmp_path / "state.json")
+    journal_path = str(tmp_path / "state.journal")
+
+    storage = JournalStorage(snapshot_path, journal_path)
+    storage.save(VendingMachine())
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_item("A1")
+    storage.commit(machine)
+
+    machine = JournalStorage(snapshot_path, journal_path).load()
+    assert machine.balance == Decimal("3.25")
+    assert len(machine.purchases) == 1
+
+
+@pytest.mark.parametrize(
+    "durability, synchronous", [("none", 0), ("flush", 1), ("fsync", 2)]
+)
+def test_sqlite_durability_levels(tmp_path, durability, synchronous):
+    """
+    Test case ensures the durability level picks how often SQLite syncs.
+    """
+
+    storage = SqliteStorage(str(tmp_path / "state.db"), durability=durability)
+
+    (value,) = storage.connection.execute("PRAGMA synchronous").fetchone()
+    assert value == synchronous
@@ -0,0 +1,297 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.core.exceptions import CorruptStateError
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import JournalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """
+    Journal storage writing into a temporary directory, already
+    holding a freshly created machine.
+    """
+
+    storage = JournalStorage(
+        snapshot_path=str(tmp_path / "state.json"),
+        journal_path=str(tmp_path / "state.journal"),
+    )
+    storage.save(VendingMachine())
+    return storage
+
+
+def test_changes_are_appended_one_line_each(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Each change should add exactly one line to the journal and leave
+    the snapshot alone.
+    """
+
+    snapshot_size = os.path.getsize(storage.snapshot_path)
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_item("A1")
+    machine.dispense_change()
+    storage.commit(machine)
+
+    with open(storage.journal_path) as file:
+        # The header, then one per change.
+        assert len(file.readlines()) == 1 + 3
+    assert os.path.getsize(storage.snapshot_path) == snapshot_size
+
+
+def test_failed_changes_are_not_journaled(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    A purchase that fails (no funds, bad position) shouldn't leave a
+    record behind.
+    """
+
+    machine = storage.load()
+    machine.purchase_item("A1")
+    machine.purchase_item("ABC123")
+
+    assert not os.path.isfile(storage.journal_path)
+
+
+def test_load_replays_journal(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Loading should rebuild the same machine the changes were made to.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("A1")
+    machine.purchase_item("B2")
+
+    assert storage.load() == machine
+
+
+def test_save_folds_journal_into_snapshot(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Saving writes a snapshot containing the journaled changes and
+    removes the journal.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("A1")
+    storage.save(machine)
+
+    assert not os.path.isfile(storage.journal_path)
+    assert storage.load() == machine
+
+
+def test_records_in_snapshot_are_not_replayed_twice(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    If a journal survives next to a snapshot that already contains its
+    records (a crash right after the snapshot was written), replaying
+    must skip them.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+
+    with open(storage.journal_path) as file:
+        stale_journal = file.read()
+
+    storage.save(machine)
+    with open(storage.journal_path, "w") as file:
+        file.write(stale_journal)
+
+    assert storage.load().balance == Decimal("10")
+
+
+def test_torn_last_record_is_dropped(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    A half written last line is ignored and cut off, and appending
+    afterwards still works.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+    with open(storage.journal_path, "a") as file:
+        file.write('{"op": "deposit", "amo')
+
+    machine = storage.load()
+    assert machine.balance == Decimal("10")
+
+    machine.deposit(Decimal("5"))
+    assert storage.load().balance == Decimal("15")
+
+
+def test_commit_compacts_past_record_limit(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Committing once the journal holds max_records records folds it into
+    the snapshot, so the journal never grows past the limit.
+    """
+
+    storage.max_records = 3
+
+    for _ in range(5):
+        machine = storage.load()
+        machine.deposit(Decimal("1"))
+        storage.commit(machine)
+        assert storage.journal_records < 3
+
+    assert storage.load().balance == Decimal("5")
+
+
+def test_commit_compacts_past_byte_limit(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Same as the record limit, but for the size of the journal on disk.
+    """
+
+    storage.max_bytes = 1
+
+    machine = storage.load()
+    machine.deposit(Decimal("1"))
+    storage.commit(machine)
+
+    assert not os.path.isfile(storage.journal_path)
+    assert storage.load().balance == Decimal("1")
+
+
+def test_compact_reports_reclaimed_bytes(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Compacting a journal of deposits should shrink what's on disk, and
+    the report should say by how much.
+    """
+
+    machine = storage.load()
+    for _ in range(20):
+        machine.deposit(Decimal("1"))
+
+    report = storage.compact()
+
+    assert report.records_folded == 20
+    assert report.bytes_reclaimed > 0
+    assert report.bytes_after == os.path.getsize(storage.snapshot_path)
+    assert report.replay_seconds >= 0
+    assert storage.load().balance == Decimal("20")
+
+
+def test_crash_before_snapshot_rename_keeps_old_state(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    A leftover temporary snapshot from a compaction that died before
+    the rename mustn't be picked up.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+
+    with open(storage.snapshot_path + ".tmp", "w") as file:
+        file.write('{"balance": "99')
+
+    assert storage.load().balance == Decimal("10")
+
+
+def test_order_is_one_journal_line(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a multi-item order is journaled as one record, so
+    a torn append drops all of it, and replays to the same machine.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_many(["A1", "B2", "B2"])
+    storage.commit(machine)
+
+    with open(storage.journal_path) as file:
+        assert len(file.readlines()) == 1 + 2
+
+    loaded = JournalStorage(storage.snapshot_path, storage.journal_path).load()
+    assert loaded.to_json() == machine.to_json()
+
+
+def test_appends_follow_journal_compacted_elsewhere(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Changes made after another storage compacted the journal this one
+    had open should land in the new journal, not the removed one.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("1"))
+    storage.commit(machine)
+
+    JournalStorage(storage.snapshot_path, storage.journal_path).compact()
+
+    machine.deposit(Decimal("2"))
+    storage.commit(machine)
+
+    assert storage.load().balance == Decimal("3")
+
+
+def test_damaged_record_is_an_error(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a journal line that doesn't match its checksum, or
+    isn't JSON at all, is reported as corrupt state rather than applied
+    or left to raise from the JSON parser.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+    machine.deposit(Decimal("5"))
+    with open(storage.journal_path) as file:
+        lines = file.readlines()
+
+    for damaged in (lines[1].replace('"10', '"90'), "{not json\n"):
+        lines[1] = damaged
+        with open(storage.journal_path, "w") as file:
+            file.writelines(lines)
+        with pytest.raises(CorruptStateError, match="line 2"):
+            storage.load()
+
+
+def test_journal_on_top_of_a_lost_snapshot_is_refused(
+    storage: JournalStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures that when the latest snapshot is damaged and its
+    backup put back, the journal written on top of the lost snapshot
+    isn't replayed against the older one.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("1"))
+    storage.save(machine)
+    machine.deposit(Decimal("10"))
+    storage.save(machine)
+    machine.purchase_item("A1")
+
+    with open(storage.snapshot_path, "r+b") as file:
+        file.truncate(os.path.getsize(storage.snapshot_path) // 2)
+
+    with pytest.raises(CorruptStateError, match="newer snapshot"):
+        storage.load()
+    # The backup is in place now, and the journal still doesn't fit it.
+    with pytest.raises(CorruptStateError, match="newer snapshot"):
+        storage.load()
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import time
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import (
+    JournalStorage,
+    JsonStorage,
+    MmapStorage,
+    SqliteStorage,
+    Storage,
+)
+from vending_machine.storage.locking import file_lock
+from vending_machine.utils.money import Money
+
+WORKERS = 8
+DEPOSITS = 15
+# What each deposit and purchase leaves in the machine.
+NET = Money.of("2") - VendingMachine().items["C1"].price
+
+
+def build_storage(backend: str, directory: str) -> Storage:
+    """
+    A storage of the given backend keeping its files in directory.
+    """
+
+    join = lambda name: os.path.join(directory, name)
+    if backend == "json":
+        return JsonStorage(join("state.json"))
+    if backend == "journal":
+        # Compacts every few records, so snapshots get replaced mid-run.
+        return JournalStorage(join("state.json"), join("state.journal"), max_records=5)
+    if backend == "sqlite":
+        return SqliteStorage(join("state.db"))
+    return MmapStorage(join("state.inventory"), join("state.purchases"))
+
+
+def deposit_and_buy(backend: str, directory: str) -> None:
+    """
+    What each worker process does: deposits and purchases, each one a
+    locked load, change and commit like a CLI command, with some
+    unlocked reads in between.
+    """
+
+    for _ in range(DEPOSITS):
+        storage = build_storage(backend, directory)
+        with storage.locked():
+            machine = storage.load()
+            machine.deposit(Decimal("2"))
+            machine.purchase_item("C1")
+            storage.commit(machine)
+
+        storage = build_storage(backend, directory)
+        with storage.locked(shared=True):
+            assert storage.load().balance >= NET
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite", "mmap"])
+def test_parallel_processes_lose_no_updates(tmp_path, backend):
+    """
+    Test case ensures processes changing the machine at the same time
+    each see the others' changes instead of overwriting them.
+    """
+
+    directory = str(tmp_path)
+    machine = VendingMachine(stock=WORKERS * DEPOSITS)
+    build_storage(backend, directory).save(machine)
+
+    processes = [
+        multiprocessing.Process(target=deposit_and_buy, args=(backend, directory))
+        for _ in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    machine = build_storage(backend, directory).load()
+    changes = WORKERS * DEPOSITS
+    assert machine.balance == NET * changes
+    assert len(machine.purchases) == changes
+    assert machine.items["C1"].remaining_stock == 0
+
+
+def hold_lock(path: str, shared: bool, seconds: float) -> None:
+    """
+    Holds a lock on path for a while.
+    """
+
+    with file_lock(path, shared):
+        time.sleep(seconds)
+
+
+def test_shared_locks_only_exclude_writers(tmp_path):
+    """
+    Test case ensures shared locks can be held together, while an
+    exclusive one waits for them.
+    """
+
+    path = str(tmp_path / "state.json.lock")
+    holder = multiprocessing.Process(target=hold_lock, args=(path, True, 0.5))
+    holder.start()
+    time.sleep(0.2)
+
+    started = time.perf_counter()
+    with file_lock(path, shared=True):
+        assert time.perf_counter() - started < 0.2
+    with file_lock(path):
+        assert time.perf_counter() - started > 0.2
+
+    holder.join()
@@ -0,0 +1,263 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.core.change import FLOAT
+from vending_machine.core.manifest import RestockRow
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import MmapStorage, PackedPurchaseLog
+from vending_machine.storage.mmapped import COINS_OFFSET, HEADER_SIZE, PURCHASE, SLOT
+from vending_machine.utils.money import Money
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """
+    Memory-mapped storage in a temporary directory, already holding a
+    freshly created machine.
+    """
+
+    storage = MmapStorage(
+        inventory_path=str(tmp_path / "state.inventory"),
+        purchases_path=str(tmp_path / "state.purchases"),
+    )
+    storage.save(VendingMachine())
+    return storage
+
+
+def test_save_and_load_round_trip(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a machine saved wholesale comes back the same,
+    purchases and sales included.
+    """
+
+    machine = VendingMachine()
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("A1")
+    machine.purchase_item("C5")
+    storage.save(machine)
+
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+
+    assert loaded.to_json() == machine.to_json()
+    assert loaded.sales == machine.sales
+    assert isinstance(loaded.purchases, PackedPurchaseLog)
+
+
+def test_changes_are_written_in_place(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures changes rewrite the inventory file in place (same
+    file, same size) and add exactly one record per purchase, without
+    needing a save.
+    """
+
+    inode = os.stat(storage.inventory_path).st_ino
+    size = os.path.getsize(storage.inventory_path)
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_item("A1")
+    machine.purchase_item("A1")
+    machine.purchase_item("B2")
+    storage.commit(machine)
+
+    assert os.stat(storage.inventory_path).st_ino == inode
+    assert os.path.getsize(storage.inventory_path) == size
+    assert os.path.getsize(storage.purchases_path) == 3 * PURCHASE.size
+
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    assert loaded.balance == machine.balance
+    assert loaded.items["A1"].remaining_stock == 1
+    assert [purchase.position for purchase in loaded.purchases] == ["A1", "A1", "B2"]
+    assert loaded.sales == machine.sales
+    assert loaded.verify_sales() == []
+
+
+def test_purchases_only_flush_what_they_touch(
+    storage: MmapStorage, monkeypatch
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a purchase only flushes the range from the balance
+    in the header to its own slot record.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+
+    flushed = []
+    monkeypatch.setattr(
+        storage, "_flush", lambda offset, length: flushed.append((offset, length))
+    )
+    machine.purchase_item("A2")
+
+    assert len(flushed) == 1
+    offset, length = flushed[0]
+    assert offset + length <= HEADER_SIZE + 2 * SLOT.size
+
+
+def test_uncommitted_purchase_record_is_dropped(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a purchase record appended by a purchase that died
+    before updating the header doesn't show up after a reload.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_item("A1")
+    with open(storage.purchases_path, "ab") as file:
+        file.write(PURCHASE.pack(0, 175, 0.0))
+
+    loaded = storage.load()
+
+    assert len(loaded.purchases) == 1
+    assert os.path.getsize(storage.purchases_path) == PURCHASE.size
+
+
+def test_purchase_log_pages_from_offset(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures paging starts reading at the offset, and indexes
+    work from either end.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("20"))
+    for position in ("A1", "A2", "A3", "A4"):
+        machine.purchase_item(position)
+
+    purchases = storage.load().purchases
+
+    assert [p.position for p in purchases.page(1, 2)] == ["A2", "A3"]
+    assert purchases[-1].position == "A4"
+    with pytest.raises(IndexError):
+        purchases[4]  # pylint: disable=pointless-statement
+
+
+def test_order_is_written_in_place(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a multi-item order appends all of its purchases
+    and updates every slot in it.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_many(["A1", "C5", "C5"])
+
+    assert os.path.getsize(storage.purchases_path) == 3 * PURCHASE.size
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    assert loaded.to_json() == machine.to_json()
+    assert loaded.sales == machine.sales
+
+
+def test_restock_is_written_in_place(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures restocking existing slots rewrites them where they
+    are, while adding a slot rewrites the file to make room for it.
+    """
+
+    machine = storage.load()
+    size = os.path.getsize(storage.inventory_path)
+    machine.restock([RestockRow(2, "A1", "Lemonade", Money.of("2.00"), 5)])
+
+    assert os.path.getsize(storage.inventory_path) == size
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    assert loaded.to_json() == machine.to_json()
+
+    machine = loaded
+    machine.restock([RestockRow(2, "D1", "Water", Money.of("1.00"), 6)])
+
+    assert os.path.getsize(storage.inventory_path) == size + SLOT.size
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    assert loaded.to_json() == machine.to_json()
+
+
+def test_restock_that_does_not_fit_leaves_every_slot(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a restock with a slot record that can't be packed
+    writes none of its slots, not just the ones before it, and leaves the
+    machine as it was too.
+    """
+
+    before = storage.load().to_json()
+    machine = storage.load()
+    assert not machine.restock(
+        [
+            RestockRow(2, "A1", "Lemonade", Money.of("2.00"), 5),
+            RestockRow(3, "A2", "L" * 40, Money.of("2.00"), 5),
+            RestockRow(4, "Z9", "Lemonade", Money.of("2.00"), 5),
+        ]
+    )
+
+    assert machine.to_json() == before
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    assert loaded.to_json() == before
+
+
+def test_files_from_before_coins_get_the_float(
+    storage: MmapStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures an inventory file written before coins were tracked
+    loads with the float, and keeps the coins from its first change on.
+    """
+
+    with open(storage.inventory_path, "r+b") as file:
+        file.seek(8)
+        file.write((1).to_bytes(2, "little"))
+        file.seek(COINS_OFFSET)
+        file.write(bytes(HEADER_SIZE - COINS_OFFSET))
+
+    machine = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    assert machine.coins == FLOAT
+    machine.deposit(Decimal("5"))
+
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    assert loaded.coins == machine.coins
+
+
+def test_restocked_slot_keeps_its_history(
+    storage: MmapStorage, tmp_path
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a slot restocked with another item after selling
+    the old one keeps the old record, retired, so its purchases still
+    name the old item, both in place and through a full save.
+    """
+
+    machine = storage.load()
+    old_name = machine.items["A1"].name
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("A1")
+    size = os.path.getsize(storage.inventory_path)
+    machine.restock([RestockRow(2, "A1", "Lemonade", Money.of("2.00"), 5)])
+    machine.purchase_item("A1")
+
+    assert os.path.getsize(storage.inventory_path) == size + SLOT.size
+    loaded = MmapStorage(storage.inventory_path, storage.purchases_path).load()
+    names = [purchase.name for purchase in loaded.purchases]
+    assert names == [old_name, "Lemonade"]
+    assert loaded.items["A1"].name == "Lemonade"
+    assert loaded.sales == machine.sales
+    assert loaded.verify_sales() == []
+
+    copy = MmapStorage(
+        str(tmp_path / "copy.inventory"), str(tmp_path / "copy.purchases")
+    )
+    copy.save(VendingMachine.from_json(loaded.to_json()))
+    copied = MmapStorage(copy.inventory_path, copy.purchases_path).load()
+    assert [purchase.name for purchase in copied.purchases] == names
+    assert copied.sales == machine.sales
@@ -0,0 +1,177 @@
+import json
+import os
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.core.purchase import Purchase
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import JsonStorage
+from vending_machine.storage.snapshot import SnapshotPurchaseLog, SnapshotReader
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """
+    JSON storage in a temporary directory, holding a machine that has
+    made a few purchases.
+    """
+
+    machine = VendingMachine()
+    machine.deposit(Decimal("10"))
+    for position in ("A1", "B2", "C3"):
+        machine.purchase_item(position)
+
+    storage = JsonStorage(str(tmp_path / "state.json"))
+    storage.save(machine)
+    return storage
+
+
+def test_balance_only_reads_header(
+    storage: JsonStorage, monkeypatch
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures reading the balance neither parses the items nor
+    a single purchase.
+    """
+
+    def fail(*_):
+        raise AssertionError("section was parsed")
+
+    monkeypatch.setattr(Purchase, "from_json", fail)
+    monkeypatch.setattr(VendingMachine, "items_from_json", fail)
+
+    machine = storage.load()
+
+    assert machine.balance == Decimal("7.00")
+    assert len(machine.purchases) == 3
+    assert not machine.items_loaded
+
+
+def test_items_load_on_first_use(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures the items section gets loaded when it's accessed.
+    """
+
+    machine = storage.load()
+    assert machine.items["A1"].remaining_stock == 2
+    assert machine.items_loaded
+
+
+def test_round_trip_after_more_purchases(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures purchases appended to a streamed log are written
+    out after the ones copied from the previous snapshot, across several
+    saves.
+    """
+
+    for position in ("A2", "A3"):
+        machine = storage.load()
+        machine.deposit(Decimal("2"))
+        machine.purchase_item(position)
+        storage.save(machine)
+        assert machine.purchases.appended == []
+
+    positions = [purchase.position for purchase in storage.load().purchases]
+    assert positions == ["A1", "B2", "C3", "A2", "A3"]
+    assert storage.load() == machine
+
+
+def test_purchase_log_indexing(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures the streamed log can be indexed like a list,
+    including purchases that were only appended in memory.
+    """
+
+    machine = storage.load()
+    machine.purchase_item("A2")
+
+    assert isinstance(machine.purchases, SnapshotPurchaseLog)
+    assert machine.purchases[0].position == "A1"
+    assert machine.purchases[-1].position == "A2"
+    with pytest.raises(IndexError):
+        machine.purchases[5]  # pylint: disable=pointless-statement
+
+
+def test_reader_keeps_reading_replaced_snapshot(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a machine keeps seeing the snapshot it was loaded
+    from, even if another process renames a new one over it.
+    """
+
+    machine = storage.load()
+    other = JsonStorage(storage.path)
+    other.save(VendingMachine())
+
+    assert len(list(machine.purchases)) == 3
+    assert machine.items["A1"].remaining_stock == 2
+
+
+def test_single_document_files_still_load(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures state files written before the sectioned layout
+    existed can still be loaded, and get rewritten in the new layout.
+    """
+
+    dumped = storage.load().to_json()
+    with open(storage.path, "w") as file:
+        json.dump(dumped, file)
+
+    loaded = storage.load()
+    assert loaded.to_json() == dumped
+
+    storage.save(loaded)
+    assert SnapshotReader(storage.path).sectioned
+    assert not os.path.isfile(storage.path + ".tmp")
+
+
+def test_page_skips_without_parsing(
+    storage: JsonStorage, monkeypatch
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures the purchases before the offset aren't parsed.
+    """
+
+    machine = storage.load()
+    machine.purchase_item("A2")
+    parsed = []
+    from_json = Purchase.from_json
+    monkeypatch.setattr(
+        Purchase, "from_json", lambda dumped: parsed.append(dumped) or from_json(dumped)
+    )
+
+    found = list(machine.iter_purchases(offset=2, limit=2))
+
+    assert [purchase.position for purchase in found] == ["C3", "A2"]
+    assert len(parsed) == 1
+
+
+def test_sales_are_saved_in_their_own_section(
+    storage: JsonStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures the aggregates are loaded from the snapshot rather
+    than recomputed, and are kept up to date across saves.
+    """
+
+    machine = storage.load()
+    assert machine.sales.units == 3
+    assert "sales" in machine.purchases.reader.header["sections"]
+
+    machine.deposit(Decimal("5"))
+    machine.purchase_item("A2")
+    storage.save(machine)
+
+    loaded = storage.load()
+    assert loaded.sales == machine.sales
+    assert loaded.verify_sales() == []
@@ -0,0 +1,266 @@
+import sqlite3
+from decimal import Decimal
+
+import pytest
+
+from vending_machine.core.change import FLOAT
+from vending_machine.core.manifest import RestockRow
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import SqliteStorage, SqlitePurchaseLog
+from vending_machine.utils.money import Money
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """
+    SQLite storage in a temporary directory, holding a fresh machine.
+    """
+
+    storage = SqliteStorage(str(tmp_path / "state.db"))
+    storage.save(VendingMachine())
+    return storage
+
+
+def count_rows(storage: SqliteStorage, table: str) -> int:
+    """
+    Counts rows through a separate connection, so only committed
+    changes are visible.
+    """
+
+    with sqlite3.connect(storage.path) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_items_are_rows_keyed_by_position(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures every slot gets its own row.
+    """
+
+    assert count_rows(storage, "items") == len(VendingMachine().items)
+    assert storage.load().items == VendingMachine().items
+
+
+def test_changes_are_committed_as_they_happen(
+    storage: SqliteStorage, tmp_path
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a deposit and a purchase are visible to another
+    connection right away, without the machine being saved.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+    machine.purchase_item("A1")
+
+    reloaded = SqliteStorage(str(tmp_path / "state.db")).load()
+    assert reloaded.balance == Decimal("3.25")
+    assert reloaded.items["A1"].remaining_stock == 2
+    assert count_rows(storage, "purchases") == 1
+
+
+def test_purchases_stay_in_the_database(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a loaded machine reads its purchases through
+    the database instead of a list.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("A1")
+    machine.purchase_item("B3")
+    machine.purchase_item("B3")
+
+    purchases = storage.load().purchases
+    assert isinstance(purchases, SqlitePurchaseLog)
+    assert len(purchases) == 3
+    assert purchases[-1].position == "B3"
+    assert [purchase.position for purchase in purchases.for_position("B3")] == [
+        "B3",
+        "B3",
+    ]
+    assert purchases.total_spent() == sum(
+        machine.items[position].price for position in ("A1", "B3", "B3")
+    )
+    with pytest.raises(IndexError):
+        purchases[3]  # pylint: disable=pointless-statement
+
+
+def test_save_and_load_round_trip(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures saving a machine built elsewhere and loading it
+    back gives an equal machine.
+    """
+
+    machine = VendingMachine()
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("C2")
+    storage.save(machine)
+
+    assert storage.load() == machine
+
+
+def test_destroy_removes_database(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures nothing is left behind.
+    """
+
+    storage.load()
+    storage.destroy()
+    assert not storage.exists()
+
+
+def test_page_runs_in_sql(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures paging through the purchases table honours offset,
+    limit and since.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+    for position in ("A1", "B1", "C1", "C2"):
+        machine.purchase_item(position)
+
+    purchases = storage.load().purchases
+    found = list(purchases.page(offset=1, limit=2))
+    assert [purchase.position for purchase in found] == ["B1", "C1"]
+
+    since = purchases[2].timestamp
+    assert len(list(purchases.page(since=since))) >= 2
+    assert list(purchases.page(offset=10)) == []
+
+
+def test_sales_are_kept_in_a_table(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures each purchase updates the sales table in its own
+    transaction, and a fresh load reads the aggregates back from it.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("A1")
+    machine.purchase_item("A1")
+
+    assert count_rows(storage, "sales") == 3
+    loaded = SqliteStorage(storage.path).load()
+    assert loaded.sales == machine.sales
+    assert loaded.verify_sales() == []
+
+
+class CountingConnection:  # pylint: disable=too-few-public-methods
+    """
+    Passes everything through to a connection, noting every commit.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, commits: list):
+        self.connection = connection
+        self.commits = commits
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def commit(self):  # pylint: disable=missing-docstring
+        self.commits.append(True)
+        self.connection.commit()
+
+
+def test_order_is_written_in_one_transaction(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a multi-item order gets written with one commit,
+    stock and sales of every slot in it included.
+    """
+
+    machine = storage.load()
+    machine.deposit(Decimal("5"))
+
+    commits = []
+    connection = storage.connection
+    storage._connection = CountingConnection(  # pylint: disable=protected-access
+        connection, commits
+    )
+    machine.purchase_many(["A1", "B2", "B2"])
+    storage._connection = connection  # pylint: disable=protected-access
+
+    assert len(commits) == 1
+    loaded = SqliteStorage(storage.path).load()
+    assert loaded.to_json() == machine.to_json()
+    assert loaded.sales == machine.sales
+
+
+def test_restock_keeps_slot_order(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a restock updates slots where they are and adds new
+    ones after them, all in one commit.
+    """
+
+    machine = storage.load()
+
+    commits = []
+    connection = storage.connection
+    storage._connection = CountingConnection(  # pylint: disable=protected-access
+        connection, commits
+    )
+    machine.restock(
+        [
+            RestockRow(2, "A1", "Gatorade (Blue)", Money.of("2.00"), 5),
+            RestockRow(3, "D1", "Water", Money.of("1.00"), 6),
+        ]
+    )
+    storage._connection = connection  # pylint: disable=protected-access
+
+    assert len(commits) == 1
+    loaded = SqliteStorage(storage.path).load()
+    assert loaded.to_json() == machine.to_json()
+    assert list(loaded.items) == list(machine.items)
+
+
+def test_databases_from_before_coins_get_the_float(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures a database without coins loads with the float, and
+    saves all of it with its first change.
+    """
+
+    storage.connection.execute("DELETE FROM coins")
+    storage.connection.commit()
+
+    machine = storage.load()
+    assert machine.coins == FLOAT
+    machine.deposit(Decimal("5"))
+
+    assert SqliteStorage(storage.path).load().coins == machine.coins
+
+
+def test_purchases_keep_the_item_bought(
+    storage: SqliteStorage
+):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures purchases remember their item after the slot gets
+    restocked with another one.
+    """
+
+    machine = storage.load()
+    old_name = machine.items["A1"].name
+    machine.deposit(Decimal("10"))
+    machine.purchase_item("A1")
+    machine.restock([RestockRow(2, "A1", "Lemonade", Money.of("2.00"), 5)])
+
+    loaded = SqliteStorage(storage.path).load()
+    assert [purchase.name for purchase in loaded.purchases] == [old_name]
+    assert loaded.verify_sales() == []
@@ -8,6 +8,7 @@ import pytest
 from vending_machine.core.exceptions import InsufficientFundsError, OutOfStockError
 from vending_machine.core.item import Item
 from vending_machine.utils import money
+from vending_machine.utils.money import Money
 
 
 @pytest.fixture
@@ -21,7 +22,7 @@ def test_to_json(item: Item):  # pylint: disable=redefined-outer-name
     Test case ensures the item object dumps to a json serializable
     dict correctly.
     """
-    assert item.to_json() == {"name": "Chips", "price": "10.0", "remaining_stock": 5}
+    assert item.to_json() == {"name": "Chips", "price": "10.00", "remaining_stock": 5}
 
 
 def test_from_json(item: Item):  # pylint: disable=redefined-outer-name
@@ -37,12 +38,28 @@ def test_from_json(item: Item):  # pylint: disable=redefined-outer-name
     assert item == loaded
 
 
+def test_names_are_shared(item: Item):  # pylint: disable=redefined-outer-name
+    """
+    Test case ensures items don't carry a __dict__, and items with the
+    same name share the string.
+    """
+
+    other = Item(name="".join(["Chi", "ps"]), price=Decimal("1"), remaining_stock=1)
+
+    assert not hasattr(item, "__dict__")
+    assert other.name is item.name
+
+
 class TestPurchase:
     """
     All tests related to the purchase method on the Item object
     """
 
-    @given(balance=st.decimals(allow_nan=False, max_value=9, allow_infinity=False))
+    @given(
+        balance=st.decimals(
+            allow_nan=False, min_value=-100_000, max_value=9, allow_infinity=False
+        )
+    )
     def test_insufficient_funds_gets_raised(
         self, item: Item, balance: Decimal
     ):  # pylint: disable=no-self-use,invalid-name,redefined-outer-name
@@ -53,7 +70,7 @@ class TestPurchase:
         """
 
         with pytest.raises(InsufficientFundsError):
-            item.purchase(balance)
+            item.purchase(Money.from_decimal(balance))
 
     # def test_insufficient_funds_gets_logged_as_error(self, item: Item, caplog):
     # 	"""
@@ -72,7 +89,11 @@ class TestPurchase:
     # 	assert "ERROR" in caplog.text
     # 	assert "Insufficient funds" in caplog.text
 
-    @given(balance=st.decimals(allow_nan=False, min_value=10))
+    @given(
+        balance=st.decimals(
+            allow_nan=False, min_value=10, max_value=100_000, allow_infinity=False
+        )
+    )
     def test_out_of_stock_gets_raised(
         self, item: Item, balance: Decimal
     ):  # pylint: disable=no-self-use,invalid-name,redefined-outer-name
@@ -83,7 +104,7 @@ class TestPurchase:
 
         item.remaining_stock = 0
         with pytest.raises(OutOfStockError):
-            item.purchase(balance)
+            item.purchase(Money.from_decimal(balance))
 
     # def test_out_of_stock_gets_logged_as_errors(self, item: Item, caplog):
     # 	"""
@@ -112,7 +133,7 @@ class TestPurchase:
         stock_before = item.remaining_stock
 
         with pytest.raises(InsufficientFundsError):
-            item.purchase(Decimal("5"))
+            item.purchase(Money.parse("5.00"))
 
         assert stock_before == item.remaining_stock
 
@@ -126,7 +147,7 @@ class TestPurchase:
 
         stock_before = item.remaining_stock
 
-        item.purchase(Decimal("500"))
+        item.purchase(Money.parse("500.00"))
 
         assert stock_before == item.remaining_stock + 1
 
@@ -186,12 +207,12 @@ class TestPurchase:
         """
 
         balance = money.to_money(balance)
-        expected_change = money.subtract(balance, item.price)
+        expected_change = money.subtract(balance, item.price.to_decimal())
         # Hypothesis doesn't reset the fixture, so we're going to manually
         # reset the remaining_stock instance variable to make sure
         # we don't hit OutOfStockErrors after a couple tests
         item.remaining_stock = 5
 
-        change = item.purchase(balance)
+        change = item.purchase(Money.from_decimal(balance))
 
         assert change == expected_change
@@ -0,0 +1,142 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from vending_machine import PROJECT_ROOT, STATE_FILE_LOCATION
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage.durability import remove_backups
+from vending_machine.utils import metrics
+from vending_machine.utils.metrics import Registry, instrument
+
+
+def test_histogram_buckets_are_cumulative_in_prometheus_output():
+    """
+    Test case ensures observations land in the right buckets and come out
+    as cumulative Prometheus buckets with a sum and count.
+    """
+
+    registry = Registry()
+    registry.observe("operation_seconds", 0.0002, operation="deposit")
+    registry.observe("operation_seconds", 0.003, operation="deposit")
+    registry.observe("operation_seconds", 60, operation="deposit")
+    registry.count("commands_total", command="add-money")
+
+    text = registry.to_prometheus()
+    assert "# TYPE vending_machine_operation_seconds histogram" in text
+    assert (
+        'vending_machine_operation_seconds_bucket{operation="deposit",le="0.0001"} 0'
+        in text
+    )
+    assert (
+        'vending_machine_operation_seconds_bucket{operation="deposit",le="0.005"} 2'
+        in text
+    )
+    assert (
+        'vending_machine_operation_seconds_bucket{operation="deposit",le="+Inf"} 3'
+        in text
+    )
+    assert 'vending_machine_operation_seconds_count{operation="deposit"} 3' in text
+    assert 'vending_machine_commands_total{command="add-money"} 1' in text
+
+
+def test_registries_merge_and_round_trip():
+    """
+    Test case ensures totals survive being saved as JSON and add up when
+    merged with another command's measurements.
+    """
+
+    first, second = Registry(), Registry()
+    first.count("commands_total", command="purchase")
+    first.observe("operation_seconds", 0.01, operation="state_commit")
+    second.count("commands_total", command="purchase")
+    second.observe("operation_seconds", 0.02, operation="state_commit")
+
+    totals = Registry.from_json(json.loads(json.dumps(first.to_json())))
+    totals.merge(second)
+
+    key = ("operation_seconds", (("operation", "state_commit"),))
+    assert totals.counters[("commands_total", (("command", "purchase"),))] == 2
+    assert totals.histograms[key].count == 2
+    assert totals.histograms[key].max == 0.02
+
+
+def test_instrumented_functions_count_errors():
+    """
+    Test case ensures a timed function is measured whether it returns or
+    raises, and that raising counts as an error.
+    """
+
+    registry = Registry()
+
+    def divide(numerator, denominator):
+        return numerator / denominator
+
+    timed_divide = instrument(divide, "divide", registry)
+    assert timed_divide(1, 2) == 0.5
+    with pytest.raises(ZeroDivisionError):
+        timed_divide(1, 0)
+
+    key = ("operation_seconds", (("operation", "divide"),))
+    assert registry.histograms[key].count == 2
+    assert (
+        registry.counters[("operation_errors_total", (("operation", "divide"),))] == 1
+    )
+
+
+def test_nothing_is_instrumented_when_disabled():
+    """
+    Test case ensures that without VENDING_MACHINE_METRICS the hot paths
+    are the plain functions, and timed blocks share one empty context.
+    """
+
+    assert metrics.REGISTRY is None
+    assert not hasattr(VendingMachine.purchase_item, "__wrapped__")
+    assert metrics.timer("state_load") is metrics.timer("state_commit")
+
+
+def test_cli_exports_metrics_per_command(tmp_path):
+    """
+    Test case ensures commands run with metrics turned on add to the
+    Prometheus totals, and each append a summary of their own.
+    """
+
+    if os.path.isfile(STATE_FILE_LOCATION):
+        os.remove(STATE_FILE_LOCATION)
+    environment = dict(os.environ, VENDING_MACHINE_METRICS=str(tmp_path))
+    try:
+        for argv in (["start"], ["add-money", "5"], ["add-money", "1"]):
+            subprocess.run(
+                [sys.executable, "-m", "vending_machine", *argv],
+                cwd=PROJECT_ROOT,
+                env=environment,
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+    finally:
+        remove_backups(STATE_FILE_LOCATION)
+        if os.path.isfile(STATE_FILE_LOCATION):
+            os.remove(STATE_FILE_LOCATION)
+
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'vending_machine_commands_total{command="add-money"} 2' in text
+    assert 'vending_machine_operation_seconds_count{operation="deposit"} 2' in text
+    assert 'vending_machine_operation_seconds_count{operation="state_commit"} 2' in text
+
+    summaries = [
+        json.loads(line)
+        for line in (tmp_path / "commands.ndjson").read_text().splitlines()
+    ]
+    assert [summary["command"] for summary in summaries] == [
+        "start",
+        "add-money",
+        "add-money",
+    ]
+    deposits = [
+        histogram
+        for histogram in summaries[-1]["histograms"]
+        if histogram["labels"] == {"operation": "deposit"}
+    ]
+    assert deposits[0]["count"] == 1
@@ -1,8 +1,13 @@
 from decimal import Decimal
+from typing import List, Tuple
 
+import hypothesis.strategies as st
+from hypothesis import given
 import pytest
 
-from vending_machine.utils import to_money, add
+from vending_machine.core.change import DENOMINATIONS
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.utils import Money, to_money, add, subtract
 
 
 @pytest.mark.parametrize(
@@ -44,3 +49,157 @@ def test_add_3_args():
     dec3 = Decimal("5.5000")
 
     assert add(dec1, dec2, dec3) == Decimal("16.5")
+
+
+amounts = st.decimals(
+    allow_nan=False, min_value=-100_000, max_value=100_000, allow_infinity=False
+)
+cents = st.integers(min_value=-10_000_000, max_value=10_000_000)
+
+
+@given(dec=amounts)
+def test_money_rounds_like_to_money(dec: Decimal):
+    """
+    Test case ensures converting to Money rounds exactly like to_money,
+    and prints the same way (apart from Decimal's negative zero).
+    """
+
+    rounded = to_money(dec)
+    converted = Money.from_decimal(dec)
+
+    assert converted == rounded
+    assert converted.to_decimal() == rounded
+    if not rounded.is_zero():
+        assert str(converted) == str(rounded)
+
+
+@given(first=cents, second=cents)
+def test_money_arithmetic_matches_decimal(first: int, second: int):
+    """
+    Test case ensures adding and subtracting whole cents gives the same
+    result as add and subtract on the equivalent decimals.
+    """
+
+    first_money, second_money = Money(first), Money(second)
+    first_dec, second_dec = first_money.to_decimal(), second_money.to_decimal()
+
+    assert first_money + second_money == add(first_dec, second_dec)
+    assert first_money - second_money == subtract(first_dec, second_dec)
+    assert (first_money < second_money) == (first_dec < second_dec)
+    assert hash(first_money) == hash(first_dec)
+
+
+@given(amount=cents)
+def test_money_parse_inverts_str(amount: int):
+    """
+    Test case ensures amounts survive being written out and read back.
+    """
+
+    assert Money.parse(str(Money(amount))).cents == amount
+
+
+@pytest.mark.parametrize("other", [None, "1.00", Decimal("1.00"), 1])
+def test_money_only_orders_against_money(other):
+    """
+    Test case ensures comparing the order of Money with anything else
+    raises TypeError like other unorderable types, instead of failing
+    on a missing attribute.
+    """
+
+    with pytest.raises(TypeError):
+        Money(100) < other  # pylint: disable=pointless-statement
+    with pytest.raises(TypeError):
+        other >= Money(100)  # pylint: disable=pointless-statement
+
+
+@pytest.mark.parametrize(
+    "text,amount", [("1.75", 175), ("-0.05", -5), ("10.0", 1000), ("3", 300)]
+)
+def test_money_parse_accepts_decimal_strings(text: str, amount: int):
+    """
+    Test case ensures amounts written by Decimal (like older state
+    files) can still be read.
+    """
+
+    assert Money.parse(text).cents == amount
+
+
+class DecimalMachine:
+    """
+    How balances behaved when they were kept as Decimal: the raw balance
+    was rounded with to_money whenever it was read.
+    """
+
+    def __init__(self, machine: VendingMachine):
+        self.balance = Decimal(0)
+        self.prices = {
+            position: item.price.to_decimal()
+            for position, item in machine.items.items()
+        }
+        self.stock = {
+            position: item.remaining_stock for position, item in machine.items.items()
+        }
+
+    def deposit(self, amount: Decimal) -> None:  # pylint: disable=missing-docstring
+        if amount > 0:
+            self.balance = self.balance + amount
+
+    def purchase(self, position: str) -> None:  # pylint: disable=missing-docstring
+        price = self.prices[position]
+        if self.stock[position] > 0 and to_money(self.balance) >= price:
+            self.stock[position] -= 1
+            self.balance = to_money(self.balance) - price
+
+    def dispense_change(self) -> Decimal:  # pylint: disable=missing-docstring
+        change = to_money(self.balance)
+        self.balance = Decimal(0)
+        return change
+
+
+operations = st.lists(
+    st.one_of(
+        st.tuples(
+            st.just("deposit"),
+            st.integers(min_value=-500, max_value=2000).map(
+                lambda amount: Decimal(amount).scaleb(-2)
+            ),
+        ),
+        st.tuples(st.just("purchase"), st.sampled_from(["A1", "A5", "B3", "C5"])),
+        st.tuples(st.just("dispense"), st.none()),
+    ),
+    max_size=50,
+)
+
+
+@given(operations=operations)
+def test_machine_matches_decimal_balances(operations: List[Tuple[str, object]]):
+    """
+    Test case ensures any sequence of whole cent deposits, purchases
+    and dispenses leaves the machine with exactly the balances, stock
+    and saved state it had when money was kept as Decimal.
+    """
+
+    # Plenty of coins, as Decimal balances never ran out of change.
+    machine = VendingMachine(
+        coins={denomination: 1000 for denomination in DENOMINATIONS}
+    )
+    reference = DecimalMachine(machine)
+
+    for operation, argument in operations:
+        if operation == "deposit":
+            machine.deposit(argument)
+            reference.deposit(argument)
+        elif operation == "purchase":
+            machine.purchase_item(argument)
+            reference.purchase(argument)
+        else:
+            assert machine.dispense_change() == reference.dispense_change()
+
+        assert machine.balance == to_money(reference.balance)
+        assert str(machine.balance) == str(to_money(reference.balance))
+
+    assert machine.to_json()["balance"] == str(to_money(reference.balance))
+    for position, item in machine.items.items():
+        assert item.remaining_stock == reference.stock[position]
+    for purchase in machine.to_json()["purchases"]:
+        assert purchase["price"] == str(reference.prices[purchase["position"]])
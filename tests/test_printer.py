@@ -0,0 +1,112 @@
+import logging
+from typing import List
+
+from vending_machine.ui import printer
+from vending_machine.ui.printer import formatted_print_many, get_timestamp
+from vending_machine.utils import GLOBAL_LOGGER
+from vending_machine.utils.logger import (
+    BackgroundHandler,
+    BufferedStreamHandler,
+    _swap_handler,
+    buffered_output,
+    stdout_handler,
+)
+
+
+class RecordingStream:
+    """
+    Stream keeping every write made to it.
+    """
+
+    def __init__(self):
+        self.writes: List[str] = []
+
+    def write(self, text: str) -> None:  # pylint: disable=missing-docstring
+        self.writes.append(text)
+
+    def flush(self) -> None:  # pylint: disable=missing-docstring
+        pass
+
+
+def test_timestamp_is_formatted_once_a_second(monkeypatch):
+    """
+    Test case ensures the timestamp only gets formatted again once the
+    second changes.
+    """
+
+    formatted = []
+
+    def strftime(fmt, when):
+        formatted.append(when)
+        return "12:00:00"
+
+    monkeypatch.setattr(printer.time, "strftime", strftime)
+    monkeypatch.setattr(printer.time, "time", lambda: 1000.25)
+    assert get_timestamp() == get_timestamp() == "12:00:00"
+    monkeypatch.setattr(printer.time, "time", lambda: 1001.5)
+    get_timestamp()
+
+    assert len(formatted) == 2
+
+
+def test_buffered_output_writes_once():
+    """
+    Test case ensures lines logged while output is buffered are written
+    out together when the block finishes, and not before.
+    """
+
+    stream = RecordingStream()
+    logger = logging.getLogger("vending-machine.test-buffered")
+    handler = BufferedStreamHandler(stream)
+    logger.addHandler(handler)
+    try:
+        with buffered_output(logger):
+            for index in range(3):
+                logger.warning("line %s", index)
+            assert stream.writes == []
+    finally:
+        logger.removeHandler(handler)
+
+    assert stream.writes == ["line 0\nline 1\nline 2\n"]
+
+
+def test_many_lines_keep_one_record_each(caplog):
+    """
+    Test case ensures batched printing still logs one record per
+    message, in order.
+    """
+
+    stream = RecordingStream()
+    previous = stdout_handler.setStream(stream)
+    try:
+        formatted_print_many(f"message {index}" for index in range(5))
+    finally:
+        stdout_handler.setStream(previous)
+
+    assert [record.getMessage().split(" | ")[1] for record in caplog.records] == [
+        f"message {index}" for index in range(5)
+    ]
+    assert len(stream.writes) == 1
+
+
+def test_background_output_writes_everything_by_close():
+    """
+    Test case ensures output handed to the background thread all gets
+    written, in order, by the time it's closed.
+    """
+
+    stream = RecordingStream()
+    previous = stdout_handler.setStream(stream)
+    background = BackgroundHandler(stdout_handler)
+    _swap_handler(GLOBAL_LOGGER, stdout_handler, background)
+    try:
+        formatted_print_many(f"message {index}" for index in range(2000))
+        background.close()
+    finally:
+        _swap_handler(GLOBAL_LOGGER, background, stdout_handler)
+        stdout_handler.setStream(previous)
+
+    lines = "".join(stream.writes).splitlines()
+    assert [line.split(" | ")[1] for line in lines] == [
+        f"message {index}" for index in range(2000)
+    ]
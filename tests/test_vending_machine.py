@@ -1,6 +1,7 @@
 from decimal import Decimal
 from vending_machine.core.exceptions import InsufficientFundsError, OutOfStockError
 from vending_machine.core.item import Item
+from vending_machine.core.manifest import RestockRow, read_manifest
 from vending_machine.core.vending_machine import VendingMachine
 from vending_machine.utils import money
 
@@ -8,6 +9,8 @@ from hypothesis import given
 import hypothesis.strategies as st
 
 import decimal
+import io
+import re
 import pytest
 
 
@@ -67,9 +70,36 @@ class TestViewPurchases(BaseLogTestingMixin):
 
         machine.view_purchases()
         self.logs_one_message(caplog)
-        assert "You've spent 0 on 0 items." in caplog.text
+        assert "You've spent 0.00 on 0 items." in caplog.text
         assert "You bought" not in caplog.text
 
+    def test_view_purchases_pages(self, loaded_machine: VendingMachine, caplog):
+        """
+        Test case ensures only the requested page gets listed, numbered
+        by its place in the history, while the header covers everything.
+        """
+
+        for position in ("A1", "B1", "C1"):
+            loaded_machine.purchase_item(position)
+        caplog.clear()
+
+        loaded_machine.view_purchases(offset=1, limit=1)
+
+        assert len(caplog.records) == 2
+        assert "on 3 items" in caplog.records[0].getMessage()
+        assert "1: Fruit Snacks" in caplog.records[1].getMessage()
+
+    def test_view_purchases_since(self, loaded_machine: VendingMachine, caplog):
+        """
+        Test case ensures purchases made before since aren't listed.
+        """
+
+        loaded_machine.purchase_item("A1")
+        caplog.clear()
+
+        loaded_machine.view_purchases(since=loaded_machine.purchases[0].timestamp + 1)
+        self.logs_one_message(caplog)
+
 
 class TestPurchaseItem(BaseLogTestingMixin):
     def test_out_of_stock_gets_logged_as_error(
@@ -203,6 +233,173 @@ class TestPurchaseItem(BaseLogTestingMixin):
         assert purchase.price == price
 
 
+class TestPurchaseMany(BaseLogTestingMixin):
+    def test_whole_order_gets_purchased(self, loaded_machine: VendingMachine, caplog):
+        """
+        Test case ensures every item in the order gets bought, with one
+        success message for the whole order.
+        """
+
+        loaded_machine.purchase_many(["A1", "B2", "B2"])
+
+        self.logs_one_message(caplog)
+        assert "SUCCESS" in caplog.text
+        assert [purchase.position for purchase in loaded_machine.purchases] == [
+            "A1",
+            "B2",
+            "B2",
+        ]
+        assert loaded_machine.items["B2"].remaining_stock == 1
+        assert loaded_machine.balance == money.Money.of("10") - (
+            loaded_machine.items["A1"].price + loaded_machine.items["B2"].price * 2
+        )
+        assert loaded_machine.sales.by_position["B2"].units == 2
+
+    @pytest.mark.parametrize(
+        "positions, message",
+        [
+            (["A1", "ABC123"], "no item located at ABC123"),
+            (["A1", "B2", "B2", "B2", "B2"], "Out of stock!"),
+            (["A1"] * 3 + ["A2"] * 3, "Insufficient funds"),
+            ([], "No items"),
+        ],
+    )
+    def test_failed_order_purchases_nothing(
+        self, loaded_machine: VendingMachine, caplog, positions, message
+    ):
+        """
+        Test case ensures an order the stock or balance can't cover in
+        full doesn't buy any of it, and says why.
+        """
+
+        changes = []
+        loaded_machine.on_change = changes.append
+        before = loaded_machine.to_json()
+
+        assert not loaded_machine.purchase_many(positions)
+
+        self.logs_one_message(caplog)
+        assert "ERROR" in caplog.text
+        assert message in caplog.text
+        assert loaded_machine.to_json() == before
+        assert not changes
+
+    def test_order_is_one_change_record(self, loaded_machine: VendingMachine):
+        """
+        Test case ensures storage backends get the order as a single
+        change record, which replays to the same machine.
+        """
+
+        changes = []
+        loaded_machine.on_change = changes.append
+        replayed = VendingMachine()
+        replayed.deposit(Decimal(10))
+
+        loaded_machine.purchase_many(["A1", "C3"])
+
+        assert len(changes) == 1
+        replayed.apply(changes[0])
+        assert replayed.to_json() == loaded_machine.to_json()
+
+
+class TestRestock(BaseLogTestingMixin):
+    @staticmethod
+    def manifest(*rows: str):
+        """
+        Utility method streaming a CSV manifest with the given rows.
+        """
+
+        header = "position,name,price,quantity\n"
+        return read_manifest(io.StringIO(header + "\n".join(rows)), "csv")
+
+    def test_restock_adds_replaces_and_adds_slots(
+        self, machine: VendingMachine, caplog
+    ):
+        """
+        Test case ensures a row for the same item tops it up and reprices
+        it, a row for another item replaces it, and a new position gets
+        its own slot.
+        """
+
+        restocked = machine.restock(
+            self.manifest(
+                "A1,Gatorade (Blue),2.00,5",
+                "A1,Gatorade (Blue),2.25,1",
+                "B2,Chips Ahoy,0.90,4",
+                "D1,Water,1.00,6",
+            )
+        )
+
+        assert restocked
+        self.logs_one_message(caplog)
+        assert "Restocked 3 slots from 4 manifest rows." in caplog.text
+        assert machine.items["A1"] == Item("Gatorade (Blue)", money.Money.of("2.25"), 9)
+        assert machine.items["B2"] == Item("Chips Ahoy", money.Money.of("0.90"), 4)
+        assert machine.items["D1"].remaining_stock == 6
+
+        caplog.clear()
+        machine.view_items(column="D")
+        assert "D1: Water" in caplog.text
+
+    def test_bad_row_restocks_nothing(self, machine: VendingMachine, caplog):
+        """
+        Test case ensures a manifest with an invalid row doesn't restock
+        any of it, and says which line was wrong.
+        """
+
+        changes = []
+        machine.on_change = changes.append
+        before = machine.to_json()
+
+        assert not machine.restock(
+            self.manifest("A1,Gatorade (Blue),2.00,5", "B2,Oreos,free,4")
+        )
+
+        self.logs_one_message(caplog)
+        assert "Line 3" in caplog.text
+        assert "Nothing was restocked." in caplog.text
+        assert machine.to_json() == before
+        assert not changes
+
+    def test_restock_refused_by_storage_restocks_nothing(
+        self, machine: VendingMachine, caplog
+    ):
+        """
+        Test case ensures a restock the storage backend can't hold, like a
+        name too long for its records, leaves the machine as it was.
+        """
+
+        def refuse(_):
+            raise ValueError("Too long.")
+
+        machine.on_change = refuse
+        before = machine.to_json()
+
+        assert not machine.restock(
+            self.manifest("A1," + "L" * 40 + ",2.00,5", "E7,Water,1.00,6")
+        )
+
+        assert "Too long. Nothing was restocked." in caplog.text
+        assert machine.to_json() == before
+        assert "E7" not in machine.items
+
+    def test_restock_is_one_change_record(self, machine: VendingMachine):
+        """
+        Test case ensures storage backends get the whole restock as a
+        single change record, which replays to the same machine.
+        """
+
+        changes = []
+        machine.on_change = changes.append
+        replayed = VendingMachine()
+
+        machine.restock(self.manifest("A1,Gatorade (Blue),2.00,5", "E7,Water,1.00,6"))
+
+        assert len(changes) == 1
+        replayed.apply(changes[0])
+        assert replayed.to_json() == machine.to_json()
+
+
 class TestDeposit(BaseLogTestingMixin):
     @given(
         deposit=st.decimals(
@@ -292,6 +489,8 @@ class TestDispenseChange(BaseLogTestingMixin):
         regardless of size of previous deposits
         """
 
+        # Deposits get rounded to the nearest cent as they come in.
+        deposit = money.to_money(deposit)
         machine.deposit(deposit)
         machine.deposit(deposit)
 
@@ -300,6 +499,174 @@ class TestDispenseChange(BaseLogTestingMixin):
         assert machine.balance == Decimal(0)
 
 
+class TestExactChange(BaseLogTestingMixin):
+    def test_dispense_pays_out_fewest_pieces(self, machine: VendingMachine, caplog):
+        """
+        Test case ensures change comes out of the machine's coins and
+        bills in the fewest pieces, and says which.
+        """
+
+        machine.deposit(Decimal(20))
+        machine.purchase_item("A1")
+        before = dict(machine.coins)
+        caplog.clear()
+
+        machine.dispense_change()
+
+        assert "as 1 x 10.00, 1 x 5.00, 3 x 1.00, 1 x 0.25." in caplog.text
+        assert machine.coins[1000] == before[1000] - 1
+        assert machine.coins[25] == before[25] - 1
+
+    def test_purchase_without_change_is_refused(self, caplog):
+        """
+        Test case ensures a purchase the machine couldn't give change for
+        is refused before anything changes, while exact amounts still go
+        through.
+        """
+
+        machine = VendingMachine(coins={})
+        machine.deposit(Decimal(2))
+        before = machine.to_json()
+        caplog.clear()
+
+        machine.purchase_item("A1")
+        self.logs_one_message(caplog)
+        assert "Exact change only" in caplog.text
+        assert "0.25" in caplog.text
+        assert machine.to_json() == before
+
+        assert not machine.purchase_many(["C4", "C4"])
+        assert machine.to_json() == before
+
+        assert machine.purchase_many(["C4", "A5", "C5", "C4"])
+        assert machine.balance == Decimal(0)
+
+    def test_deposited_coins_pay_change(self):
+        """
+        Test case ensures the coins a customer pays in can be given back
+        as change, and dispensing leaves the inventory as it started.
+        """
+
+        machine = VendingMachine(coins={})
+        machine.deposit(Decimal("0.50"))
+        machine.deposit(Decimal("0.50"))
+
+        machine.purchase_item("C4")
+        machine.dispense_change()
+
+        assert machine.coins == {25: 1}
+
+    def test_coins_survive_json(self, loaded_machine: VendingMachine):
+        """
+        Test case ensures the coin inventory is saved with the machine,
+        and machines saved without one start from the float.
+        """
+
+        dumped = loaded_machine.to_json()
+        assert VendingMachine.from_json(dumped).coins == loaded_machine.coins
+
+        del dumped["coins"]
+        assert VendingMachine.from_json(dumped).coins[1000] == 6
+
+
+class TestSales(BaseLogTestingMixin):
+    def test_purchases_update_aggregates(self, loaded_machine: VendingMachine):
+        """
+        Test case ensures successful purchases are counted in the running
+        aggregates, and failed ones aren't.
+        """
+
+        loaded_machine.purchase_item("A1")
+        loaded_machine.purchase_item("A1")
+        loaded_machine.purchase_item("ABC123")
+
+        price = loaded_machine.items["A1"].price
+        assert loaded_machine.sales.units == 2
+        assert loaded_machine.sales.revenue == price * 2
+        assert loaded_machine.sales.by_position["A1"].units == 2
+        assert loaded_machine.verify_sales() == []
+
+    def test_aggregates_survive_json(self, loaded_machine: VendingMachine):
+        """
+        Test case ensures the aggregates are saved along with the machine.
+        """
+
+        loaded_machine.purchase_item("B1")
+        loaded = VendingMachine.from_json(loaded_machine.to_json())
+
+        assert loaded.sales_loaded
+        assert loaded.sales == loaded_machine.sales
+
+    def test_missing_aggregates_get_recomputed(self, loaded_machine: VendingMachine):
+        """
+        Test case ensures states saved before aggregates existed get them
+        computed from their purchase history.
+        """
+
+        loaded_machine.purchase_item("B1")
+        dumped = loaded_machine.to_json()
+        del dumped["sales"]
+
+        loaded = VendingMachine.from_json(dumped)
+        loaded.purchase_item("B1")
+
+        assert loaded.sales.units == 2
+
+    def test_restocked_slot_keeps_its_history(
+        self, loaded_machine: VendingMachine, caplog
+    ):
+        """
+        Test case ensures restocking a slot with a different item leaves
+        what was bought from it before attributed to the old item.
+        """
+
+        old_name = loaded_machine.items["A1"].name
+        loaded_machine.purchase_item("A1")
+        loaded_machine.restock(
+            [RestockRow(2, "A1", "Lemonade", money.Money.of("2.00"), 5)]
+        )
+        loaded_machine.purchase_item("A1")
+        caplog.clear()
+
+        loaded_machine.view_purchases()
+
+        assert [purchase.name for purchase in loaded_machine.purchases] == [
+            old_name,
+            "Lemonade",
+        ]
+        assert f"0: {old_name} costs" in caplog.text
+        assert loaded_machine.sales.by_item[old_name].units == 1
+        assert loaded_machine.verify_sales() == []
+
+    def test_verify_logs_drift(self, loaded_machine: VendingMachine, caplog):
+        """
+        Test case ensures verifying reports tallies that no longer match
+        the purchase history.
+        """
+
+        loaded_machine.purchase_item("A1")
+        loaded_machine.sales.total.units = 5
+        caplog.clear()
+
+        loaded_machine.view_sales(verify=True)
+
+        assert "ERROR" in caplog.text
+        assert "drifted" in caplog.text
+
+    def test_verify_logs_success(self, loaded_machine: VendingMachine, caplog):
+        """
+        Test case ensures matching aggregates get confirmed.
+        """
+
+        loaded_machine.purchase_item("A1")
+        caplog.clear()
+
+        loaded_machine.view_sales(verify=True)
+
+        assert "Sold 1 items" in caplog.text
+        assert "SUCCESS" in caplog.text
+
+
 class TestViewItems(BaseLogTestingMixin):
     def test_invalid_position_logs_error(self, machine: VendingMachine, caplog):
         """
@@ -330,6 +697,39 @@ class TestViewItems(BaseLogTestingMixin):
         machine.view_items()
         assert len(caplog.records) == len(machine.items)
 
+    def test_multi_digit_rows_filter_exactly(self, caplog):
+        """
+        Test case ensures filtering by row 1 doesn't pick up rows 10 to 19,
+        and that positions come back in grid order rather than as sorted
+        strings.
+        """
+
+        machine = VendingMachine(
+            items={
+                f"{column}{row}": Item("Chips", Decimal("1.00"), 1)
+                for column in "AB"
+                for row in range(1, 13)
+            }
+        )
+
+        def listed_positions():
+            return [
+                re.search(r"([A-Z]+\d+): ", record.msg).group(1)
+                for record in caplog.records
+            ]
+
+        machine.view_items(row=1)
+        assert listed_positions() == ["A1", "B1"]
+
+        caplog.clear()
+        machine.view_items(column="A")
+        assert listed_positions() == [f"A{row}" for row in range(1, 13)]
+
+        caplog.clear()
+        machine.view_items("B", 11)
+        self.logs_one_message(caplog)
+        assert "B11:" in caplog.text
+
 
 def test_to_and_from_json_inverse(loaded_machine):
     """
@@ -3,3 +3,34 @@ import os
 HERE = os.path.abspath(os.path.dirname(__file__))
 PROJECT_ROOT = os.path.join(HERE, os.pardir)
 STATE_FILE_LOCATION = os.path.join(PROJECT_ROOT, "state.json")
+JOURNAL_FILE_LOCATION = os.path.join(PROJECT_ROOT, "state.journal")
+SQLITE_FILE_LOCATION = os.path.join(PROJECT_ROOT, "state.db")
+INVENTORY_FILE_LOCATION = os.path.join(PROJECT_ROOT, "state.inventory")
+PURCHASES_FILE_LOCATION = os.path.join(PROJECT_ROOT, "state.purchases")
+SOCKET_LOCATION = os.path.join(PROJECT_ROOT, "vending-machine.sock")
+
+# Which storage backend the CLI persists the machine with. See
+# vending_machine/storage for the available options.
+STORAGE_BACKEND = os.environ.get("VENDING_MACHINE_STORAGE", "json")
+
+# Format snapshots get saved in, one of STATE_FORMATS. Either one is
+# detected when loading, so this can be switched at any time.
+STATE_FORMATS = ("json", "binary")
+STATE_FORMAT = os.environ.get("VENDING_MACHINE_STATE_FORMAT", "json")
+
+# Once the journal grows past either limit it gets folded into a fresh
+# snapshot, which bounds how much has to be replayed on start up.
+JOURNAL_MAX_RECORDS = int(os.environ.get("VENDING_MACHINE_JOURNAL_MAX_RECORDS", 10000))
+JOURNAL_MAX_BYTES = int(os.environ.get("VENDING_MACHINE_JOURNAL_MAX_BYTES", 1 << 20))
+
+# How hard saves are pushed onto the disk: "none", "flush" or "fsync".
+# See vending_machine/storage/durability.py for what each one survives.
+DURABILITY = os.environ.get("VENDING_MACHINE_DURABILITY", "fsync")
+
+# Directory to write counters and latency histograms to after every
+# command. Unset, nothing gets measured. See vending_machine/utils/metrics.py.
+METRICS_DIRECTORY = os.environ.get("VENDING_MACHINE_METRICS")
+
+# Set to write output from a background thread, so commands never wait
+# on a slow terminal or pipe.
+BACKGROUND_OUTPUT = bool(os.environ.get("VENDING_MACHINE_BACKGROUND_OUTPUT"))
@@ -5,25 +5,138 @@ is very basic, with a lot of the heavy lifting
 being done by vending_machine/core
 """
 
-import json
-import os
+import sys
+
+if __name__ == "__main__":
+    # If a daemon is running, hand the command to it before paying for
+    # any of the imports below.
+    from vending_machine.server.client import forward
+
+    _EXIT_CODE = forward(sys.argv[1:])
+    if _EXIT_CODE is not None:
+        sys.exit(_EXIT_CODE)
+
+# pylint: disable=wrong-import-position
 from decimal import Decimal
+from typing import TYPE_CHECKING, Optional, Tuple
 
 import click
 
+from vending_machine import BACKGROUND_OUTPUT, SOCKET_LOCATION, STATE_FORMATS
+from vending_machine.core.exceptions import CorruptStateError
+from vending_machine.core.grid import parse_position
+from vending_machine.core.manifest import FORMATS as MANIFEST_FORMATS
+from vending_machine.core.manifest import guess_format, read_manifest
 from vending_machine.core.vending_machine import VendingMachine
-from vending_machine.ui.printer import fancy_print
-from . import STATE_FILE_LOCATION
+from vending_machine.storage import Storage, get_storage
+from vending_machine.ui import printer
+from vending_machine.ui.printer import OUTPUT_FORMATS, fancy_print, print_record
+from vending_machine.utils import metrics
+from vending_machine.utils.metrics import timer
+
+if TYPE_CHECKING:
+    from datetime import datetime
 
 LOG_ERROR = "error"
 LOG_SUCCESS = "success"
 LOG_HELP = "info"
 
 
-@click.group()
-def cli():
+def current_storage() -> Storage:
+    """
+    The storage commands should load from and commit to. Inside the
+    daemon that's the resident machine it passes in as the click
+    context object, everywhere else the configured backend.
+    """
+
+    ctx = click.get_current_context(silent=True)
+    resident = ctx.find_object(Storage) if ctx is not None else None
+
+    return resident if resident is not None else get_storage()
+
+
+def load_machine(storage: Storage) -> Optional[VendingMachine]:
+    """
+    Loads the existing vending machine, telling the user
+    to create one first if there isn't one yet.
+    """
+
+    if not storage.exists():
+        fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
+        return None
+
+    with timer("state_load"):
+        machine = storage.load()
+    if storage.recovered:
+        fancy_print(
+            LOG_ERROR,
+            "The saved vending machine was damaged, so the last good copy "
+            "of it was loaded instead. Recent changes may be missing.",
+        )
+
+    return machine
+
+
+def refuse_under_daemon() -> None:
+    """
+    Raises a ClickException if a daemon is running, for the commands that
+    can't be forwarded to it. The daemon keeps the machine locked until
+    it stops, so they'd only wait for it.
+    """
+
+    from vending_machine.server.client import daemon_running
+
+    if daemon_running(SOCKET_LOCATION):
+        raise click.ClickException(
+            "The vending machine is being served by `serve`. Stop it first."
+        )
+
+
+class Commands(click.Group):
+    """
+    The CLI's commands, which report the saved machine turning out to be
+    damaged partway through one (say in a purchase history that only gets
+    read when it's needed) as an error rather than a traceback.
+    """
+
+    def invoke(self, ctx: click.Context):
+        try:
+            return super().invoke(ctx)
+        except CorruptStateError as error:
+            raise click.ClickException(str(error))
+
+
+@click.group(cls=Commands)
+@click.option(
+    "--output",
+    type=click.Choice(OUTPUT_FORMATS),
+    default="text",
+    help="Print JSON (listings as one array) or NDJSON records instead of text.",
+)
+@click.pass_context
+def cli(ctx: click.Context, output: str = "text"):
     """A simple command line tool"""
 
+    # Put back once the command is done, since the daemon and batches
+    # run many.
+    previous, printer.OUTPUT = printer.OUTPUT, output
+    ctx.call_on_close(lambda: setattr(printer, "OUTPUT", previous))
+
+    if metrics.REGISTRY is not None:
+        ctx.call_on_close(lambda: metrics.export(ctx.invoked_subcommand))
+
+    # Not inside the daemon, which captures output to send back instead,
+    # for the servers, or for the shell, where it'd end up behind prompts.
+    if (
+        BACKGROUND_OUTPUT
+        and ctx.find_object(Storage) is None
+        and ctx.invoked_subcommand not in ("serve", "serve-sessions", "shell")
+    ):
+        from vending_machine.utils import GLOBAL_LOGGER
+        from vending_machine.utils.logger import write_in_background
+
+        write_in_background(GLOBAL_LOGGER)
+
 
 @cli.command()
 def start():
@@ -33,15 +146,16 @@ def start():
     not touched.
     """
 
-    if os.path.isfile(STATE_FILE_LOCATION):
-        fancy_print(
-            LOG_HELP, "An existing vending machine exists. Proceeding with that."
-        )
-        return None
+    storage = current_storage()
+    with storage.locked():
+        if storage.exists():
+            fancy_print(
+                LOG_HELP, "An existing vending machine exists. Proceeding with that."
+            )
+            return None
 
-    machine = VendingMachine()
-    with open(STATE_FILE_LOCATION, "w") as file:
-        json.dump(machine.to_json(), file)
+        with timer("state_save"):
+            storage.save(VendingMachine())
 
     fancy_print(LOG_SUCCESS, "Vending machine created.")
 
@@ -54,11 +168,13 @@ def destroy():
     Destroys the state of the vending machine without rebuilding a new one.
     If no existing machine exists, nothing happens.
     """
-    if os.path.isfile(STATE_FILE_LOCATION):
-        os.remove(STATE_FILE_LOCATION)
-        fancy_print(LOG_SUCCESS, "Vending machine destroyed.")
-    else:
-        fancy_print(LOG_HELP, "No vending machine found. Doing nothing.")
+    storage = current_storage()
+    with storage.locked():
+        if storage.exists():
+            storage.destroy()
+            fancy_print(LOG_SUCCESS, "Vending machine destroyed.")
+        else:
+            fancy_print(LOG_HELP, "No vending machine found. Doing nothing.")
 
 
 @cli.command()
@@ -83,17 +199,18 @@ def view_items(column: str = None, row: int = None, position: str = None):
     Viewing what items are in the machine. Filters are additive.
     """
 
-    if not os.path.isfile(STATE_FILE_LOCATION):
-        fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
-        return None
-
-    with open(STATE_FILE_LOCATION) as file:
-        loaded = json.load(file)
-
-    machine = VendingMachine.from_json(loaded)
-    if position:
-        machine.view_items(position[0], position[1])
-    else:
+    storage = current_storage()
+    with storage.locked(shared=True):
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+        if position:
+            try:
+                column, row = parse_position(position)
+            except ValueError:
+                fancy_print(LOG_ERROR, f"{position} isn't a slot on this machine.")
+                return None
         machine.view_items(column, row)
 
     return None
@@ -106,18 +223,71 @@ def add_money(amount: float):
     Adding money to the existing vending machine. If no machine exists, error is thrown.
     """
 
-    if not os.path.isfile(STATE_FILE_LOCATION):
-        fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
-        return None
+    storage = current_storage()
+    with storage.locked():
+        machine = load_machine(storage)
+        if machine is None:
+            return None
 
-    with open(STATE_FILE_LOCATION) as file:
-        loaded = json.load(file)
+        machine.deposit(Decimal(amount))
 
-    machine = VendingMachine.from_json(loaded)
-    machine.deposit(Decimal(amount))
+        with timer("state_commit"):
+            storage.commit(machine)
+
+    return None
 
-    with open(STATE_FILE_LOCATION, "w") as file:
-        json.dump(machine.to_json(), file)
+
+@cli.command()
+@click.argument("positions", nargs=-1, required=True)
+def purchase(positions: Tuple[str, ...]):
+    """
+    Purchases the items at the given positions as one order: if the
+    balance or stock doesn't cover all of them, none get purchased.
+    If no machine exists, error is thrown.
+    """
+
+    storage = current_storage()
+    with storage.locked():
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+        if machine.purchase_many(position.upper() for position in positions):
+            with timer("state_commit"):
+                storage.commit(machine)
+
+    return None
+
+
+@cli.command()
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "manifest_format",
+    type=click.Choice(MANIFEST_FORMATS),
+    help="Format of the manifest. Guessed from its file name by default.",
+)
+@click.option("--machine", "machine_id", help="Only use the rows for this machine.")
+def restock(manifest: str, manifest_format: str = None, machine_id: str = None):
+    """
+    Restocks and reprices slots from a CSV or NDJSON manifest of
+    position, name, price and quantity rows. If no machine exists, error
+    is thrown.
+    """
+
+    storage = current_storage()
+    with storage.locked():
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+        with open(manifest, newline="") as file:
+            rows = read_manifest(
+                file, manifest_format or guess_format(manifest), machine_id
+            )
+            if machine.restock(rows):
+                with timer("state_commit"):
+                    storage.commit(machine)
 
     return None
 
@@ -128,33 +298,86 @@ def view_balance():
     Views the current balance you have in the machine. If no machine exists, error is thrown.
     """
 
-    if not os.path.isfile(STATE_FILE_LOCATION):
-        fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
-        return None
+    storage = current_storage()
+    with storage.locked(shared=True):
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+    if printer.OUTPUT != "text":
+        print_record({"balance": str(machine.balance)})
+    else:
+        fancy_print(LOG_SUCCESS, f"Your current balance is {machine.balance}.")
+
+    return None
+
+
+@cli.command()
+def view_coins():
+    """
+    Views the coins and bills the machine holds to give change with. If no machine exists, error is thrown.
+    """
 
-    with open(STATE_FILE_LOCATION) as file:
-        loaded = json.load(file)
+    storage = current_storage()
+    with storage.locked(shared=True):
+        machine = load_machine(storage)
+        if machine is None:
+            return None
 
-    machine = VendingMachine.from_json(loaded)
-    fancy_print(LOG_SUCCESS, f"Your current balance is {machine.balance}.")
+    machine.view_coins()
 
     return None
 
 
 @cli.command()
-def view_purchases():
+@click.option(
+    "--limit", type=click.IntRange(min=0), help="Show at most this many purchases."
+)
+@click.option(
+    "--offset",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Skip this many purchases first.",
+)
+@click.option(
+    "--since", type=click.DateTime(), help="Only show purchases made since then."
+)
+def view_purchases(limit: int = None, offset: int = 0, since: "datetime" = None):
     """
     Views all purchases. If no machine exists, error is thrown.
     """
-    if not os.path.isfile(STATE_FILE_LOCATION):
-        fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
-        return None
+    storage = current_storage()
+    with storage.locked(shared=True):
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+        machine.view_purchases(
+            offset=offset,
+            limit=limit,
+            since=since.timestamp() if since is not None else None,
+        )
 
-    with open(STATE_FILE_LOCATION) as file:
-        loaded = json.load(file)
+    return None
 
-    machine = VendingMachine.from_json(loaded)
-    machine.view_purchases()
+
+@cli.command()
+@click.option(
+    "--verify",
+    is_flag=True,
+    help="Recompute the totals from the purchase history and report any drift.",
+)
+def view_sales(verify: bool = False):
+    """
+    Views how much was sold, overall and per item. If no machine exists, error is thrown.
+    """
+    storage = current_storage()
+    with storage.locked(shared=True):
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+        machine.view_sales(verify)
 
     return None
 
@@ -165,18 +388,276 @@ def dispense_change():
     Removing the money from the existing vending machine. If no machine exists, error is thrown.
     """
 
-    if not os.path.isfile(STATE_FILE_LOCATION):
-        fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
+    storage = current_storage()
+    with storage.locked():
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+        machine.dispense_change()
+
+        with timer("state_commit"):
+            storage.commit(machine)
+
+    return None
+
+
+@cli.command()
+def compact():
+    """
+    Folds the journal into a fresh snapshot. Only does anything with the
+    journal storage backend.
+    """
+
+    from vending_machine.storage import JournalStorage, ResidentStorage
+
+    # Inside the daemon, the resident machine's own storage gets compacted,
+    # so the journal it has open isn't removed from under it.
+    storage, machine = current_storage(), None
+    if isinstance(storage, ResidentStorage):
+        storage, machine = storage.storage, storage.machine
+    if not isinstance(storage, JournalStorage):
+        fancy_print(LOG_HELP, "Storage backend has no journal. Doing nothing.")
         return None
 
-    with open(STATE_FILE_LOCATION) as file:
-        loaded = json.load(file)
+    with storage.locked():
+        if not storage.exists():
+            fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
+            return None
+
+        with timer("state_compact"):
+            report = storage.compact(machine)
+    fancy_print(
+        LOG_SUCCESS,
+        f"Folded {report.records_folded} journal records into the snapshot, "
+        f"reclaiming {report.bytes_reclaimed} bytes. "
+        f"Replay took {report.replay_seconds * 1000:.2f}ms.",
+    )
+
+    return None
+
+
+@cli.command()
+@click.argument("state_format", type=click.Choice(STATE_FORMATS))
+def convert(state_format: str):
+    """
+    Rewrites the saved machine in another format, json or binary. Set
+    VENDING_MACHINE_STATE_FORMAT to keep saving it that way.
+    """
+
+    from vending_machine.storage import JsonStorage, JournalStorage, ResidentStorage
+
+    # Inside the daemon, the resident machine gets saved through its own
+    # storage, which the daemon keeps locked, and stays the one served.
+    storage, machine = current_storage(), None
+    if isinstance(storage, ResidentStorage):
+        storage, machine = storage.storage, storage.machine
+    if not isinstance(storage, (JsonStorage, JournalStorage)):
+        fancy_print(LOG_HELP, "Storage backend doesn't use snapshots. Doing nothing.")
+        return None
+
+    with storage.locked():
+        if not storage.exists():
+            fancy_print(LOG_ERROR, "Please initialize the vending machine first.")
+            return None
+
+        storage.state_format = state_format
+        if machine is None:
+            with timer("state_load"):
+                machine = storage.load()
+        with timer("state_save"):
+            storage.save(machine)
+    fancy_print(LOG_SUCCESS, f"Saved the vending machine as {state_format}.")
+
+    return None
 
-    machine = VendingMachine.from_json(loaded)
-    machine.dispense_change()
 
-    with open(STATE_FILE_LOCATION, "w") as file:
-        json.dump(machine.to_json(), file)
+@cli.command()
+@click.argument("commands", type=click.File("r"), default="-")
+@click.option(
+    "--every",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Save after this many changes too, not only at the end.",
+)
+@click.pass_context
+def batch(ctx: click.Context, commands, every: int = 0):
+    """
+    Runs commands, one per line, from a file (or stdin) against the
+    vending machine kept in memory, saving it once at the end. Lines
+    look like the command line would, e.g. `purchase A1`, and blank
+    lines and # comments are skipped. Other commands wait for the batch
+    to finish.
+    """
+
+    # Lazy imports, like the daemon, only batches need the runner
+    import shlex
+    from vending_machine.server.runner import CommandRunner
+
+    refuse_under_daemon()
+    runner = CommandRunner(
+        cli, get_storage(), every=every, options=["--output", printer.OUTPUT]
+    )
+    ran, failed = 0, []
+    try:
+        for number, line in enumerate(commands, start=1):
+            try:
+                argv = shlex.split(line, comments=True)
+            except ValueError as error:
+                fancy_print(LOG_ERROR, f"Line {number}: {error}.")
+                failed.append(number)
+                continue
+            if not argv:
+                continue
+
+            ran += 1
+            if runner.run(argv) != 0:
+                failed.append(number)
+    finally:
+        runner.close()
+
+    if failed:
+        fancy_print(
+            LOG_ERROR,
+            f"Ran {ran} commands, saving {runner.saves} times. "
+            f"Failed on lines {', '.join(map(str, failed))}.",
+        )
+        ctx.exit(1)
+    fancy_print(LOG_SUCCESS, f"Ran {ran} commands, saving {runner.saves} times.")
+
+    return None
+
+
+@cli.command()
+@click.option(
+    "--every",
+    type=click.IntRange(min=0),
+    default=20,
+    help="Save after this many changes. 0 to not save by count.",
+)
+@click.option(
+    "--seconds",
+    type=click.FloatRange(min=0),
+    default=5.0,
+    help="Save this often if anything changed. 0 to not save by time.",
+)
+def shell(every: int = 20, seconds: float = 5.0):
+    """
+    Prompts for commands, like `add-money 2` or `purchase A1`, and runs
+    them against the vending machine kept in memory until `exit` or
+    Ctrl-D. The machine is saved every so many changes or seconds, and
+    when the shell exits. Other commands wait for the shell to exit.
+    """
+
+    # Lazy imports, like the daemon, only the shell needs the runner
+    import shlex
+    from vending_machine.server.runner import CommandRunner
+
+    refuse_under_daemon()
+    try:
+        import readline  # pylint: disable=unused-import
+    except ImportError:
+        # Not available on every platform, prompts just go without history.
+        pass
+
+    runner = CommandRunner(
+        cli,
+        get_storage(),
+        every=every,
+        seconds=seconds,
+        options=["--output", printer.OUTPUT],
+    )
+    fancy_print(LOG_HELP, "Type a command, --help to list them, or exit to leave.")
+
+    try:
+        while True:
+            try:
+                argv = shlex.split(input("vending_machine> "))
+            except ValueError as error:
+                fancy_print(LOG_ERROR, f"{error}.")
+                continue
+            except KeyboardInterrupt:
+                # Drops the line being typed, like other shells.
+                click.echo()
+                continue
+            except EOFError:
+                click.echo()
+                break
+
+            if argv in (["exit"], ["quit"]):
+                break
+            if argv:
+                try:
+                    runner.run(argv)
+                except click.Abort:
+                    # Ctrl-C while a command ran, which click turns into
+                    # this. Back to the prompt.
+                    pass
+    finally:
+        runner.close()
+
+    fancy_print(LOG_SUCCESS, "Vending machine saved. Shell closed.")
+
+    return None
+
+
+@cli.command()
+def serve():
+    """
+    Keeps the vending machine in memory behind a local socket until
+    interrupted. While it runs, every other command is forwarded to it.
+    """
+
+    # Lazy import, the daemon is the only thing that needs sockets and threads
+    import signal
+    from vending_machine.server.daemon import Daemon
+
+    daemon = Daemon(cli, get_storage())
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    fancy_print(LOG_SUCCESS, f"Serving on {SOCKET_LOCATION}. Press Ctrl-C to stop.")
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+        fancy_print(LOG_SUCCESS, "Vending machine saved. Daemon stopped.")
+
+
+@cli.command()
+@click.option("--host", default="127.0.0.1", help="Address to listen on.")
+@click.option("--port", default=8765, help="Port to listen on.")
+def serve_sessions(host: str, port: int):
+    """
+    Serves many concurrent customer sessions over TCP, each with its own
+    balance, against the shared inventory. Runs until interrupted, and
+    other commands wait for it to stop.
+    """
+
+    import asyncio
+    from vending_machine.server.sessions import SessionServer
+
+    refuse_under_daemon()
+    storage = get_storage()
+    # Locked until the server stops, so no other command changes the
+    # machine behind the server's back, only to be overwritten by its
+    # next checkpoint. They wait for it instead.
+    with storage.locked():
+        machine = load_machine(storage)
+        if machine is None:
+            return None
+
+        server = SessionServer(machine, storage)
+        fancy_print(
+            LOG_SUCCESS, f"Serving sessions on {host}:{port}. Press Ctrl-C to stop."
+        )
+
+        try:
+            asyncio.run(server.serve_forever(host, port))
+        except KeyboardInterrupt:
+            server.checkpoint()
+            fancy_print(LOG_SUCCESS, "Vending machine saved. Server stopped.")
 
     return None
 
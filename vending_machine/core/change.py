@@ -0,0 +1,219 @@
+"""
+The coins and bills a machine holds, and paying change out of them.
+Amounts are whole cents, and an inventory maps each denomination (in
+cents) to how many of it the machine holds.
+
+Change is paid in the fewest pieces the inventory allows. For coin
+systems where handing out the largest piece that fits is always best
+(canonical ones, like the US coins), that greedy pass is the answer as
+long as it never runs short of a denomination. Otherwise, a memoized
+search over how many of each denomination to use finds the fewest
+pieces, or that the amount can't be paid exactly at all.
+"""
+
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# $20, $10, $5 and $1 bills, then quarters, dimes, nickels and pennies.
+DENOMINATIONS = (2000, 1000, 500, 100, 25, 10, 5, 1)
+
+# What a new machine is loaded with to make change from.
+FLOAT = {2000: 0, 1000: 5, 500: 10, 100: 40, 25: 80, 10: 50, 5: 40, 1: 100}
+
+Coins = Dict[int, int]
+
+
+def breakdown(cents: int, denominations: Tuple[int, ...] = DENOMINATIONS) -> Coins:
+    """
+    The fewest pieces making up the amount with no limit on any of them,
+    taken to be how a deposit was paid in.
+    """
+
+    coins = {}
+    for denomination in denominations:
+        count, cents = divmod(cents, denomination)
+        if count:
+            coins[denomination] = count
+    return coins
+
+
+@lru_cache(maxsize=None)
+def is_canonical(denominations: Tuple[int, ...]) -> bool:
+    """
+    Whether greedy change is always the fewest pieces with these
+    denominations (largest first). If it isn't, there's an amount below
+    the sum of the two largest where it goes wrong (Kozen and Zaks), so
+    those are all checked against the fewest pieces possible.
+    """
+
+    smallest = denominations[-1]
+    if any(denomination % smallest for denomination in denominations):
+        # Greedy can miss amounts that are payable, like 30 with 25s and 10s.
+        return False
+    units = [denomination // smallest for denomination in denominations]
+    if len(units) < 3:
+        return True
+
+    bound = units[0] + units[1]
+    fewest = [0] + [bound] * bound
+    for amount in range(1, bound):
+        fewest[amount] = 1 + min(
+            fewest[amount - unit] for unit in units if unit <= amount
+        )
+        remaining, greedy = amount, 0
+        for unit in units:
+            count, remaining = divmod(remaining, unit)
+            greedy += count
+        if greedy > fewest[amount]:
+            return False
+    return True
+
+
+def _fewest(
+    cents: int, denominations: Tuple[int, ...], supply: Tuple[int, ...]
+) -> Optional[Tuple[int, ...]]:
+    """
+    How many of each denomination pay the amount in the fewest pieces
+    the supply allows, or None if it can't be paid exactly.
+    """
+
+    # The value of everything smaller than each denomination, which is
+    # the most that can be left over for them.
+    below = [0] * len(denominations)
+    total = 0
+    for index in range(len(denominations) - 1, -1, -1):
+        below[index] = total
+        total += denominations[index] * supply[index]
+    if total < cents:
+        return None
+
+    last = len(denominations) - 1
+    memo: Dict[Tuple[int, int], Optional[Tuple[int, Tuple[int, ...]]]] = {}
+
+    def search(index: int, remaining: int) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        if remaining == 0:
+            return 0, (0,) * (len(denominations) - index)
+        key = (index, remaining)
+        if key in memo:
+            return memo[key]
+
+        denomination = denominations[index]
+        most = min(supply[index], remaining // denomination)
+        # Using fewer than this leaves more than the smaller pieces can pay.
+        least = max(0, -(-(remaining - below[index]) // denomination))
+        found = None
+        if index == last:
+            if most * denomination == remaining:
+                found = most, (most,)
+        elif index == last - 1:
+            # With two denominations left, every larger piece saves some
+            # smaller ones, so the most of it that works is the fewest.
+            smaller = denominations[last]
+            for count in range(most, least - 1, -1):
+                rest, leftover = divmod(remaining - count * denomination, smaller)
+                if not leftover and rest <= supply[last]:
+                    found = count + rest, (count, rest)
+                    break
+        else:
+            following = denominations[index + 1]
+            for count in range(most, least - 1, -1):
+                rest_cents = remaining - count * denomination
+                # At best the rest is paid in the next largest pieces, which
+                # only gets worse with fewer of this one.
+                if found is not None and count - (-rest_cents // following) >= found[0]:
+                    break
+                rest = search(index + 1, rest_cents)
+                if rest is not None and (found is None or count + rest[0] < found[0]):
+                    found = count + rest[0], (count,) + rest[1]
+
+        memo[key] = found
+        return found
+
+    found = search(0, cents)
+    return found[1] if found is not None else None
+
+
+@lru_cache(maxsize=4096)
+def _make_change(
+    cents: int, denominations: Tuple[int, ...], supply: Tuple[int, ...]
+) -> Optional[Tuple[int, ...]]:
+    counts = []
+    remaining = cents
+    short = False
+    for denomination, available in zip(denominations, supply):
+        count = remaining // denomination
+        if count > available:
+            count, short = available, True
+        counts.append(count)
+        remaining -= count * denomination
+
+    if remaining == 0 and not short and is_canonical(denominations):
+        return tuple(counts)
+    return _fewest(cents, denominations, supply)
+
+
+def make_change(cents: int, coins: Coins) -> Optional[Coins]:
+    """
+    The fewest pieces out of the inventory that pay the amount exactly,
+    or None if the inventory can't. Answers are cached by amount and
+    inventory, so asking again before anything changes is a lookup.
+    """
+
+    if cents == 0:
+        return {}
+    denominations = tuple(
+        sorted(
+            (denomination for denomination, count in coins.items() if count > 0),
+            reverse=True,
+        )
+    )
+    if not denominations:
+        return None
+
+    supply = tuple(coins[denomination] for denomination in denominations)
+    counts = _make_change(cents, denominations, supply)
+    if counts is None:
+        return None
+    return {
+        denomination: count
+        for denomination, count in zip(denominations, counts)
+        if count
+    }
+
+
+def add_coins(coins: Coins, added: Coins) -> None:
+    """
+    Adds pieces to an inventory.
+    """
+
+    for denomination, count in added.items():
+        coins[denomination] = coins.get(denomination, 0) + count
+
+
+def remove_coins(coins: Coins, removed: Coins) -> None:
+    """
+    Takes pieces out of an inventory, raising a ValueError if it doesn't
+    hold enough of them.
+    """
+
+    for denomination, count in removed.items():
+        if coins.get(denomination, 0) < count:
+            raise ValueError(f"Not enough {denomination} cent pieces to take {count}.")
+    for denomination, count in removed.items():
+        coins[denomination] -= count
+
+
+def dump_coins(coins: Coins) -> Dict[str, int]:
+    """
+    The inventory with string keys, as JSON needs them.
+    """
+
+    return {str(denomination): count for denomination, count in coins.items()}
+
+
+def load_coins(dumped: Dict[str, int]) -> Coins:
+    """
+    Inverse of dump_coins.
+    """
+
+    return {int(denomination): count for denomination, count in dumped.items()}
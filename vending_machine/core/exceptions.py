@@ -25,3 +25,22 @@ class InvalidLocationError(Exception):
     """
 
     pass
+
+
+class ExactChangeError(Exception):
+    """
+    This exception should get thrown when someone tries to purchase an item
+    and the machine couldn't pay back the balance left afterwards with the
+    coins and bills it holds.
+    """
+
+    pass
+
+
+class CorruptStateError(ValueError):
+    """
+    This exception should get thrown when the saved vending machine turns
+    out to be damaged, like a snapshot section not matching its checksum.
+    """
+
+    pass
@@ -0,0 +1,72 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+POSITION_PATTERN = re.compile(r"([A-Z]+)(\d+)")
+
+
+def parse_position(position: str) -> Tuple[str, int]:
+    """
+    Splits a position like "B12" into its column letter(s) and row number.
+    Raises a ValueError for anything that isn't a position.
+    """
+
+    match = POSITION_PATTERN.fullmatch(position.upper())
+    if match is None:
+        raise ValueError(f"{position} isn't a valid position.")
+
+    return match.group(1), int(match.group(2))
+
+
+class GridIndex:
+    """
+    Index of a machine's positions by parsed column and row, so filtering
+    by either only touches the matching slots. Every list is kept in
+    grid order (column, then row as a number, so A2 comes before A10).
+    """
+
+    def __init__(self, positions: Iterable[str]):
+        coordinates: Dict[Tuple[str, int], str] = {}
+        off_grid: List[str] = []
+        for position in positions:
+            try:
+                coordinates[parse_position(position)] = position
+            except ValueError:
+                # Slots that aren't on the grid still get listed, they
+                # just can't be filtered for.
+                off_grid.append(position)
+
+        self.positions: List[str] = []
+        self.by_column: Dict[str, List[str]] = {}
+        self.by_row: Dict[int, List[str]] = {}
+        self.by_coordinates: Dict[Tuple[str, int], str] = {}
+
+        for (column, row), position in sorted(coordinates.items()):
+            self.positions.append(position)
+            self.by_column.setdefault(column, []).append(position)
+            self.by_row.setdefault(row, []).append(position)
+            self.by_coordinates[(column, row)] = position
+
+        self.positions.extend(sorted(off_grid))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def find(
+        self, column: Optional[str] = None, row: Optional[int] = None
+    ) -> List[str]:
+        """
+        Positions in the given column and/or row, in grid order. Without
+        either, every position.
+        """
+
+        if column is not None:
+            column = str(column).upper()
+
+        if column is not None and row is not None:
+            position = self.by_coordinates.get((column, row))
+            return [position] if position is not None else []
+        if column is not None:
+            return self.by_column.get(column, [])
+        if row is not None:
+            return self.by_row.get(row, [])
+        return self.positions
@@ -1,5 +1,8 @@
+import sys
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Union
+
+from vending_machine.utils.money import Money
 from .exceptions import InsufficientFundsError, OutOfStockError
 
 
@@ -15,9 +18,13 @@ class Item:
     An item that exists within the vending machine.
     """
 
-    def __init__(self, name: str, price: Decimal, remaining_stock: int):
-        self.name = name
-        self.price = price
+    __slots__ = ("name", "price", "remaining_stock")
+
+    def __init__(self, name: str, price: Union[Money, Decimal], remaining_stock: int):
+        # Machines hold many of the same item, and purchase logs name
+        # them over and over, so they all share one string.
+        self.name = sys.intern(name)
+        self.price = Money.of(price)
         if remaining_stock < 0:
             # Not a user facing error, and should only get thrown
             # if the dev touches the code. No need to fancy print.
@@ -51,7 +58,7 @@ class Item:
 
         return cls(
             name=dumped["name"],
-            price=Decimal(dumped["price"]),
+            price=Money.parse(dumped["price"]),
             remaining_stock=dumped["remaining_stock"],
         )
 
@@ -67,7 +74,7 @@ class Item:
             "remaining_stock": self.remaining_stock,
         }
 
-    def purchase(self, balance: Decimal) -> Decimal:
+    def purchase(self, balance: Money) -> Money:
         """
         Purchases an item from the vending machine. Raises InsufficientFunds
         exception if balance < price of the item.
@@ -0,0 +1,153 @@
+"""
+Restock manifests: one row per slot to fill, with its position, the
+item's name and price, and how many units go in. Either CSV with a
+header row,
+
+    position,name,price,quantity
+    A1,Gatorade (Blue),1.75,10
+
+or NDJSON, one object per line,
+
+    {"position": "A1", "name": "Gatorade (Blue)", "price": "1.75", "quantity": 10}
+
+A manifest covering a fleet can have a machine column as well, so each
+machine only picks out its own rows. Rows are read one at a time, so
+even a huge manifest is never held in memory.
+"""
+
+import json
+from decimal import InvalidOperation
+from itertools import count
+from typing import Any, Dict, IO, Iterator, NamedTuple, Optional
+
+from vending_machine.utils.money import Money
+from .grid import parse_position
+
+FORMATS = ("csv", "ndjson")
+COLUMNS = ("position", "name", "price", "quantity")
+
+# The largest price and stock a slot can hold, which is what fits the
+# fixed-size slot records of the mmap backend (see
+# vending_machine/storage/mmapped.py), where the largest stock a record
+# holds marks it as retired. How long a name can be is up to each
+# storage backend.
+MAX_PRICE_CENTS = 2 ** 63 - 1
+MAX_QUANTITY = 2 ** 32 - 2
+
+
+class RestockRow(NamedTuple):
+    """
+    One validated row of a manifest.
+    """
+
+    line: int
+    position: str
+    name: str
+    price: Money
+    quantity: int
+
+
+def guess_format(filename: str) -> str:
+    """
+    Guesses a manifest's format from its file name, CSV unless it looks
+    like NDJSON.
+    """
+
+    if filename.lower().endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+
+def _raw_rows(file: IO[str], manifest_format: str) -> Iterator[Dict[str, Any]]:
+    """
+    The rows of the manifest as dictionaries, numbered by the line they
+    start on.
+    """
+
+    if manifest_format == "csv":
+        # Imported here, so commands that never read a manifest don't
+        # pay for it on startup.
+        import csv  # pylint: disable=import-outside-toplevel
+
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield dict(row, line=reader.line_num)
+    elif manifest_format == "ndjson":
+        for line, text in zip(count(1), file):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                raise ValueError(f"Line {line} of the manifest isn't valid JSON.")
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {line} of the manifest isn't a JSON object.")
+            yield dict(row, line=line)
+    else:
+        raise ValueError(
+            f"Unknown manifest format, need one of {list(FORMATS)} and got {manifest_format}"
+        )
+
+
+def _validate(row: Dict[str, Any]) -> RestockRow:
+    line = row["line"]
+    missing = [column for column in COLUMNS if row.get(column) in (None, "")]
+    if missing:
+        raise ValueError(
+            f"Line {line} of the manifest is missing {', '.join(missing)}."
+        )
+
+    position = str(row["position"]).strip().upper()
+    try:
+        parse_position(position)
+    except ValueError:
+        raise ValueError(f"Line {line} of the manifest: {position} isn't a position.")
+
+    name = str(row["name"]).strip()
+
+    try:
+        price = Money.of(str(row["price"]).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Line {line} of the manifest: {row['price']} isn't a price.")
+
+    try:
+        quantity = int(row["quantity"])
+    except (TypeError, ValueError):
+        raise ValueError(
+            f"Line {line} of the manifest: {row['quantity']} isn't a whole number."
+        )
+
+    if price < Money() or quantity < 0:
+        raise ValueError(
+            f"Line {line} of the manifest has a negative price or quantity."
+        )
+    if price.cents > MAX_PRICE_CENTS or quantity > MAX_QUANTITY:
+        raise ValueError(
+            f"Line {line} of the manifest has a price or quantity too large "
+            f"to store."
+        )
+
+    return RestockRow(line, position, name, price, quantity)
+
+
+def read_manifest(
+    file: IO[str], manifest_format: str = "csv", machine: Optional[str] = None
+) -> Iterator[RestockRow]:
+    """
+    Streams the validated rows of a manifest. With machine, only the
+    rows whose machine column matches are read, the rest are skipped
+    without being validated. Without it, a manifest with a machine
+    column is refused rather than restocking every machine's rows into
+    one. Raises a ValueError naming the line of the first invalid row.
+    """
+
+    for row in _raw_rows(file, manifest_format):
+        if machine is None:
+            if "machine" in row:
+                raise ValueError(
+                    f"Line {row['line']} of the manifest is for a machine, "
+                    f"say which one with --machine."
+                )
+        elif str(row.get("machine", "")) != machine:
+            continue
+        yield _validate(row)
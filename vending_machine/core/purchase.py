@@ -1,5 +1,9 @@
-from typing import Dict, Any
-from decimal import Decimal
+import math
+from array import array
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from vending_machine.utils.money import Money
 
 
 class Purchase:
@@ -9,13 +13,32 @@ class Purchase:
     while being clearer than just using a dictionary
     """
 
-    def __init__(self, position: str, price: Decimal):
+    __slots__ = ("position", "price", "timestamp", "name")
+
+    def __init__(
+        self,
+        position: str,
+        price: Money,
+        timestamp: Optional[float] = None,
+        name: Optional[str] = None,
+    ):
         self.position = position
         self.price = price
+        # Seconds since the epoch. Purchases made before timestamps were
+        # recorded don't have one.
+        self.timestamp = timestamp
+        # The item bought, as the slot may hold something else by now.
+        # Purchases made before names were recorded don't have one.
+        self.name = name
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.position == other.position and self.price == other.price
+            return (
+                self.position == other.position
+                and self.price == other.price
+                and self.timestamp == other.timestamp
+                and self.name == other.name
+            )
         return False
 
     def to_json(self) -> Dict[str, Any]:
@@ -26,14 +49,181 @@ class Purchase:
         :return:
         """
 
-        return {"position": self.position, "price": str(self.price)}
+        dumped = {"position": self.position, "price": str(self.price)}
+        if self.timestamp is not None:
+            dumped["timestamp"] = self.timestamp
+        if self.name is not None:
+            dumped["name"] = self.name
+
+        return dumped
 
     @classmethod
-    def from_json(cls, dumped: Dict[str, str]):
+    def from_json(cls, dumped: Dict[str, Any]):
         """
         Loads the purchase object from a json serializable dictionary
         that could have been generated from a Purchase object via
         purchase.to_json()
         """
 
-        return cls(dumped["position"], Decimal(dumped["price"]))
+        return cls(
+            dumped["position"],
+            Money.parse(dumped["price"]),
+            dumped.get("timestamp"),
+            dumped.get("name"),
+        )
+
+
+class PurchaseLog:
+    """
+    List-like purchase history kept in parallel typed arrays: which slot
+    (as an index into positions, and into names for the item bought
+    there), the price in cents and the timestamp (NaN when there isn't
+    one). That takes a couple dozen bytes per purchase instead of an
+    object, a position string and a price each. A slot that gets
+    restocked with another item gets a new index, so the purchases
+    before keep their item. Reading it hands out Purchase objects built
+    on the fly.
+    """
+
+    def __init__(self, purchases: Iterable[Purchase] = ()):
+        self.positions: List[str] = []
+        self.names: List[Optional[str]] = []
+        self.slot_ids: Dict[Tuple[str, Optional[str]], int] = {}
+        self.slots = array("I")
+        self.cents = array("q")
+        self.timestamps = array("d")
+        # Purchases at the same price share one Money, and with it the
+        # text it formats to.
+        self._prices: Dict[int, Money] = {}
+        for purchase in purchases:
+            self.append(purchase)
+
+    @classmethod
+    def from_columns(
+        cls,
+        positions: List[str],
+        slots: array,
+        cents: array,
+        timestamps: array,
+        names: Optional[List[Optional[str]]] = None,
+    ):
+        """
+        Builds a log straight from its arrays, with slots indexing into
+        positions and names (all None when not given).
+        """
+
+        log = cls()
+        log.positions = positions
+        log.names = [None] * len(positions) if names is None else names
+        log.slot_ids = {
+            seller: slot for slot, seller in enumerate(zip(log.positions, log.names))
+        }
+        log.slots, log.cents, log.timestamps = slots, cents, timestamps
+
+        return log
+
+    def append(self, purchase: Purchase) -> None:
+        """
+        Adds a purchase to the end of the log.
+        """
+
+        seller = (purchase.position, purchase.name)
+        slot = self.slot_ids.get(seller)
+        if slot is None:
+            slot = self.slot_ids[seller] = len(self.positions)
+            self.positions.append(purchase.position)
+            self.names.append(purchase.name)
+
+        self.slots.append(slot)
+        self.cents.append(purchase.price.cents)
+        self.timestamps.append(
+            math.nan if purchase.timestamp is None else purchase.timestamp
+        )
+
+    def extend(self, purchases: Iterable[Purchase]) -> None:
+        """
+        Adds several purchases to the end of the log.
+        """
+
+        for purchase in purchases:
+            self.append(purchase)
+
+    def _purchase(self, slot: int, cents: int, timestamp: float) -> Purchase:
+        price = self._prices.get(cents)
+        if price is None:
+            price = self._prices[cents] = Money(cents)
+
+        return Purchase(
+            self.positions[slot],
+            price,
+            None if math.isnan(timestamp) else timestamp,
+            self.names[slot],
+        )
+
+    def __iter__(self) -> Iterator[Purchase]:
+        for slot, cents, timestamp in zip(self.slots, self.cents, self.timestamps):
+            yield self._purchase(slot, cents, timestamp)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        since: Optional[float] = None,
+    ) -> Iterator[Purchase]:
+        """
+        A page of purchases. Without since, reading starts right at offset.
+        """
+
+        if since is not None:
+            return page(self, offset, limit, since)
+
+        stop = None if limit is None else offset + limit
+        return map(
+            self._purchase,
+            self.slots[offset:stop],
+            self.cents[offset:stop],
+            self.timestamps[offset:stop],
+        )
+
+    def __getitem__(self, index: int) -> Purchase:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("purchase index out of range")
+
+        return self._purchase(
+            self.slots[index], self.cents[index], self.timestamps[index]
+        )
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+
+def page(
+    purchases: Iterable[Purchase],
+    offset: int = 0,
+    limit: Optional[int] = None,
+    since: Optional[float] = None,
+) -> Iterator[Purchase]:
+    """
+    Lazily picks a page out of any iterable of purchases, optionally only
+    counting the ones made at or after since (seconds since the epoch).
+    Purchase logs that can do this more cheaply have their own page method.
+    """
+
+    if since is not None:
+        purchases = (
+            purchase
+            for purchase in purchases
+            if purchase.timestamp is not None and purchase.timestamp >= since
+        )
+
+    stop = None if limit is None else offset + limit
+
+    return islice(purchases, offset, stop)
@@ -0,0 +1,154 @@
+from typing import Dict, Any, Iterable, List
+
+from vending_machine.utils.money import Money
+from .item import Item
+from .purchase import Purchase
+
+
+class Tally:
+    """
+    Number of units sold and the money they brought in.
+    """
+
+    def __init__(self, units: int = 0, revenue: Money = None):
+        self.units = units
+        self.revenue = revenue if revenue is not None else Money()
+
+    def __repr__(self) -> str:
+        return "<Tally(units={}, revenue={})>".format(self.units, self.revenue)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, self.__class__):
+            return self.units == other.units and self.revenue == other.revenue
+        return False
+
+    def add(self, price: Money) -> None:
+        """
+        Counts one more unit sold at price.
+        """
+
+        self.units += 1
+        self.revenue = self.revenue + price
+
+    def to_json(self) -> Dict[str, Any]:  # pylint: disable=missing-docstring
+        return {"units": self.units, "revenue": str(self.revenue)}
+
+    @classmethod
+    def from_json(cls, dumped: Dict[str, Any]):  # pylint: disable=missing-docstring
+        return cls(dumped["units"], Money.parse(dumped["revenue"]))
+
+
+class SalesAggregates:
+    """
+    Running sales totals, overall, per position and per item name. They
+    get updated with every purchase and saved along with the machine, so
+    summaries don't have to go through the purchase history.
+    """
+
+    def __init__(
+        self,
+        total: Tally = None,
+        by_position: Dict[str, Tally] = None,
+        by_item: Dict[str, Tally] = None,
+    ):
+        self.total = total if total is not None else Tally()
+        self.by_position = by_position if by_position is not None else {}
+        self.by_item = by_item if by_item is not None else {}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, self.__class__):
+            return (
+                self.total == other.total
+                and self.by_position == other.by_position
+                and self.by_item == other.by_item
+            )
+        return False
+
+    @property
+    def revenue(self) -> Money:  # pylint: disable=missing-docstring
+        return self.total.revenue
+
+    @property
+    def units(self) -> int:  # pylint: disable=missing-docstring
+        return self.total.units
+
+    def record(self, position: str, name: str, price: Money) -> None:
+        """
+        Counts one purchase of the item called name from position.
+        """
+
+        self.total.add(price)
+        self.by_position.setdefault(position, Tally()).add(price)
+        self.by_item.setdefault(name, Tally()).add(price)
+
+    @classmethod
+    def from_purchases(cls, purchases: Iterable[Purchase], items: Dict[str, Item]):
+        """
+        Recomputes the aggregates from scratch out of the purchase
+        history. Purchases made before item names were recorded only
+        remember their position, so they're attributed to whatever item
+        is in that slot now.
+        """
+
+        sales = cls()
+        for purchase in purchases:
+            name = purchase.name
+            if name is None:
+                item = items.get(purchase.position)
+                name = item.name if item is not None else purchase.position
+            sales.record(purchase.position, name, purchase.price)
+
+        return sales
+
+    def drift(self, expected: "SalesAggregates") -> List[str]:
+        """
+        Describes every way these aggregates differ from the expected ones.
+        """
+
+        problems = []
+        if self.total != expected.total:
+            problems.append(f"total is {self.total}, expected {expected.total}")
+
+        for label, actual, wanted in (
+            ("position", self.by_position, expected.by_position),
+            ("item", self.by_item, expected.by_item),
+        ):
+            for key in sorted(set(actual) | set(wanted)):
+                if actual.get(key, Tally()) != wanted.get(key, Tally()):
+                    problems.append(
+                        f"{label} {key} is {actual.get(key, Tally())}, "
+                        f"expected {wanted.get(key, Tally())}"
+                    )
+
+        return problems
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        Dumps the aggregates to a json serializable dictionary that can
+        be loaded back with from_json.
+        """
+
+        return {
+            "total": self.total.to_json(),
+            "by_position": {
+                key: tally.to_json() for key, tally in self.by_position.items()
+            },
+            "by_item": {key: tally.to_json() for key, tally in self.by_item.items()},
+        }
+
+    @classmethod
+    def from_json(cls, dumped: Dict[str, Any]):
+        """
+        Loads the aggregates from what to_json dumped.
+        """
+
+        return cls(
+            total=Tally.from_json(dumped["total"]),
+            by_position={
+                key: Tally.from_json(tally)
+                for key, tally in dumped["by_position"].items()
+            },
+            by_item={
+                key: Tally.from_json(tally) for key, tally in dumped["by_item"].items()
+            },
+        )
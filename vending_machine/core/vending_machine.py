@@ -1,17 +1,55 @@
 import string
+import time
+from collections import Counter
 from decimal import Decimal
-from typing import Dict, Optional, List, Any
-
-from vending_machine.ui.printer import fancy_print, formatted_print
-from vending_machine.utils import money
-from .exceptions import InsufficientFundsError, OutOfStockError
+from itertools import chain
+from typing import Dict, Optional, List, Any, Callable, Iterable, Iterator, Tuple, Union
+
+from vending_machine.ui import printer
+from vending_machine.ui.printer import (
+    fancy_print,
+    formatted_print,
+    formatted_print_many,
+    print_listing,
+    print_records,
+)
+from vending_machine.utils.metrics import timed
+from vending_machine.utils.money import Money
+from .change import (
+    FLOAT,
+    Coins,
+    add_coins,
+    breakdown,
+    dump_coins,
+    load_coins,
+    make_change,
+    remove_coins,
+)
+from .exceptions import ExactChangeError, InsufficientFundsError, OutOfStockError
+from .grid import GridIndex
 from .item import Item
-from .purchase import Purchase
+from .manifest import MAX_QUANTITY, RestockRow
+from .purchase import Purchase, PurchaseLog, page
+from .sales import SalesAggregates
 
 LOG_ERROR = "error"
 LOG_SUCCESS = "success"
 
 
+def purchased_positions(record: Dict[str, Any]) -> List[str]:
+    """
+    The positions a change record buys from, in order, with a position
+    bought several times listed as many times. Empty for records that
+    don't buy anything.
+    """
+
+    if record["op"] == "purchase":
+        return [record["position"]]
+    if record["op"] == "purchase_many":
+        return record["positions"]
+    return []
+
+
 class VendingMachine:
 
     """
@@ -41,13 +79,23 @@ class VendingMachine:
         self,
         items: Optional[Dict] = None,
         stock: int = 3,
-        balance: Optional[Decimal] = None,
+        balance: Optional[Union[Money, Decimal]] = None,
         purchases: List[Purchase] = None,
+        load_items: Optional[Callable[[], Dict[str, Item]]] = None,
+        sales: Optional[SalesAggregates] = None,
+        load_sales: Optional[Callable[[], SalesAggregates]] = None,
+        coins: Optional[Coins] = None,
     ):
         """
-        Constructor for a Vending Machine.
+        Constructor for a Vending Machine. Storage backends can pass
+        load_items instead of items, and load_sales instead of sales, to
+        defer loading them until they're first used. Without either, the
+        sales aggregates get computed from the purchases when needed.
+        coins are the coins and bills the machine holds by denomination
+        in cents. Without them it starts from the float, plus the balance
+        as if it was paid in with the fewest pieces.
         """
-        if items is None:
+        if items is None and load_items is None:
             # Fixing the size of the machine, mostly because
             # I can't think of that many different snacks to put
             # into it. Don't worry, I'll make sure the code works
@@ -56,9 +104,23 @@ class VendingMachine:
                 self.vending_machine_items, rows=5, columns=3, stock=stock
             )
 
-        self.items = items
-        self._balance = balance if balance else Decimal(0)
-        self.purchases = purchases if purchases else []
+        self._items = items
+        self._load_items = load_items
+        self._grid: Optional[GridIndex] = None
+        self._balance = Money.of(balance) if balance else Money()
+        if coins is None:
+            coins = dict(FLOAT)
+            add_coins(coins, breakdown(self._balance.cents))
+        self.coins: Coins = dict(coins)
+        # Compared against None, because storage backends may pass in
+        # their own (possibly empty, so falsy) list-like purchase log.
+        self.purchases = purchases if purchases is not None else PurchaseLog()
+        self._sales = sales
+        self._load_sales = load_sales
+        # Called with every change record applied through _commit, so
+        # a storage backend can persist changes as they happen instead
+        # of rewriting the whole machine afterwards.
+        self.on_change: Optional[Callable[[Dict[str, Any]], None]] = None
 
     @staticmethod
     def create_initial_machine(
@@ -106,14 +168,78 @@ class VendingMachine:
         return False
 
     @property
-    def balance(self):
+    def items(self) -> Dict[str, Item]:
+        """
+        The machine's slots by position, loaded on first use if the
+        machine was constructed with load_items.
+        """
+        if self._items is None:
+            self._items = self._load_items()
+            self._load_items = None
+        return self._items
+
+    @items.setter
+    def items(self, items: Dict[str, Item]) -> None:
+        self._items = items
+        self._load_items = None
+        self._grid = None
+
+    @property
+    def grid(self) -> GridIndex:
+        """
+        Index of the slots by column and row, built on first use. Slots
+        are only ever replaced all at once (through the items setter),
+        which drops the index.
+        """
+        if self._grid is None:
+            self._grid = GridIndex(self.items)
+        return self._grid
+
+    @property
+    def items_loaded(self) -> bool:
+        """
+        Whether the items have been loaded yet.
+        """
+        return self._items is not None
+
+    @property
+    def sales(self) -> SalesAggregates:
+        """
+        Running sales totals, kept up to date by every purchase.
+        """
+        if self._sales is None:
+            if self._load_sales is not None:
+                self._sales = self._load_sales()
+                self._load_sales = None
+            else:
+                self._sales = SalesAggregates.from_purchases(self.purchases, self.items)
+        return self._sales
+
+    @property
+    def sales_loaded(self) -> bool:
         """
-        Property responsible for displaying money nicely
-        instead of just a Decimal object that could
-        have up to 28 points of precision
+        Whether the sales aggregates have been loaded yet.
         """
-        return money.to_money(self._balance)
+        return self._sales is not None
 
+    def verify_sales(self) -> List[str]:
+        """
+        Recomputes the sales aggregates from the purchase history and
+        describes any drift from the running totals.
+        """
+
+        recomputed = SalesAggregates.from_purchases(self.purchases, self.items)
+        return self.sales.drift(recomputed)
+
+    @property
+    def balance(self) -> Money:
+        """
+        The customer's balance. Kept in whole cents, so there's nothing
+        to round.
+        """
+        return self._balance
+
+    @timed("to_json")
     def to_json(self) -> Dict[str, Any]:
         """
         Dumps the core vending machine object to a json
@@ -122,14 +248,17 @@ class VendingMachine:
         """
 
         return {
-            "balance": str(money.to_money(self._balance)),
+            "balance": str(self._balance),
             "items": {
                 location: item.to_json() for location, item in self.items.items()
             },
             "purchases": [purchase.to_json() for purchase in self.purchases],
+            "sales": self.sales.to_json(),
+            "coins": dump_coins(self.coins),
         }
 
     @classmethod
+    @timed("from_json")
     def from_json(cls, dumped: Dict[str, Any]):
         """
         Loads the core vending machine object from a json
@@ -137,22 +266,188 @@ class VendingMachine:
         to persist state across CLI commands.
         """
         balance = dumped["balance"]
-        purchases = [Purchase.from_json(purchase) for purchase in dumped["purchases"]]
-        items = {
-            location: Item.from_json(item) for location, item in dumped["items"].items()
-        }
+        purchases = PurchaseLog(
+            Purchase.from_json(purchase) for purchase in dumped["purchases"]
+        )
+        items = cls.items_from_json(dumped["items"])
+        # Older states didn't save aggregates, those get recomputed.
+        sales = dumped.get("sales")
+        sales = SalesAggregates.from_json(sales) if sales is not None else None
+        # And didn't track coins, which start from the float.
+        coins = dumped.get("coins")
+        coins = load_coins(coins) if coins is not None else None
+
+        return cls(
+            balance=Money.parse(balance),
+            items=items,
+            purchases=purchases,
+            sales=sales,
+            coins=coins,
+        )
 
-        return cls(balance=Decimal(balance), items=items, purchases=purchases)
+    @staticmethod
+    def items_from_json(dumped: Dict[str, Any]) -> Dict[str, Item]:
+        """
+        Loads just the items section of what to_json dumps.
+        """
+
+        return {location: Item.from_json(item) for location, item in dumped.items()}
 
-    def view_purchases(self) -> None:
+    def apply(self, record: Dict[str, Any]) -> None:
+        """
+        Applies a single change record to the machine without printing
+        anything. This is the only place balance, stock and purchases
+        get mutated, so replaying a journal of records rebuilds exactly
+        the state the original commands produced.
+        """
+
+        operation = record["op"]
+
+        if operation == "deposit":
+            amount = Money.parse(record["amount"])
+            # Records from before coins were tracked don't say how it was paid.
+            coins = record.get("coins")
+            add_coins(
+                self.coins,
+                load_coins(coins) if coins is not None else breakdown(amount.cents),
+            )
+            # Paid records settle a balance kept outside the machine (see
+            # sell), so only the coins change hands.
+            if not record.get("paid"):
+                self._balance = self._balance + amount
+        elif operation == "purchase":
+            position = record["position"]
+            item = self.items[position]
+            # Fetched first, so aggregates that still have to be computed
+            # from the history don't include this purchase twice.
+            sales = self.sales
+            if record.get("paid"):
+                # Paid for outside the machine's balance (see sell), so
+                # only the stock changes hands.
+                item.purchase(item.price)
+            else:
+                if item.remaining_stock > 0 and self._balance >= item.price:
+                    # Otherwise Item.purchase raises, before anything changes.
+                    self._check_change(self._balance - item.price)
+                self._balance = item.purchase(self._balance)
+            self.purchases.append(
+                Purchase(position, item.price, record.get("timestamp"), item.name)
+            )
+            sales.record(position, item.name, item.price)
+        elif operation == "purchase_many":
+            self._purchase_many(record["positions"], record.get("timestamp"))
+        elif operation == "dispense":
+            coins = record.get("coins")
+            if coins is not None:
+                remove_coins(self.coins, load_coins(coins))
+            else:
+                remove_coins(self.coins, self.change_for(self._balance) or {})
+            if not record.get("paid"):
+                self._balance = Money()
+        elif operation == "restock":
+            for position, dumped in record["slots"].items():
+                if position not in self.items:
+                    # A new slot, which the grid index doesn't know about.
+                    self._grid = None
+                self.items[position] = Item.from_json(dumped)
+        else:
+            raise ValueError(f"Unknown change record operation {operation}.")
+
+    def _purchase_many(self, positions: List[str], timestamp: Optional[float]) -> None:
+        """
+        Buys every position in the list, checking the whole basket
+        first so it's either bought in full or not touched at all.
+        Raises KeyError with the first unknown position, OutOfStockError
+        with the first position there isn't enough of,
+        InsufficientFundsError if the balance doesn't cover the total and
+        ExactChangeError if what's left of it couldn't be paid back.
+        """
+
+        items = [self.items[position] for position in positions]
+        for position, wanted in Counter(positions).items():
+            if self.items[position].remaining_stock < wanted:
+                raise OutOfStockError(position)
+        total = sum((item.price for item in items), Money())
+        if total > self._balance:
+            raise InsufficientFundsError()
+        self._check_change(self._balance - total)
+
+        sales = self.sales
+        for position, item in zip(positions, items):
+            self._balance = item.purchase(self._balance)
+            sales.record(position, item.name, item.price)
+        self.purchases.extend(
+            Purchase(position, item.price, timestamp, item.name)
+            for position, item in zip(positions, items)
+        )
+
+    def change_for(self, amount: Money) -> Optional[Coins]:
+        """
+        The fewest coins and bills the machine holds that pay the amount
+        exactly, or None if it can't.
+        """
+
+        return make_change(amount.cents, self.coins)
+
+    def _check_change(self, balance: Money) -> None:
+        """
+        Raises ExactChangeError if the balance couldn't be paid back.
+        Purchases check this before going through, so whatever balance
+        the machine is left with can always be dispensed.
+        """
+
+        if self.change_for(balance) is None:
+            raise ExactChangeError(balance)
+
+    def _commit(self, record: Dict[str, Any]) -> None:
+        """
+        Applies the record and, only if that succeeded, hands it to
+        the change listener (if there is one).
+        """
+
+        self.apply(record)
+        if self.on_change is not None:
+            self.on_change(record)
+
+    def iter_purchases(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        since: Optional[float] = None,
+    ) -> Iterator[Purchase]:
+        """
+        Lazily yields a page of the purchase history, read incrementally
+        from wherever the purchase log keeps it.
+        """
+
+        paginate = getattr(self.purchases, "page", None)
+        if paginate is not None:
+            return paginate(offset, limit, since)
+
+        return page(self.purchases, offset, limit, since)
+
+    def view_purchases(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        since: Optional[float] = None,
+    ) -> None:
         """
         Lists out the purchases a user has made on this machine.
         There should be one message per purchase, as well as one stating
         how many purchases and how much money they spent.
+        The purchases listed can be narrowed down to a page, and to the
+        ones made since a point in time, while the header always covers
+        the whole history. In the machine readable output formats, only
+        the purchases are listed, as records.
         """
 
-        total_amount_spent = sum((purchase.price for purchase in self.purchases))
-        total_items_bought = len(self.purchases)
+        if printer.OUTPUT != "text":
+            print_records(self.purchase_records(offset, limit, since))
+            return None
+
+        total_amount_spent = self.sales.revenue
+        total_items_bought = self.sales.units
 
         header_message = "You've spent {} on {} items.".format(
             total_amount_spent, total_items_bought
@@ -161,11 +456,61 @@ class VendingMachine:
             header_message += " You bought..."
 
         formatted_print(header_message)
-        for indx, purchase in enumerate(self.purchases):
-            message = "{}: {} costs {}".format(
-                indx, self.items[purchase.position], purchase.price
+        purchases = self.iter_purchases(offset, limit, since)
+        items = self.items
+        formatted_print_many(
+            "{}: {} costs {}".format(
+                indx, purchase.name or items[purchase.position], purchase.price
             )
-            formatted_print(message)
+            for indx, purchase in enumerate(purchases, start=offset)
+        )
+        return None
+
+    def purchase_records(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        since: Optional[float] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        The page of purchases view_purchases would list, as records
+        numbered by their place in the history.
+        """
+
+        purchases = self.iter_purchases(offset, limit, since)
+        for index, purchase in enumerate(purchases, start=offset):
+            yield {"index": index, **purchase.to_json()}
+
+    def view_sales(self, verify: bool = False) -> None:
+        """
+        Lists the sales totals, overall and per item, straight from the
+        running aggregates. With verify, they're also checked against
+        the purchase history, with one error message per difference.
+        """
+
+        sales = self.sales
+        lines = chain(
+            [f"Sold {sales.units} items for {sales.revenue}."],
+            (
+                f"{name}: {tally.units} sold for {tally.revenue}"
+                for name, tally in sorted(sales.by_item.items())
+            ),
+        )
+        print_listing(lines, self._check_sales() if verify else ())
+
+        return None
+
+    def _check_sales(self) -> Iterator[Tuple[str, str]]:
+        """
+        The status messages for checking the sales aggregates against
+        the purchase history.
+        """
+
+        problems = self.verify_sales()
+        for problem in problems:
+            yield LOG_ERROR, f"Sales totals drifted: {problem}."
+        if not problems:
+            yield LOG_SUCCESS, "Sales totals match the purchase history."
 
     def view_items(self, column: str = None, row: int = None) -> None:
         """
@@ -175,39 +520,41 @@ class VendingMachine:
         for the subset specified.
         """
 
-        if column is not None and row is not None:
-            # letter, row = position_from_coordinates(column, row)
-            if f"{column}{row}" not in self.items:
-                fancy_print(LOG_ERROR, f"{column}{row} isn't a slot on this machine.")
-                return None
+        positions = self.grid.find(column, row)
 
-        # Not planning on modifying underlying items, but better
-        # to be safe than sorry
-        items = self.items.copy()
-
-        if row is not None:
-            items = {
-                position: item
-                for position, item in items.items()
-                if str(row) in position
-            }
-
-        if column is not None:
+        if column is not None and row is not None and not positions:
+            fancy_print(LOG_ERROR, f"{column}{row} isn't a slot on this machine.")
+            return None
 
-            items = {
-                position: item for position, item in items.items() if column in position
-            }
+        if printer.OUTPUT != "text":
+            print_records(self.item_records(column, row))
+            return None
 
-        messages = [
+        items = self.items
+        formatted_print_many(
             "{}: {} costs {}, and there are {} units in stock.".format(
-                position, item.name, item.price, item.remaining_stock
+                position,
+                items[position].name,
+                items[position].price,
+                items[position].remaining_stock,
             )
-            for position, item in sorted(items.items())
-        ]
+            for position in positions
+        )
+        return None
+
+    def item_records(
+        self, column: str = None, row: int = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        The slots view_items would list, as records of their position
+        and item.
+        """
 
-        for message in messages:
-            formatted_print(message)
+        items = self.items
+        for position in self.grid.find(column, row):
+            yield {"position": position, **items[position].to_json()}
 
+    @timed("purchase_item")
     def purchase_item(self, position: str) -> None:
         """
         Top level function that handles purchasing an item
@@ -216,8 +563,9 @@ class VendingMachine:
 
         try:
             item = self.items[position]
-            self._balance = item.purchase(self.balance)
-            self.purchases.append(Purchase(position, item.price))
+            self._commit(
+                {"op": "purchase", "position": position, "timestamp": time.time()}
+            )
 
         except KeyError:
             fancy_print(
@@ -232,36 +580,265 @@ class VendingMachine:
                 LOG_ERROR,
                 f"Insufficient funds. {item.name} costs {item.price}, but got {self.balance}.",
             )
+
+        except ExactChangeError as error:
+            fancy_print(
+                LOG_ERROR,
+                f"Exact change only. The machine couldn't give back {error.args[0]} "
+                f"after buying {item.name}, so it wasn't purchased.",
+            )
         else:
             fancy_print(
                 LOG_SUCCESS,
                 f"Purchased {item.name} for {item.price}. Your remaining balance is {self.balance}. Enjoy!",
             )
 
-    def deposit(self, deposit_amount: Decimal) -> None:
+    def sell(self, position: str) -> Item:
+        """
+        Hands over the item at position to a customer who paid for it
+        outside the machine's balance, like a session of the session
+        server, without printing anything. Raises KeyError if there's no
+        such position and OutOfStockError if it's sold out.
+        :return: The item sold
+        """
+
+        item = self.items[position]
+        self._commit(
+            {
+                "op": "purchase",
+                "position": position,
+                "timestamp": time.time(),
+                "paid": True,
+            }
+        )
+        return item
+
+    def take_payment(self, amount: Money) -> None:
+        """
+        Puts money paid towards a balance kept outside the machine, like a
+        session's, into the coin inventory without printing anything.
+        """
+
+        self._commit(
+            {
+                "op": "deposit",
+                "amount": str(amount),
+                "coins": dump_coins(breakdown(amount.cents)),
+                "paid": True,
+            }
+        )
+
+    def pay_back(self, amount: Money) -> Optional[Coins]:
+        """
+        Pays out a balance kept outside the machine, like a session's, in
+        the fewest coins and bills it holds, without printing anything.
+        :return: The coins paid out, or None if the machine can't pay the
+        amount exactly, in which case nothing is paid out.
+        """
+
+        coins = self.change_for(amount)
+        if coins is not None:
+            self._commit({"op": "dispense", "coins": dump_coins(coins), "paid": True})
+        return coins
+
+    @timed("purchase_many")
+    def purchase_many(self, positions: Iterable[str]) -> bool:
+        """
+        Purchases the items at all the given positions as one order,
+        printing a single summary. If the stock or the balance doesn't
+        cover the whole order, nothing gets purchased. Storage backends
+        get the whole order as one change record.
+        :return: Whether the order went through
+        """
+
+        positions = list(positions)
+        if not positions:
+            fancy_print(LOG_ERROR, "No items to purchase.")
+            return False
+
+        try:
+            self._commit(
+                {
+                    "op": "purchase_many",
+                    "positions": positions,
+                    "timestamp": time.time(),
+                }
+            )
+
+        except KeyError as error:
+            fancy_print(
+                LOG_ERROR,
+                f"There is no item located at {error.args[0]}. Nothing was purchased.",
+            )
+
+        except OutOfStockError as error:
+            item = self.items[error.args[0]]
+            fancy_print(
+                LOG_ERROR,
+                f"Out of stock! There are only {item.remaining_stock} {item.name} left. "
+                "Nothing was purchased.",
+            )
+
+        except InsufficientFundsError:
+            total = sum((self.items[position].price for position in positions), Money())
+            fancy_print(
+                LOG_ERROR,
+                f"Insufficient funds. The order costs {total}, but got {self.balance}. "
+                "Nothing was purchased.",
+            )
+
+        except ExactChangeError as error:
+            fancy_print(
+                LOG_ERROR,
+                f"Exact change only. The machine couldn't give back {error.args[0]} "
+                "after the order. Nothing was purchased.",
+            )
+
+        else:
+            names = ", ".join(self.items[position].name for position in positions)
+            total = sum((self.items[position].price for position in positions), Money())
+            fancy_print(
+                LOG_SUCCESS,
+                f"Purchased {names} for {total}. Your remaining balance is {self.balance}. Enjoy!",
+            )
+            return True
+
+        return False
+
+    def restock(self, rows: Iterable[RestockRow]) -> bool:
         """
-        Inserting money into the vending machine.
+        Fills slots from the rows of a restock manifest, read in order.
+        A row for the item a slot already holds adds its quantity to the
+        stock and sets the price; a row for a different item replaces
+        what's in the slot, and a row for a position the machine doesn't
+        have adds a slot. Rows are folded into the end result per slot as
+        they're read, so only that is kept in memory, and it's applied as
+        one change record once every row has been read. A bad row, or a
+        slot the storage backend can't hold, means nothing gets restocked.
+        :return: Whether the machine got restocked
+        """
+
+        slots: Dict[str, Item] = {}
+        rows_read = 0
+        try:
+            for row in rows:
+                rows_read += 1
+                current = slots.get(row.position) or self.items.get(row.position)
+                stock = row.quantity
+                if current is not None and current.name == row.name:
+                    stock += current.remaining_stock
+                if stock > MAX_QUANTITY:
+                    raise ValueError(
+                        f"Line {row.line} of the manifest would put more than "
+                        f"{MAX_QUANTITY} units in {row.position}."
+                    )
+                slots[row.position] = Item(row.name, row.price, stock)
+        except ValueError as error:
+            fancy_print(LOG_ERROR, f"{error} Nothing was restocked.")
+            return False
+
+        if not slots:
+            fancy_print(LOG_ERROR, "The manifest has no rows for this machine.")
+            return False
+
+        previous = {position: self.items.get(position) for position in slots}
+        try:
+            self._commit(
+                {
+                    "op": "restock",
+                    "slots": {
+                        position: item.to_json() for position, item in slots.items()
+                    },
+                }
+            )
+        except ValueError as error:
+            # The storage backend couldn't hold one of the slots, like a
+            # name too long for its records, so put back what was there.
+            for position, item in previous.items():
+                if item is None:
+                    del self.items[position]
+                    self._grid = None
+                else:
+                    self.items[position] = item
+            fancy_print(LOG_ERROR, f"{error} Nothing was restocked.")
+            return False
+
+        fancy_print(
+            LOG_SUCCESS, f"Restocked {len(slots)} slots from {rows_read} manifest rows."
+        )
+
+        return True
+
+    @timed("deposit")
+    def deposit(self, deposit_amount: Union[Money, Decimal]) -> None:
+        """
+        Inserting money into the vending machine. Amounts are rounded to
+        the nearest cent.
         :return: Current Balance
         """
 
-        if deposit_amount <= 0:
+        deposit_amount = Money.of(deposit_amount)
+        if deposit_amount <= Money():
             fancy_print(LOG_ERROR, "Can't add negative or 0 cents to the machine.")
             return None
 
-        self._balance = self._balance + deposit_amount
+        self._commit(
+            {
+                "op": "deposit",
+                "amount": str(deposit_amount),
+                "coins": dump_coins(breakdown(deposit_amount.cents)),
+            }
+        )
         fancy_print(
             LOG_SUCCESS,
             f"Successfully deposited {deposit_amount}. Your balance is now {self.balance}.",
         )
 
-    def dispense_change(self) -> Decimal:
+    @timed("dispense_change")
+    def dispense_change(self) -> Money:
         """
-        Returns the remaining amount to the user
+        Returns the remaining amount to the user, in the fewest coins and
+        bills the machine holds. Purchases make sure that's always
+        possible, but a machine that can't pay it dispenses nothing.
         """
 
-        change = money.to_money(self._balance)
+        change = self._balance
+        coins = self.change_for(change)
+        if coins is None:
+            fancy_print(
+                LOG_ERROR,
+                f"The machine can't give back {change} in exact change. Please ask for help.",
+            )
+            return Money()
 
-        self._balance = Decimal(0)
-        fancy_print(LOG_SUCCESS, f"Dispensed {change}. Have a good day!")
+        self._commit({"op": "dispense", "coins": dump_coins(coins)})
+        pieces = ", ".join(
+            f"{count} x {Money(denomination)}" for denomination, count in coins.items()
+        )
+        fancy_print(
+            LOG_SUCCESS,
+            f"Dispensed {change}"
+            + (f" as {pieces}" if pieces else "")
+            + ". Have a good day!",
+        )
 
         return change
+
+    def view_coins(self) -> None:
+        """
+        Lists the coins and bills the machine holds, largest first, with
+        one message for their total.
+        """
+
+        total = Money(
+            sum(denomination * count for denomination, count in self.coins.items())
+        )
+        print_listing(
+            chain(
+                [f"The machine holds {total} in coins and bills."],
+                (
+                    f"{Money(denomination)}: {self.coins[denomination]}"
+                    for denomination in sorted(self.coins, reverse=True)
+                ),
+            )
+        )
@@ -0,0 +1 @@
+"""Ways of keeping a vending machine resident in memory between commands"""
@@ -0,0 +1,135 @@
+"""
+Client side of the daemon started with `python -m vending_machine serve`.
+Deliberately only uses the standard library, so forwarding a command
+doesn't pay for importing click, colorama or the rest of the package.
+"""
+
+import json
+import os
+import sys
+from typing import List, Optional, Tuple
+
+from vending_machine import SOCKET_LOCATION
+
+# Commands that always run in the calling process. Apart from serve,
+# which fails on its own, they refuse to while a daemon is running, as
+# the daemon keeps the machine locked until it stops.
+LOCAL_COMMANDS = {"serve", "serve-sessions", "batch", "shell"}
+
+# Options of the command group that take a value.
+GROUP_OPTIONS = {"--output"}
+
+# Commands whose arguments are files, with their options that take a
+# value. The daemon has a working directory of its own, so those files
+# get sent to it as absolute paths.
+FILE_COMMANDS = {"restock": {"--format", "--machine"}}
+
+
+def command_name(argv: List[str]) -> Optional[str]:
+    """
+    The command a command line runs, past any options before it.
+    """
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument in GROUP_OPTIONS:
+            next(arguments, None)
+        elif not argument.startswith("-"):
+            return argument
+    return None
+
+
+def absolute_paths(argv: List[str]) -> List[str]:
+    """
+    The command line with the arguments of a command in FILE_COMMANDS
+    made absolute, so they name the same files wherever it's run from.
+    """
+
+    command = command_name(argv)
+    if command not in FILE_COMMANDS:
+        return argv
+
+    resolved = []
+    options = GROUP_OPTIONS
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument in options:
+            resolved.append(argument)
+            argument = next(arguments, None)
+            if argument is not None:
+                resolved.append(argument)
+        elif argument.startswith("-"):
+            resolved.append(argument)
+        elif options is GROUP_OPTIONS:
+            # The command itself; options and files follow it.
+            resolved.append(argument)
+            options = FILE_COMMANDS[command]
+        else:
+            resolved.append(os.path.abspath(argument))
+    return resolved
+
+
+def daemon_running(socket_path: str = SOCKET_LOCATION) -> bool:
+    """
+    Whether a daemon is listening on socket_path.
+    """
+
+    if not os.path.exists(socket_path):
+        return False
+
+    import socket  # pylint: disable=import-outside-toplevel
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+def request(
+    argv: List[str], socket_path: str = SOCKET_LOCATION
+) -> Optional[Tuple[int, List[str]]]:
+    """
+    Sends the command line to the daemon and returns its exit code and
+    output lines, or None if no daemon is listening.
+    """
+
+    if not os.path.exists(socket_path):
+        return None
+
+    # Only imported once there's a daemon to talk to.
+    import socket  # pylint: disable=import-outside-toplevel
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(json.dumps({"argv": argv}).encode() + b"\n")
+            with sock.makefile("rb") as stream:
+                response = json.loads(stream.readline())
+    except (ConnectionRefusedError, FileNotFoundError):
+        # Stale socket file left behind by a daemon that died.
+        return None
+
+    return response["exit_code"], response["lines"]
+
+
+def forward(argv: List[str], socket_path: str = SOCKET_LOCATION) -> Optional[int]:
+    """
+    Runs the command on the daemon if one is running, printing its output.
+    :return: The command's exit code, or None if it has to run locally.
+    """
+
+    command = command_name(argv)
+    if command is None or command in LOCAL_COMMANDS or "--help" in argv:
+        return None
+
+    response = request(absolute_paths(argv), socket_path)
+    if response is None:
+        return None
+
+    exit_code, lines = response
+    for line in lines:
+        sys.stdout.write(line + "\n")
+
+    return exit_code
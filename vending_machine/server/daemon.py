@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from contextlib import ExitStack
+from typing import List, Tuple
+
+import click
+
+from vending_machine import SOCKET_LOCATION
+from vending_machine.storage import Storage
+from vending_machine.storage.resident import ResidentStorage
+from vending_machine.utils import GLOBAL_LOGGER
+from vending_machine.utils.logger import stdout_handler, _swap_handler
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CaptureHandler(logging.Handler):
+    """
+    Collects the messages logged while a command runs, so they can be
+    sent back to the client instead of printed by the daemon.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lines: List[str] = []
+
+    def emit(self, record):
+        self.lines.append(record.getMessage())
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # Just checking the daemon is there.
+            return
+        message = json.loads(line)
+        exit_code, lines = self.server.daemon.execute(message["argv"])
+        response = {"exit_code": exit_code, "lines": lines}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class Daemon:
+    """
+    Runs CLI commands against a machine kept in memory, answering
+    requests from vending_machine.server.client over a Unix socket.
+    Commands get handled one at a time; persisting their changes happens
+    on a separate thread after the response has been sent.
+
+    Like a batch (see CommandRunner), the storage stays locked from the
+    machine being loaded until the daemon is closed, so no other process
+    changes it only to have that overwritten by the next flush.
+    """
+
+    def __init__(
+        self, cli: click.Group, storage: Storage, socket_path: str = SOCKET_LOCATION
+    ):
+        self.cli = cli
+        self.socket_path = socket_path
+        self._remove_stale_socket()
+
+        self._session = ExitStack()
+        self._session.enter_context(storage.locked())
+        try:
+            self.resident = ResidentStorage(storage)
+            self.server = socketserver.UnixStreamServer(socket_path, _RequestHandler)
+        except BaseException:
+            self._session.close()
+            raise
+        self.server.daemon = self
+
+        self._stopped = False
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _remove_stale_socket(self) -> None:
+        if not os.path.exists(self.socket_path):
+            return None
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.remove(self.socket_path)
+                return None
+
+        raise RuntimeError(f"A daemon is already listening on {self.socket_path}.")
+
+    def _write_loop(self) -> None:
+        while not self._stopped:
+            self.resident.dirty.wait()
+            self.resident.dirty.clear()
+            self.resident.flush()
+
+    def execute(self, argv: List[str]) -> Tuple[int, List[str]]:
+        """
+        Runs one command line against the resident machine. A command
+        failing with anything but a click exception gets logged by the
+        daemon and reported back as an error, rather than dropping the
+        connection.
+        :return: The exit code and everything the command printed.
+        """
+
+        capture = CaptureHandler()
+        _swap_handler(GLOBAL_LOGGER, stdout_handler, capture)
+        exit_code = 0
+        try:
+            with self.resident.lock:
+                self.cli.main(
+                    args=argv,
+                    prog_name="vending_machine",
+                    standalone_mode=False,
+                    obj=self.resident,
+                )
+        except click.ClickException as error:
+            capture.lines.append(error.format_message())
+            exit_code = error.exit_code
+        except click.exceptions.Exit as error:
+            exit_code = error.exit_code
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.exception("Running %s failed.", argv)
+            capture.lines.append(f"Error: {error}")
+            exit_code = 1
+        finally:
+            _swap_handler(GLOBAL_LOGGER, capture, stdout_handler)
+
+        return exit_code, capture.lines
+
+    def serve_forever(self) -> None:  # pylint: disable=missing-docstring
+        self.server.serve_forever()
+
+    def shutdown(self) -> None:
+        """
+        Stops serving (from another thread), then persists anything
+        still pending.
+        """
+
+        self.server.shutdown()
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stops the writer thread, flushes the machine to disk, removes
+        the socket and unlocks the storage.
+        """
+
+        self._stopped = True
+        self.resident.dirty.set()
+        self._writer.join()
+        try:
+            self.resident.flush()
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self._session.close()
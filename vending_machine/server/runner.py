@@ -0,0 +1,133 @@
+"""
+Runs many CLI commands in one process against a machine kept in memory,
+for the batch and shell commands: loaded once, and saved every so often
+rather than after each change.
+"""
+
+import threading
+from contextlib import ExitStack
+from typing import List, Sequence
+
+import click
+
+from vending_machine.server.client import LOCAL_COMMANDS, command_name
+from vending_machine.storage import Storage
+from vending_machine.storage.resident import ResidentStorage
+from vending_machine.ui.printer import fancy_print
+
+LOG_ERROR = "error"
+
+
+class CommandRunner:
+    """
+    Runs command lines one after another against a resident machine,
+    printing their output as they go. The machine gets saved through the
+    real storage after every so many commands that changed it, every so
+    many seconds if it changed since (from a thread of its own), and when
+    the runner is closed. Either interval at zero turns it off.
+
+    The storage stays locked from the machine being loaded until the
+    runner is closed, so no other process changes it in the meantime only
+    to have that overwritten by the next save. They wait their turn.
+    """
+
+    def __init__(
+        self,
+        cli: click.Group,
+        storage: Storage,
+        every: int = 0,
+        seconds: float = 0,
+        options: Sequence[str] = (),
+    ):
+        self.cli = cli
+        self._session = ExitStack()
+        self._session.enter_context(storage.locked())
+        try:
+            self.resident = ResidentStorage(storage)
+        except BaseException:
+            self._session.close()
+            raise
+        self.every = every
+        # Group options, like --output, passed along to every command.
+        self.options = list(options)
+        self.pending = 0
+        self.saves = 0
+
+        self._stopped = threading.Event()
+        self._checkpointer = None
+        if seconds:
+            self._checkpointer = threading.Thread(
+                target=self._checkpoint_loop, args=(seconds,), daemon=True
+            )
+            self._checkpointer.start()
+
+    def _checkpoint_loop(self, seconds: float) -> None:
+        while not self._stopped.wait(seconds):
+            self.checkpoint()
+
+    def run(self, argv: List[str]) -> int:
+        """
+        Runs one command line against the resident machine. A command
+        failing with anything but a click exception prints an error and
+        exits with 1, like one failing with a click exception, so the
+        commands after it still run.
+        :return: The command's exit code.
+        """
+
+        command = command_name(argv)
+        if command in LOCAL_COMMANDS:
+            fancy_print(LOG_ERROR, f"{command} can't be run from here.")
+            return 2
+
+        exit_code = 0
+        try:
+            with self.resident.lock:
+                self.cli.main(
+                    args=[*self.options, *argv],
+                    prog_name="vending_machine",
+                    standalone_mode=False,
+                    obj=self.resident,
+                )
+        except click.ClickException as error:
+            fancy_print(LOG_ERROR, error.format_message())
+            exit_code = error.exit_code
+        except click.exceptions.Exit as error:
+            exit_code = error.exit_code
+        except Exception as error:  # pylint: disable=broad-except
+            fancy_print(LOG_ERROR, f"{command} failed: {error}")
+            exit_code = 1
+
+        with self.resident.lock:
+            if self.resident.dirty.is_set():
+                self.resident.dirty.clear()
+                self.pending += 1
+                if self.every and self.pending >= self.every:
+                    self.checkpoint()
+
+        return exit_code
+
+    def checkpoint(self) -> None:
+        """
+        Saves the machine through the real storage, if it has changed
+        since it was last saved.
+        """
+
+        with self.resident.lock:
+            if self.pending:
+                self.resident.flush()
+                self.pending = 0
+                self.saves += 1
+
+    def close(self) -> None:
+        """
+        Stops the timed checkpoints, saves anything still pending and
+        unlocks the storage.
+        """
+
+        self._stopped.set()
+        if self._checkpointer is not None:
+            self._checkpointer.join()
+        try:
+            self.checkpoint()
+        finally:
+            self._session.close()
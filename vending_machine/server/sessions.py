@@ -0,0 +1,258 @@
+"""
+asyncio front-end letting many customers use one machine at once. Every
+connection is a session with its own balance, while the inventory and
+purchase log are shared. Requests and responses are newline delimited
+JSON objects, for example {"op": "deposit", "amount": "1.25"}.
+"""
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from decimal import InvalidOperation
+from typing import Dict, Any, Optional
+
+from vending_machine.core.exceptions import OutOfStockError
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.storage import Storage
+from vending_machine.utils.money import Money
+
+LOGGER = logging.getLogger(__name__)
+
+NOT_AN_OBJECT = "Requests must be JSON objects."
+
+
+class CustomerSession:
+    """
+    The state belonging to one connected customer.
+    """
+
+    def __init__(self):
+        self.balance = Money()
+
+
+class SessionServer:
+    """
+    Serves customer sessions against a shared machine. Requests are
+    handled one at a time on a single worker thread, so two sessions
+    racing for the last item can't both get it, and saving changes
+    doesn't hold up the connections waiting on the event loop. Changes
+    get saved every checkpoint_seconds if anything changed, and once
+    more when the server stops. Deposits, purchases and change go
+    through the machine's change records and coin inventory like any
+    other, so storage backends that write changes as they happen see
+    each of them, and sessions follow the same exact change rules.
+    """
+
+    def __init__(
+        self,
+        machine: VendingMachine,
+        storage: Optional[Storage] = None,
+        checkpoint_seconds: float = 1.0,
+    ):
+        self.machine = machine
+        self.storage = storage
+        self.checkpoint_seconds = checkpoint_seconds
+        self.sessions = 0
+        self._dirty = False
+        self._worker = ThreadPoolExecutor(max_workers=1)
+
+    def handle(self, session: CustomerSession, message: Any) -> Dict:
+        """
+        Applies one request for the given session.
+        :return: The response to send back.
+        """
+
+        if not isinstance(message, dict):
+            return {"ok": False, "error": NOT_AN_OBJECT}
+        operation = message.get("op")
+
+        if operation == "deposit":
+            return self._deposit(session, message)
+        if operation == "purchase":
+            return self._purchase(session, message)
+        if operation == "dispense":
+            return self._dispense(session)
+        if operation == "balance":
+            return {"ok": True, "balance": str(session.balance)}
+
+        return {"ok": False, "error": f"Unknown operation {operation}."}
+
+    def _deposit(self, session: CustomerSession, message: Dict[str, Any]) -> Dict:
+        amount = message.get("amount")
+        try:
+            if not isinstance(amount, str):
+                raise TypeError(amount)
+            amount = Money.of(amount)
+        except (TypeError, ValueError, InvalidOperation):
+            return {"ok": False, "error": "Deposits need a numeric amount."}
+
+        if amount <= Money():
+            return {
+                "ok": False,
+                "error": "Can't add negative or 0 cents to the machine.",
+            }
+
+        self.machine.take_payment(amount)
+        session.balance = session.balance + amount
+        self._dirty = True
+        return {"ok": True, "balance": str(session.balance)}
+
+    def _purchase(self, session: CustomerSession, message: Dict[str, Any]) -> Dict:
+        position = message.get("position")
+        if not isinstance(position, str):
+            return {"ok": False, "error": "Purchases need a position."}
+        item = self.machine.items.get(position)
+        if item is None:
+            return {"ok": False, "error": f"There is no item located at {position}."}
+
+        if item.remaining_stock > 0 and session.balance < item.price:
+            return {
+                "ok": False,
+                "error": f"Insufficient funds. {item.name} costs {item.price}.",
+            }
+        change = session.balance - item.price
+        if item.remaining_stock > 0 and self.machine.change_for(change) is None:
+            return {
+                "ok": False,
+                "error": f"Exact change only. The machine couldn't give back {change} "
+                f"after buying {item.name}.",
+            }
+        try:
+            self.machine.sell(position)
+        except OutOfStockError:
+            return {
+                "ok": False,
+                "error": f"Out of stock! There are no more {item.name} left!",
+            }
+
+        session.balance = session.balance - item.price
+        self._dirty = True
+
+        return {
+            "ok": True,
+            "item": item.name,
+            "price": str(item.price),
+            "balance": str(session.balance),
+        }
+
+    def _dispense(self, session: CustomerSession) -> Dict:
+        change = session.balance
+        if self.machine.pay_back(change) is None:
+            return {
+                "ok": False,
+                "error": f"The machine can't give back {change} in exact change.",
+            }
+
+        session.balance = Money()
+        self._dirty = True
+        return {"ok": True, "change": str(change)}
+
+    def _respond(self, session: CustomerSession, line: bytes) -> Dict:
+        """
+        Handles one line of a connection, turning anything that goes
+        wrong along the way into an error response for that request.
+        """
+
+        try:
+            return self.handle(session, json.loads(line))
+        except ValueError:
+            return {"ok": False, "error": NOT_AN_OBJECT}
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.exception("Session request failed: %r", line)
+            return {"ok": False, "error": f"Error: {error}"}
+
+    async def _serve_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        session = CustomerSession()
+        self.sessions += 1
+        try:
+            async for line in reader:
+                response = await loop.run_in_executor(
+                    self._worker, self._respond, session, line
+                )
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Walking away from the machine forfeits nothing, the
+            # session's balance simply goes back with the customer.
+            self.sessions -= 1
+            writer.close()
+
+    def checkpoint(self) -> None:
+        """
+        Saves the shared machine if anything changed since the last save.
+        """
+
+        if self.storage is not None and self._dirty:
+            with self.storage.locked():
+                self.storage.commit(self.machine)
+            self._dirty = False
+
+    async def _checkpoint_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.checkpoint_seconds)
+            # On the worker, so no request changes the machine mid-save.
+            await loop.run_in_executor(self._worker, self.checkpoint)
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        """
+        Starts listening, returning the asyncio server so callers can
+        find out the bound port and close it.
+        """
+
+        return await asyncio.start_server(self._serve_client, host, port, backlog=4096)
+
+    async def serve_forever(self, host: str, port: int) -> None:
+        """
+        Serves sessions until cancelled, saving the machine on the way out.
+        """
+
+        server = await self.start(host, port)
+        checkpoints = asyncio.ensure_future(self._checkpoint_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            checkpoints.cancel()
+            # Lets requests already handed to the worker finish first.
+            self._worker.shutdown()
+            self.checkpoint()
+
+
+class SessionClient:
+    """
+    Minimal asyncio client for the session server, standing in for a
+    customer's terminal in tests and load tests.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "SessionClient":
+        """
+        Opens a new session on the server.
+        """
+
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, **message: Any) -> Dict[str, Any]:
+        """
+        Sends one request and waits for its response.
+        """
+
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self) -> None:  # pylint: disable=missing-docstring
+        self.writer.close()
+        await self.writer.wait_closed()
@@ -0,0 +1,51 @@
+import importlib
+
+import vending_machine
+from .base import Storage
+
+# The backends by name, each imported the first time it's used, so a
+# command doesn't pay for importing sqlite3 or mmap unless it needs them.
+BACKENDS = {
+    "json": "JsonStorage",
+    "journal": "JournalStorage",
+    "sqlite": "SqliteStorage",
+    "mmap": "MmapStorage",
+}
+
+# Where everything exported from here lives.
+MODULES = {
+    "JsonStorage": "json_storage",
+    "JournalStorage": "journal",
+    "CompactionReport": "journal",
+    "SqliteStorage": "sqlite",
+    "SqlitePurchaseLog": "sqlite",
+    "MmapStorage": "mmapped",
+    "PackedPurchaseLog": "mmapped",
+    "ResidentStorage": "resident",
+}
+
+
+def __getattr__(name: str):
+    if name not in MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(importlib.import_module(f".{MODULES[name]}", __name__), name)
+
+
+def get_storage(backend: str = None) -> Storage:
+    """
+    Builds the storage backend the CLI should use. Defaults to the
+    one configured through the VENDING_MACHINE_STORAGE environment
+    variable.
+    """
+
+    backend = backend or vending_machine.STORAGE_BACKEND
+
+    try:
+        return __getattr__(BACKENDS[backend])()
+    except KeyError:
+        raise ValueError(
+            "Unknown storage backend, need one of {} and got {}".format(
+                list(BACKENDS.keys()), backend
+            )
+        )
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from vending_machine.core.vending_machine import VendingMachine
+from .locking import file_lock
+
+
+class Storage:
+    """
+    Base class for the different ways a vending machine can be
+    persisted between CLI commands.
+    """
+
+    # Set by load when the persisted state was damaged and the last good
+    # copy of it got loaded instead.
+    recovered = False
+    # File locked() locks, None for backends other processes can't get at.
+    lock_path: Optional[str] = None
+    # How many locked() blocks are open, the outermost holding the lock.
+    _lock_depth = 0
+
+    @contextmanager
+    def locked(self, shared: bool = False) -> Iterator[None]:
+        """
+        Keeps other processes from changing the persisted machine until
+        the block finishes, so a load, change and commit can't interleave
+        with another one. Commands that only read can take a shared
+        lock, which they can hold alongside each other but not alongside
+        a command that writes.
+
+        Blocks nested in one already holding the lock (like a batch holds
+        it for all of its commands) don't lock again, the outer lock
+        covers them.
+        """
+
+        if self.lock_path is None or self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield None
+            finally:
+                self._lock_depth -= 1
+        else:
+            with file_lock(self.lock_path, shared):
+                self._lock_depth = 1
+                try:
+                    yield None
+                finally:
+                    self._lock_depth = 0
+
+    def exists(self) -> bool:
+        """
+        Whether a vending machine has been persisted yet.
+        """
+
+        raise NotImplementedError
+
+    def load(self) -> VendingMachine:
+        """
+        Loads the persisted vending machine.
+        """
+
+        raise NotImplementedError
+
+    def save(self, machine: VendingMachine) -> None:
+        """
+        Persists the full state of the machine, replacing anything
+        persisted before.
+        """
+
+        raise NotImplementedError
+
+    def commit(self, machine: VendingMachine) -> None:
+        """
+        Persists the changes made to a machine since it was loaded.
+        Backends that can't do any better than rewriting everything
+        just save the machine again.
+        """
+
+        self.save(machine)
+
+    def destroy(self) -> None:
+        """
+        Removes everything persisted for the machine.
+        """
+
+        raise NotImplementedError
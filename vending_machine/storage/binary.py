@@ -0,0 +1,342 @@
+"""
+Binary layout for machine snapshots, as an alternative to the JSON one
+in snapshot.py. A fixed header is followed by length-prefixed sections,
+all little-endian:
+
+    magic (8 bytes) | version (u16)
+    tag (4 bytes) | length (u64) | crc32 (u32) | payload   <- per section
+
+STAT  balance in cents (i64) and purchase count (u64)
+EXTR  JSON object of any extra header fields (like journal_seq)
+ITEM  string table, then one fixed-width record per slot:
+      position id (u32), name id (u32), price in cents (i64), stock (u32)
+SALE  string table, then one fixed-width record per tally:
+      kind (u8), key id (u32), units (u64), revenue in cents (i64)
+PURC  position table, purchase count (u64), then the slot ids (u32),
+      prices in cents (i64) and timestamps (f64, NaN for none) as three
+      packed arrays
+COIN  one record per denomination held: its value in cents (i64) and
+      how many of it (u64)
+PNAM  string table of the item bought at each entry of the PURC position
+      table (empty for purchases made before names were recorded)
+
+String tables are a count (u32) followed by length-prefixed (u16) UTF-8
+strings. Readers skip sections they don't know, so sections can be
+added without bumping the version. Every section is checked against its
+CRC32 as it's read; version 1 files don't have one and aren't checked.
+"""
+
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from vending_machine.core.item import Item
+from vending_machine.core.purchase import PurchaseLog
+from vending_machine.core.sales import SalesAggregates, Tally
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.utils.money import Money
+from .durability import atomic_write
+
+MAGIC = b"VMSTATE\x1a"
+VERSION = 2
+
+HEADER = struct.Struct("<8sH")
+SECTION = struct.Struct("<4sQI")
+# Sections as version 1 wrote them, without a checksum.
+SECTION_V1 = struct.Struct("<4sQ")
+STAT = struct.Struct("<qQ")
+ITEM = struct.Struct("<IIqI")
+SALE = struct.Struct("<BIQq")
+COIN = struct.Struct("<qQ")
+COUNT = struct.Struct("<I")
+PURCHASE_COUNT = struct.Struct("<Q")
+STRING_LENGTH = struct.Struct("<H")
+
+SALE_KINDS = ("total", "position", "item")
+
+
+def is_binary(path: str) -> bool:
+    """
+    Whether the file at path starts like a binary snapshot.
+    """
+
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _pack_strings(strings: List[str]) -> bytes:
+    parts = [COUNT.pack(len(strings))]
+    for string in strings:
+        encoded = string.encode()
+        parts.append(STRING_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def _unpack_strings(buffer: bytes, offset: int) -> Tuple[List[str], int]:
+    (count,) = COUNT.unpack_from(buffer, offset)
+    offset += COUNT.size
+    strings = []
+    for _ in range(count):
+        (length,) = STRING_LENGTH.unpack_from(buffer, offset)
+        offset += STRING_LENGTH.size
+        strings.append(buffer[offset : offset + length].decode())
+        offset += length
+    return strings, offset
+
+
+class StringTable:
+    """
+    Gives every distinct string an id, in the order they're first seen.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def __getitem__(self, string: str) -> int:
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return string_id
+
+
+def _little_endian(column: array) -> array:
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def _items_section(items: Dict[str, Item]) -> bytes:
+    strings = StringTable()
+    records = [
+        ITEM.pack(
+            strings[position],
+            strings[item.name],
+            item.price.cents,
+            item.remaining_stock,
+        )
+        for position, item in items.items()
+    ]
+    return _pack_strings(strings.strings) + b"".join(records)
+
+
+def _sales_section(sales: SalesAggregates) -> bytes:
+    strings = StringTable()
+    tallies = (
+        [("total", "", sales.total)]
+        + [("position", key, tally) for key, tally in sales.by_position.items()]
+        + [("item", key, tally) for key, tally in sales.by_item.items()]
+    )
+    records = [
+        SALE.pack(
+            SALE_KINDS.index(kind), strings[key], tally.units, tally.revenue.cents
+        )
+        for kind, key, tally in tallies
+    ]
+    return _pack_strings(strings.strings) + b"".join(records)
+
+
+def _purchases_section(purchases: PurchaseLog) -> Iterable[bytes]:
+    yield _pack_strings(purchases.positions)
+    yield PURCHASE_COUNT.pack(len(purchases))
+    for column in (purchases.slots, purchases.cents, purchases.timestamps):
+        yield _little_endian(column).tobytes()
+
+
+def _purchase_names_section(purchases: PurchaseLog) -> bytes:
+    return _pack_strings([name or "" for name in purchases.names])
+
+
+def write_binary(
+    path: str, machine: VendingMachine, durability: Optional[str] = None, **extra
+) -> None:
+    """
+    Writes the machine to path in the binary layout. Like the JSON
+    snapshots, it is written next to path and renamed into place, as
+    durably as durability asks (see durability.py).
+
+    Any extra keyword arguments are stored in the EXTR section.
+    """
+
+    log = machine.purchases
+    if not isinstance(log, PurchaseLog):
+        log = PurchaseLog(log)
+    purchases = list(_purchases_section(log))
+    sections = [
+        (
+            b"STAT",
+            [
+                STAT.pack(
+                    machine._balance.cents,  # pylint: disable=protected-access
+                    len(machine.purchases),
+                )
+            ],
+        ),
+        (b"EXTR", [json.dumps(extra).encode()]),
+        (b"ITEM", [_items_section(machine.items)]),
+        (b"SALE", [_sales_section(machine.sales)]),
+        (b"PURC", purchases),
+        (b"PNAM", [_purchase_names_section(log)]),
+        (
+            b"COIN",
+            [
+                b"".join(
+                    COIN.pack(denomination, count)
+                    for denomination, count in machine.coins.items()
+                )
+            ],
+        ),
+    ]
+
+    with atomic_write(path, durability) as file:
+        file.write(HEADER.pack(MAGIC, VERSION))
+        for tag, parts in sections:
+            checksum = 0
+            for part in parts:
+                checksum = zlib.crc32(part, checksum)
+            file.write(SECTION.pack(tag, sum(len(part) for part in parts), checksum))
+            for part in parts:
+                file.write(part)
+
+
+class BinaryReader:
+    """
+    Reads a binary snapshot. Only the header and the small STAT and EXTR
+    sections are read up front; the rest are read when the machine is
+    built. Mirrors SnapshotReader, so storage backends can use either.
+
+    A file cut short or with a section that doesn't match its checksum
+    raises a ValueError when read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        magic, self.version = HEADER.unpack(self._read_exactly(HEADER.size, path))
+        if magic != MAGIC:
+            raise ValueError(f"{path} isn't a binary snapshot.")
+        if self.version > VERSION:
+            raise ValueError(
+                f"{path} was written by a newer version (format {self.version})."
+            )
+
+        # Where each section's payload starts, how long it is and its
+        # checksum (None in version 1 files).
+        self.sections: Dict[bytes, Tuple[int, int, Optional[int]]] = {}
+        section = SECTION if self.version >= 2 else SECTION_V1
+        position = HEADER.size
+        size = os.fstat(self.file.fileno()).st_size
+        while position < size:
+            self.file.seek(position)
+            tag, length, *checksum = section.unpack(
+                self._read_exactly(section.size, path)
+            )
+            position += section.size
+            self.sections[tag] = (position, length, checksum[0] if checksum else None)
+            position += length
+        if position != size:
+            raise ValueError(f"{path} is truncated.")
+
+        balance, purchase_count = STAT.unpack(self.read(b"STAT"))
+        self.header: Dict[str, Any] = dict(
+            json.loads(self.read(b"EXTR") or b"{}"),
+            version=self.version,
+            balance=str(Money(balance)),
+            purchase_count=purchase_count,
+        )
+
+    def _read_exactly(self, size: int, path: str) -> bytes:
+        data = self.file.read(size)
+        if len(data) < size:
+            raise ValueError(f"{path} is truncated.")
+        return data
+
+    def __del__(self):
+        if hasattr(self, "file"):
+            self.file.close()
+
+    def read(self, tag: bytes) -> bytes:
+        """
+        The payload of a section, empty if the file doesn't have it.
+        """
+
+        if tag not in self.sections:
+            return b""
+        offset, length, checksum = self.sections[tag]
+        self.file.seek(offset)
+        payload = self.file.read(length)
+        if checksum is not None and zlib.crc32(payload) != checksum:
+            raise ValueError(f"{self.path} is corrupt in its {tag.decode()} section.")
+        return payload
+
+    def items(self) -> Dict[str, Item]:  # pylint: disable=missing-docstring
+        buffer = self.read(b"ITEM")
+        strings, offset = _unpack_strings(buffer, 0)
+        return {
+            strings[position]: Item(strings[name], Money(cents), stock)
+            for position, name, cents, stock in ITEM.iter_unpack(buffer[offset:])
+        }
+
+    def sales(self) -> Optional[SalesAggregates]:  # pylint: disable=missing-docstring
+        buffer = self.read(b"SALE")
+        if not buffer:
+            return None
+
+        strings, offset = _unpack_strings(buffer, 0)
+        sales = SalesAggregates()
+        for kind, key, units, cents in SALE.iter_unpack(buffer[offset:]):
+            tally = Tally(units, Money(cents))
+            if SALE_KINDS[kind] == "total":
+                sales.total = tally
+            elif SALE_KINDS[kind] == "position":
+                sales.by_position[strings[key]] = tally
+            else:
+                sales.by_item[strings[key]] = tally
+        return sales
+
+    def purchases(self) -> PurchaseLog:  # pylint: disable=missing-docstring
+        buffer = self.read(b"PURC")
+        positions, offset = _unpack_strings(buffer, 0)
+        (count,) = PURCHASE_COUNT.unpack_from(buffer, offset)
+        offset += PURCHASE_COUNT.size
+
+        columns = []
+        for typecode in ("I", "q", "d"):
+            column = array(typecode)
+            end = offset + count * column.itemsize
+            column.frombytes(buffer[offset:end])
+            columns.append(_little_endian(column))
+            offset = end
+
+        names = [None] * len(positions)
+        if b"PNAM" in self.sections:
+            stored, _ = _unpack_strings(self.read(b"PNAM"), 0)
+            names = [name or None for name in stored]
+
+        return PurchaseLog.from_columns(positions, *columns, names)
+
+    def coins(self) -> Optional[Dict[int, int]]:  # pylint: disable=missing-docstring
+        if b"COIN" not in self.sections:
+            return None
+
+        return dict(COIN.iter_unpack(self.read(b"COIN")))
+
+    def machine(self) -> VendingMachine:
+        """
+        Builds the machine stored in the file.
+        """
+
+        return VendingMachine(
+            balance=Money.parse(self.header["balance"]),
+            items=self.items(),
+            purchases=self.purchases(),
+            sales=self.sales(),
+            coins=self.coins(),
+        )
@@ -0,0 +1,144 @@
+"""
+How hard the storage backends try to get a write onto the disk before
+counting it as done. From fastest to safest:
+
+    none   writes are left in Python's buffers, so whatever hasn't been
+           written out yet is lost if the process dies
+    flush  every write is handed to the operating system right away,
+           which survives the process dying but not the machine
+    fsync  every write is forced onto the disk, and so are the renames
+           putting new files in place, which survives losing power
+
+Whatever the level, files are replaced by writing a temporary file next
+to them and renaming it into place, so a crash leaves the old file or
+the new one, never a mix of the two. The file being replaced is kept
+as a backup, to fall back to if the new one turns out to be damaged.
+"""
+
+import os
+import shutil
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+import vending_machine
+
+LEVELS = ("none", "flush", "fsync")
+BACKUP_SUFFIX = ".bak"
+CORRUPT_SUFFIX = ".corrupt"
+
+
+def resolve(durability: Optional[str] = None) -> str:
+    """
+    The durability level to use, the configured DURABILITY unless one
+    is given.
+    """
+
+    durability = durability or vending_machine.DURABILITY
+    if durability not in LEVELS:
+        raise ValueError(
+            "Unknown durability level, need one of {} and got {}".format(
+                list(LEVELS), durability
+            )
+        )
+
+    return durability
+
+
+def sync(file: IO, durability: str) -> None:
+    """
+    Pushes what was written to file as far as the durability level asks.
+    """
+
+    if durability == "none":
+        return
+    file.flush()
+    if durability == "fsync":
+        os.fsync(file.fileno())
+
+
+def sync_directory(path: str, durability: str) -> None:
+    """
+    Makes a file created or renamed at path stick, by syncing the
+    directory it's in. Only done at the fsync level, and only where
+    directories can be opened (not on Windows).
+    """
+
+    if durability != "fsync" or not hasattr(os, "O_DIRECTORY"):
+        return
+
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def backup_path(path: str) -> str:
+    """
+    Where the previous version of the file at path is kept.
+    """
+
+    return path + BACKUP_SUFFIX
+
+
+@contextmanager
+def atomic_write(
+    path: str, durability: Optional[str] = None, backup: bool = True
+) -> Iterator[IO]:
+    """
+    Opens a temporary file next to path for writing, and renames it over
+    path once the block finishes. If the block raises, path is left
+    alone and the temporary file removed.
+
+    With backup, the file being replaced stays around at backup_path.
+    It's hard linked there, so path itself never goes missing.
+    """
+
+    durability = resolve(durability)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            yield file
+            sync(file, durability)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if backup and os.path.isfile(path):
+        previous = backup_path(path)
+        if os.path.exists(previous):
+            os.remove(previous)
+        try:
+            os.link(path, previous)
+        except OSError:
+            # Filesystems without hard links get a copy instead.
+            shutil.copyfile(path, previous)
+
+    os.replace(temp_path, path)
+    sync_directory(path, durability)
+
+
+def restore_backup(path: str, durability: Optional[str] = None) -> None:
+    """
+    Puts the backup of the file at path back in its place. Whatever was
+    at path is kept at path + CORRUPT_SUFFIX to look into.
+    """
+
+    if os.path.isfile(path):
+        os.replace(path, path + CORRUPT_SUFFIX)
+
+    with atomic_write(path, durability, backup=False) as file:
+        with open(backup_path(path), "rb") as previous:
+            shutil.copyfileobj(previous, file)
+
+
+def remove_backups(path: str) -> None:
+    """
+    Removes the backup kept for the file at path and any damaged copy
+    set aside by restore_backup.
+    """
+
+    for leftover in (backup_path(path), path + CORRUPT_SUFFIX):
+        if os.path.isfile(leftover):
+            os.remove(leftover)
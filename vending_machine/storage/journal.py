@@ -0,0 +1,310 @@
+import json
+import os
+import time
+import zlib
+from typing import Dict, Any, NamedTuple, Optional
+
+import vending_machine
+from vending_machine import (
+    STATE_FILE_LOCATION,
+    JOURNAL_FILE_LOCATION,
+    JOURNAL_MAX_RECORDS,
+    JOURNAL_MAX_BYTES,
+)
+from vending_machine.core.exceptions import CorruptStateError
+from vending_machine.core.vending_machine import VendingMachine
+from .base import Storage
+from .durability import remove_backups, resolve, sync, sync_directory
+from .locking import lock_path
+from .snapshot import load_snapshot, open_snapshot, save_snapshot, reattach
+
+
+class CompactionReport(NamedTuple):
+    """
+    What a compaction did, so it can be reported back to the user.
+    """
+
+    records_folded: int
+    bytes_before: int
+    bytes_after: int
+    replay_seconds: float
+
+    @property
+    def bytes_reclaimed(self) -> int:  # pylint: disable=missing-docstring
+        return self.bytes_before - self.bytes_after
+
+
+def _line(fields: Dict[str, Any]) -> str:
+    """
+    A journal line holding the fields, with a CRC32 of them ("crc") like
+    snapshot headers carry.
+    """
+
+    return json.dumps(dict(fields, crc=zlib.crc32(json.dumps(fields).encode()))) + "\n"
+
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    """
+    The fields of a journal line, or None if it's damaged. Lines from
+    before records had a CRC aren't checked.
+    """
+
+    try:
+        fields = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(fields, dict):
+        return None
+    if "crc" in fields:
+        checksum = fields.pop("crc")
+        if zlib.crc32(json.dumps(fields).encode()) != checksum:
+            return None
+
+    return fields
+
+
+class JournalStorage(Storage):
+    """
+    Persists the machine as a snapshot plus an append-only journal of
+    change records. Every deposit, purchase and dispense is appended to
+    the journal as one line as it happens, so the cost of a change no
+    longer depends on how much history the machine has. Loading reads
+    the snapshot and replays the journal on top of it.
+
+    Every record carries a sequence number, and the snapshot remembers
+    the last sequence number folded into it, so records that already
+    made it into a snapshot are never applied twice. The journal starts
+    with a header line holding the sequence number of the snapshot it
+    was started on ("base"), and every line carries a CRC32. A journal
+    started on a newer snapshot than the one loaded (say the snapshot
+    was lost and its backup put back), or with a damaged line, raises a
+    CorruptStateError rather than being applied to the wrong state.
+
+    Once the journal passes max_records or max_bytes, committing folds
+    it into a new snapshot (compaction). That caps how long a cold start
+    can spend replaying, however long the machine has been running.
+
+    How durably appends and snapshots are written is set by durability,
+    the configured DURABILITY unless given: at "none" appends pile up in
+    the open journal's buffer until the machine is committed, at "flush"
+    each one is handed to the operating system and at "fsync" each one
+    is forced onto the disk.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str = STATE_FILE_LOCATION,
+        journal_path: str = JOURNAL_FILE_LOCATION,
+        max_records: int = JOURNAL_MAX_RECORDS,
+        max_bytes: int = JOURNAL_MAX_BYTES,
+        state_format: str = None,
+        durability: str = None,
+    ):
+        self.snapshot_path = snapshot_path
+        self.lock_path = lock_path(snapshot_path)
+        self.journal_path = journal_path
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        # Format snapshots are saved in, the configured STATE_FORMAT
+        # unless given. Either is read back.
+        self.state_format = state_format
+        self.durability = durability
+        self.seq = 0
+        # Records currently sitting in the journal, and how long the
+        # last load spent replaying them.
+        self.journal_records = 0
+        self.replay_seconds = 0.0
+        self._reader = None
+        self._machine: Optional[VendingMachine] = None
+        # The journal, kept open for appending between changes.
+        self._journal = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.snapshot_path)
+
+    def load(self) -> VendingMachine:
+        self._reader, machine, self.recovered = load_snapshot(self.snapshot_path)
+        self.seq = self._reader.header.get("journal_seq", 0)
+
+        started = time.perf_counter()
+        self._replay(machine)
+        self.replay_seconds = time.perf_counter() - started
+
+        machine.on_change = self.append
+        self._machine = machine
+
+        return machine
+
+    def _replay(self, machine: VendingMachine) -> None:
+        """
+        Applies every journal record newer than the snapshot to the
+        machine. A torn last line (the process died halfway through an
+        append) is cut off so the next append starts on a clean line.
+        """
+
+        self.journal_records = 0
+        self._close_journal()
+        if not os.path.isfile(self.journal_path):
+            return None
+
+        valid_bytes = 0
+        with open(self.journal_path, "rb") as file:
+            for number, line in enumerate(file, start=1):
+                if not line.endswith(b"\n"):
+                    break
+                record = _parse(line)
+                if record is None:
+                    raise CorruptStateError(
+                        f"{self.journal_path} is damaged on line {number}."
+                    )
+                valid_bytes += len(line)
+                if "base" in record:
+                    # The header. Journals from before it just have records.
+                    if record["base"] > self.seq:
+                        raise self._newer_than_snapshot()
+                    continue
+                self.journal_records += 1
+                if record["seq"] <= self.seq:
+                    continue
+                if record["seq"] != self.seq + 1:
+                    raise self._newer_than_snapshot()
+                machine.apply(record)
+                self.seq = record["seq"]
+
+        if valid_bytes < os.path.getsize(self.journal_path):
+            os.truncate(self.journal_path, valid_bytes)
+
+        return None
+
+    def _newer_than_snapshot(self) -> CorruptStateError:
+        return CorruptStateError(
+            f"{self.journal_path} holds changes made on top of a newer snapshot "
+            f"than {self.snapshot_path}, which must have been lost. Move the "
+            f"journal aside to carry on from the snapshot as it is."
+        )
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Appends one change record to the journal.
+        """
+
+        durability = resolve(self.durability)
+        if self._journal is not None and self._journal_replaced():
+            self._close_journal()
+        if self._journal is None:
+            created = not os.path.isfile(self.journal_path)
+            self._journal = open(self.journal_path, "a")
+            if created:
+                self._journal.write(_line({"base": self.seq}))
+                sync_directory(self.journal_path, durability)
+
+        self.seq += 1
+        self._journal.write(_line(dict(record, seq=self.seq)))
+        sync(self._journal, durability)
+        self.journal_records += 1
+
+    def _journal_replaced(self) -> bool:
+        # Another storage (in this process or another) compacted while the
+        # journal was open, removing the file this one still appends to.
+        try:
+            current = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self._journal.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def save(self, machine: VendingMachine) -> None:
+        """
+        Writes a fresh snapshot that includes every journaled change,
+        then drops the journal.
+
+        The snapshot is renamed over the old one once complete, so a crash
+        leaves either the old snapshot with the full journal or the new
+        snapshot, whose journal_seq makes any leftover journal records
+        no-ops.
+        """
+
+        reader = self._reader if machine is self._machine else None
+        state_format = self.state_format or vending_machine.STATE_FORMAT
+        self._close_journal()
+        save_snapshot(
+            self.snapshot_path,
+            machine,
+            reader,
+            state_format,
+            self.durability,
+            journal_seq=self.seq,
+        )
+        self._reader = open_snapshot(self.snapshot_path)
+        self._machine = machine
+        reattach(machine, self._reader)
+
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_records = 0
+
+    def commit(self, machine: VendingMachine) -> None:
+        if machine.on_change != self.append:
+            # Not loaded through this storage, so nothing was journaled.
+            self.save(machine)
+        elif self.needs_compaction():
+            self.compact(machine)
+        elif self._journal is not None:
+            self._journal.flush()
+
+    def needs_compaction(self) -> bool:
+        """
+        Whether the journal has grown past the configured limits.
+        """
+
+        if self.journal_records >= self.max_records:
+            return True
+
+        if self._journal is not None:
+            self._journal.flush()
+
+        return (
+            os.path.isfile(self.journal_path)
+            and os.path.getsize(self.journal_path) >= self.max_bytes
+        )
+
+    def compact(self, machine: VendingMachine = None) -> CompactionReport:
+        """
+        Folds the journal into a fresh snapshot. If no machine is given,
+        it gets loaded (replaying the journal) first.
+        """
+
+        if machine is None:
+            machine = self.load()
+
+        bytes_before = self._size()
+        records_folded = self.journal_records
+        self.save(machine)
+
+        return CompactionReport(
+            records_folded=records_folded,
+            bytes_before=bytes_before,
+            bytes_after=self._size(),
+            replay_seconds=self.replay_seconds,
+        )
+
+    def _size(self) -> int:
+        if self._journal is not None:
+            self._journal.flush()
+        return sum(
+            os.path.getsize(path)
+            for path in (self.snapshot_path, self.journal_path)
+            if os.path.isfile(path)
+        )
+
+    def destroy(self) -> None:
+        self._close_journal()
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.isfile(path):
+                os.remove(path)
+        remove_backups(self.snapshot_path)
@@ -0,0 +1,60 @@
+import os
+from typing import Optional
+
+import vending_machine
+from vending_machine import STATE_FILE_LOCATION
+from vending_machine.core.vending_machine import VendingMachine
+from .base import Storage
+from .durability import remove_backups
+from .locking import lock_path
+from .snapshot import load_snapshot, open_snapshot, save_snapshot, reattach
+
+
+class JsonStorage(Storage):
+    """
+    Persists the whole machine as a snapshot (see snapshot.py for the
+    layout), rewritten after every change. Loading a JSON snapshot only
+    reads the header; items and purchases are read when they're first
+    used.
+
+    Snapshots are saved in state_format, which defaults to the
+    configured STATE_FORMAT, and loaded in whichever format they're in.
+    They're written as durably as durability asks, the configured
+    DURABILITY unless given, and the previous snapshot is kept to fall
+    back to if the latest one is found damaged on loading.
+    """
+
+    def __init__(
+        self,
+        path: str = STATE_FILE_LOCATION,
+        state_format: str = None,
+        durability: str = None,
+    ):
+        self.path = path
+        self.lock_path = lock_path(path)
+        self.state_format = state_format
+        self.durability = durability
+        self._reader = None
+        self._machine: Optional[VendingMachine] = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def load(self) -> VendingMachine:
+        self._reader, self._machine, self.recovered = load_snapshot(self.path)
+
+        return self._machine
+
+    def save(self, machine: VendingMachine) -> None:
+        reader = self._reader if machine is self._machine else None
+        state_format = self.state_format or vending_machine.STATE_FORMAT
+        save_snapshot(self.path, machine, reader, state_format, self.durability)
+
+        self._reader = open_snapshot(self.path)
+        self._machine = machine
+        reattach(machine, self._reader)
+
+    def destroy(self) -> None:
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        remove_backups(self.path)
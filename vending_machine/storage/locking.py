@@ -0,0 +1,53 @@
+"""
+Advisory file locks keeping CLI commands running in parallel from
+interleaving their load, change and commit. Locks are taken on a
+separate lock file next to the state, which is never replaced or
+removed, so renaming a new snapshot into place doesn't drop the lock.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = ".lock"
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """
+    Holds a lock on the file at path (created if missing) until the
+    block finishes, waiting for it if another process has it. Shared
+    locks can be held by many processes at once, but not alongside an
+    exclusive one. Windows only has exclusive locks, so shared ones are
+    exclusive there.
+    """
+
+    with open(path, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            # Gives up with an OSError after trying for about 10 seconds.
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+        try:
+            yield None
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def lock_path(path: str) -> str:
+    """
+    The lock file guarding the state stored at path.
+    """
+
+    return path + LOCK_SUFFIX
@@ -0,0 +1,601 @@
+"""
+Storage backend keeping the inventory in a file of fixed-size records
+that is memory-mapped, so a change only rewrites the bytes it touches:
+
+    header (64 bytes): magic (8s), version (u16), slot record size (u16),
+                       slot count (u32), balance in cents (i64),
+                       purchase count (u64), then how many of each
+                       denomination in DENOMINATIONS the machine holds
+                       (u32 each, zero padding in version 1)
+    one record per slot (64 bytes): position (8s), name (32s),
+                       price in cents (i64), stock (u32), units sold (u32),
+                       revenue in cents (i64)
+
+Purchases go to a separate file of packed fixed-size records (slot
+index (u32), price in cents (i64), timestamp (f64, NaN for none)), which
+only ever gets appended to. Strings are UTF-8, padded with zero bytes.
+
+A slot that gets restocked with a different item after selling some of
+the old one keeps the old record, retired (its stock set to RETIRED),
+so the purchases pointing at it still name the item they bought, and
+gets a new record at the end for the new item. Units sold and revenue
+are per record, so per item. Version 2 files don't have retired records.
+"""
+
+import math
+import mmap
+import os
+import struct
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from vending_machine import INVENTORY_FILE_LOCATION, PURCHASES_FILE_LOCATION
+from vending_machine.core.change import DENOMINATIONS, Coins
+from vending_machine.core.item import Item
+from vending_machine.core.purchase import Purchase, page
+from vending_machine.core.sales import SalesAggregates, Tally
+from vending_machine.core.vending_machine import VendingMachine, purchased_positions
+from vending_machine.utils.money import Money
+from .base import Storage
+from .durability import atomic_write, resolve, sync
+from .locking import lock_path
+
+MAGIC = b"VMINVENT"
+VERSION = 3
+
+HEADER = struct.Struct("<8sHHIqQ")
+HEADER_SIZE = 64
+# The parts of the header and of a slot record that change in place.
+BALANCE = struct.Struct("<qQ")
+BALANCE_OFFSET = 16
+VERSION_FIELD = struct.Struct("<H")
+VERSION_OFFSET = 8
+COINS = struct.Struct(f"<{len(DENOMINATIONS)}I")
+COINS_OFFSET = 32
+SLOT = struct.Struct("<8s32sqIIq")
+SLOT_SALES = struct.Struct("<IIq")
+SLOT_SALES_OFFSET = 48
+
+# The stock of a retired slot record, one more than MAX_QUANTITY.
+RETIRED = 2 ** 32 - 1
+
+PURCHASE = struct.Struct("<Iqd")
+CHUNK_PURCHASES = 4096
+
+
+def _encode(text: str, size: int) -> bytes:
+    encoded = text.encode()
+    if len(encoded) > size:
+        raise ValueError(f"{text} is longer than the {size} bytes it gets.")
+    return encoded
+
+
+def _decode(raw: bytes) -> str:
+    return raw.rstrip(b"\0").decode()
+
+
+def _pack_record(position: str, item: Item, tally: Tally) -> bytes:
+    return SLOT.pack(
+        _encode(position, 8),
+        _encode(item.name, 32),
+        item.price.cents,
+        item.remaining_stock,
+        tally.units,
+        tally.revenue.cents,
+    )
+
+
+def _less(tally: Tally, retired: Optional[Tally]) -> Tally:
+    """
+    What a position's current slot record sold: all of its sales, less
+    those of its retired records.
+    """
+
+    if retired is None:
+        return tally
+    return Tally(tally.units - retired.units, tally.revenue - retired.revenue)
+
+
+def _coin_counts(coins: Coins) -> List[int]:
+    if not set(coins) <= set(DENOMINATIONS):
+        raise ValueError(f"Only {list(DENOMINATIONS)} cent pieces can be stored.")
+    return [coins.get(denomination, 0) for denomination in DENOMINATIONS]
+
+
+class PackedPurchaseLog:
+    """
+    List-like view of the purchases file. Appending writes one record to
+    the end of the file; reading goes through the file in chunks, so the
+    history is never held in memory. Only the first count records are
+    part of the log, anything after them was never committed.
+
+    sellers holds the position and item name of every slot record, which
+    the purchase records index into, and slot_ids which of them each
+    position currently sells from.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sellers: List[Tuple[str, str]],
+        slot_ids: Dict[str, int],
+        count: int,
+        durability: str = "fsync",
+    ):
+        self.path = path
+        self.sellers = sellers
+        self.slot_ids = slot_ids
+        self.count = count
+        self.durability = durability
+
+    def _purchase(self, slot: int, cents: int, timestamp: float) -> Purchase:
+        position, name = self.sellers[slot]
+        return Purchase(
+            position, Money(cents), None if math.isnan(timestamp) else timestamp, name
+        )
+
+    def _iter_from(self, start: int) -> Iterator[Purchase]:
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "rb") as file:
+            file.seek(start * PURCHASE.size)
+            remaining = self.count - start
+            while remaining > 0:
+                wanted = min(remaining, CHUNK_PURCHASES)
+                chunk = file.read(wanted * PURCHASE.size)
+                if len(chunk) < wanted * PURCHASE.size:
+                    raise ValueError(f"{self.path} is shorter than its count.")
+                for record in PURCHASE.iter_unpack(chunk):
+                    yield self._purchase(*record)
+                remaining -= wanted
+
+    def __iter__(self) -> Iterator[Purchase]:
+        return self._iter_from(0)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> Purchase:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("purchase index out of range")
+
+        return next(self._iter_from(index))
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def append(self, purchase: Purchase) -> None:
+        """
+        Writes the purchase to the end of the file. It only counts once
+        MmapStorage has updated the count in the inventory header.
+        """
+
+        timestamp = math.nan if purchase.timestamp is None else purchase.timestamp
+        with open(self.path, "ab") as file:
+            file.write(
+                PURCHASE.pack(
+                    self.slot_ids[purchase.position], purchase.price.cents, timestamp
+                )
+            )
+            sync(file, self.durability)
+        self.count += 1
+
+    def extend(self, purchases: Iterable[Purchase]) -> None:
+        """
+        Writes several purchases to the end of the file in one write.
+        """
+
+        records = [
+            PURCHASE.pack(
+                self.slot_ids[purchase.position],
+                purchase.price.cents,
+                math.nan if purchase.timestamp is None else purchase.timestamp,
+            )
+            for purchase in purchases
+        ]
+        with open(self.path, "ab") as file:
+            file.write(b"".join(records))
+            sync(file, self.durability)
+        self.count += len(records)
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        since: Optional[float] = None,
+    ) -> Iterator[Purchase]:
+        """
+        A page of purchases. Without since, reading starts right at offset.
+        """
+
+        if since is not None:
+            return page(self, offset, limit, since)
+
+        return islice(self._iter_from(min(offset, self.count)), limit)
+
+
+class MmapStorage(Storage):
+    """
+    Persists the machine as a memory-mapped inventory file plus an
+    append-only purchases file (see the module docstring for both
+    layouts). A machine loaded from here writes each change in place: a
+    purchase appends one record and rewrites its slot's stock and sales
+    and the balance, flushing only the pages those bytes are on. That
+    costs the same however many slots and purchases the machine has.
+
+    The purchase count in the header is updated after the purchase
+    record is appended, so a record written by a purchase that never
+    finished gets dropped on the next load.
+
+    durability (the configured DURABILITY unless given) decides whether
+    changed pages get flushed to disk: only at "fsync", as the map is
+    the operating system's page cache to begin with, so "none" and
+    "flush" already survive the process dying. Full saves are written
+    next to the files and renamed into place. As the inventory file
+    keeps changing in place, no backup of it is kept.
+    """
+
+    def __init__(
+        self,
+        inventory_path: str = INVENTORY_FILE_LOCATION,
+        purchases_path: str = PURCHASES_FILE_LOCATION,
+        durability: str = None,
+    ):
+        self.inventory_path = inventory_path
+        self.lock_path = lock_path(inventory_path)
+        self.purchases_path = purchases_path
+        self.durability = durability
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        # The position and item name of every slot record, which record
+        # each position sells from now and what its retired ones sold.
+        self._sellers: List[Tuple[str, str]] = []
+        self._slots: Dict[str, int] = {}
+        self._retired: Dict[str, Tally] = {}
+        self._version = VERSION
+        self._machine: Optional[VendingMachine] = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.inventory_path)
+
+    def _open(self) -> None:
+        self._close()
+        self._file = open(self.inventory_path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+        magic, version, slot_size, _, _, _ = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{self.inventory_path} isn't an inventory file.")
+        if version > VERSION or slot_size != SLOT.size:
+            raise ValueError(
+                f"{self.inventory_path} was written by a newer version "
+                f"(format {version})."
+            )
+        self._version = version
+
+    def _close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def load(self) -> VendingMachine:
+        self._open()
+        _, _, _, slot_count, balance, purchase_count = HEADER.unpack_from(self._map)
+        items, sales = self._read_slots(slot_count)
+
+        # Drops a record appended by a purchase that didn't get to
+        # update the header.
+        committed = purchase_count * PURCHASE.size
+        if os.path.isfile(self.purchases_path):
+            if os.path.getsize(self.purchases_path) > committed:
+                os.truncate(self.purchases_path, committed)
+
+        coins = None
+        if self._version >= 2:
+            coins = dict(zip(DENOMINATIONS, COINS.unpack_from(self._map, COINS_OFFSET)))
+
+        machine = VendingMachine(
+            items=items,
+            balance=Money(balance),
+            coins=coins,
+            purchases=PackedPurchaseLog(
+                self.purchases_path,
+                self._sellers,
+                self._slots,
+                purchase_count,
+                resolve(self.durability),
+            ),
+            sales=sales,
+        )
+        machine.on_change = self._write_change
+        self._machine = machine
+
+        return machine
+
+    def _read_slots(self, slot_count: int) -> Tuple[Dict[str, Item], SalesAggregates]:
+        """
+        Reads the slot records, returning the items in the live ones and
+        the sales all of them add up to.
+        """
+
+        items: Dict[str, Item] = {}
+        sales = SalesAggregates()
+        self._sellers, self._slots, self._retired = [], {}, {}
+        for slot in range(slot_count):
+            position, name, cents, stock, units, revenue = SLOT.unpack_from(
+                self._map, HEADER_SIZE + slot * SLOT.size
+            )
+            position, name = _decode(position), _decode(name)
+            self._sellers.append((position, name))
+            if stock != RETIRED:
+                items[position] = Item(name, Money(cents), stock)
+                self._slots[position] = slot
+
+            if not units:
+                # The aggregates only have entries for what was sold.
+                continue
+            tallies = [
+                sales.total,
+                sales.by_position.setdefault(position, Tally()),
+                sales.by_item.setdefault(name, Tally()),
+            ]
+            if stock == RETIRED:
+                tallies.append(self._retired.setdefault(position, Tally()))
+            for tally in tallies:
+                tally.units += units
+                tally.revenue = tally.revenue + Money(revenue)
+
+        return items, sales
+
+    def _live_sales(self, machine: VendingMachine, position: str) -> Tally:
+        return _less(
+            machine.sales.by_position.get(position, Tally()),
+            self._retired.get(position),
+        )
+
+    def _retires(self, position: str) -> bool:
+        """
+        Whether the slot's record has to be retired for the item now in
+        it: it sold a different one.
+        """
+
+        _, name = self._sellers[self._slots[position]]
+        return (
+            name != self._machine.items[position].name
+            and self._live_sales(self._machine, position).units > 0
+        )
+
+    def _flush(self, offset: int, length: int) -> None:
+        """
+        Flushes the pages holding the given range of the inventory file,
+        if the durability level asks for it.
+        """
+
+        if resolve(self.durability) != "fsync":
+            return
+
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        self._map.flush(start, offset + length - start)
+
+    def _write_change(
+        self, record: Dict[str, Any]
+    ) -> None:  # pylint: disable=protected-access
+        machine = self._machine
+        end = BALANCE_OFFSET + BALANCE.size
+
+        if record["op"] == "restock":
+            if any(
+                position not in self._slots or self._retires(position)
+                for position in record["slots"]
+            ):
+                # New slots, and new items in slots that sold the old one,
+                # need records the file doesn't have room for.
+                self.save(machine)
+                return None
+            # Every record is packed before any gets written, so one that
+            # doesn't fit leaves the file as it was.
+            packed = {
+                position: _pack_record(
+                    position,
+                    machine.items[position],
+                    self._live_sales(machine, position),
+                )
+                for position in record["slots"]
+            }
+            for position, slot in packed.items():
+                offset = HEADER_SIZE + self._slots[position] * SLOT.size
+                self._map[offset : offset + SLOT.size] = slot
+                self._sellers[self._slots[position]] = (
+                    position,
+                    machine.items[position].name,
+                )
+            end = HEADER_SIZE + len(self._slots) * SLOT.size
+
+        for position in set(purchased_positions(record)):
+            item = machine.items[position]
+            tally = self._live_sales(machine, position)
+            offset = HEADER_SIZE + self._slots[position] * SLOT.size + SLOT_SALES_OFFSET
+            SLOT_SALES.pack_into(
+                self._map,
+                offset,
+                item.remaining_stock,
+                tally.units,
+                tally.revenue.cents,
+            )
+            end = max(end, offset + SLOT_SALES.size)
+
+        BALANCE.pack_into(
+            self._map, BALANCE_OFFSET, machine._balance.cents, len(machine.purchases)
+        )
+        if "coins" in record:
+            COINS.pack_into(self._map, COINS_OFFSET, *_coin_counts(machine.coins))
+            end = max(end, COINS_OFFSET + COINS.size)
+            if self._version < 2:
+                # Files from before coins were tracked had padding there.
+                VERSION_FIELD.pack_into(self._map, VERSION_OFFSET, VERSION)
+                self._version = VERSION
+        # One flush covering the header and the slots. With a slot more
+        # than a page away, the pages in between are clean and cost nothing.
+        self._flush(BALANCE_OFFSET, end - BALANCE_OFFSET)
+
+        return None
+
+    def save(self, machine: VendingMachine) -> None:  # pylint: disable=protected-access
+        purchases = machine.purchases
+        if (
+            isinstance(purchases, PackedPurchaseLog)
+            and purchases.path == self.purchases_path
+            and purchases.sellers == self._sellers
+        ):
+            # The purchase records already point into this file.
+            records = self._carry_records(machine)
+        else:
+            records = self._write_purchases(machine)
+
+        header = (
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                SLOT.size,
+                len(records),
+                machine._balance.cents,
+                len(purchases),
+            )
+            + COINS.pack(*_coin_counts(machine.coins))
+        ).ljust(HEADER_SIZE, b"\0")
+
+        with atomic_write(self.inventory_path, self.durability, backup=False) as file:
+            file.write(header)
+            file.write(b"".join(records))
+
+        self._open()
+        self._read_slots(len(records))
+        machine.purchases = PackedPurchaseLog(
+            self.purchases_path,
+            self._sellers,
+            self._slots,
+            len(purchases),
+            resolve(self.durability),
+        )
+        machine.on_change = self._write_change
+        self._machine = machine
+
+    def _carry_records(self, machine: VendingMachine) -> List[bytes]:
+        """
+        The slot records for a machine whose purchases point into the
+        current file, keeping every record where it is. Retired ones stay
+        as they are and live ones are packed from the machine, unless the
+        slot sold something other than what it holds now: then the record
+        is retired and the slot gets a new one at the end, like slots
+        without any.
+        """
+
+        records = []
+        live = set()
+        for slot, (position, name) in enumerate(self._sellers):
+            offset = HEADER_SIZE + slot * SLOT.size
+            record = self._map[offset : offset + SLOT.size]
+            item = machine.items.get(position)
+            if self._slots.get(position) == slot and item is not None:
+                tally = self._live_sales(machine, position)
+                if item.name == name or not tally.units:
+                    records.append(_pack_record(position, item, tally))
+                    live.add(position)
+                    continue
+                record = record[:SLOT_SALES_OFFSET] + SLOT_SALES.pack(
+                    RETIRED, tally.units, tally.revenue.cents
+                )
+            records.append(record)
+
+        records.extend(
+            _pack_record(position, item, Tally())
+            for position, item in machine.items.items()
+            if position not in live
+        )
+        return records
+
+    def _write_purchases(self, machine: VendingMachine) -> List[bytes]:
+        """
+        Writes the machine's purchases to a new purchases file, returning
+        the slot records they point into: one per slot, then a retired
+        one per item a slot sold before the one it holds now.
+        """
+
+        slot_ids = {
+            (position, item.name): slot
+            for slot, (position, item) in enumerate(machine.items.items())
+        }
+        # Checked before the purchases get written, so a slot that doesn't
+        # fit leaves both files as they were.
+        for position, name in slot_ids:
+            _encode(position, 8)
+            _encode(name, 32)
+        retired: Dict[Tuple[str, str], Tally] = {}
+        prices: Dict[Tuple[str, str], int] = {}
+        with atomic_write(self.purchases_path, self.durability, backup=False) as file:
+            for purchase in machine.purchases:
+                name = purchase.name
+                if name is None:
+                    # Made before names were recorded, so by what's there now.
+                    item = machine.items.get(purchase.position)
+                    name = item.name if item is not None else purchase.position
+                seller = (purchase.position, name)
+                slot = slot_ids.get(seller)
+                if slot is None:
+                    _encode(purchase.position, 8)
+                    _encode(name, 32)
+                    slot = slot_ids[seller] = len(slot_ids)
+                    retired[seller] = Tally()
+                if seller in retired:
+                    retired[seller].add(purchase.price)
+                    prices[seller] = purchase.price.cents
+                timestamp = (
+                    math.nan if purchase.timestamp is None else purchase.timestamp
+                )
+                file.write(PURCHASE.pack(slot, purchase.price.cents, timestamp))
+
+        retired_by_position: Dict[str, Tally] = {}
+        for (position, _), tally in retired.items():
+            total = retired_by_position.setdefault(position, Tally())
+            total.units += tally.units
+            total.revenue = total.revenue + tally.revenue
+
+        records = [
+            _pack_record(
+                position,
+                item,
+                _less(
+                    machine.sales.by_position.get(position, Tally()),
+                    retired_by_position.get(position),
+                ),
+            )
+            for position, item in machine.items.items()
+        ]
+        records.extend(
+            SLOT.pack(
+                _encode(position, 8),
+                _encode(name, 32),
+                prices[position, name],
+                RETIRED,
+                tally.units,
+                tally.revenue.cents,
+            )
+            for (position, name), tally in retired.items()
+        )
+        return records
+
+    def commit(self, machine: VendingMachine) -> None:
+        if machine is not self._machine:
+            self.save(machine)
+
+    def destroy(self) -> None:
+        self._close()
+        for path in (self.inventory_path, self.purchases_path):
+            if os.path.isfile(path):
+                os.remove(path)
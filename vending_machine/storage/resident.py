@@ -0,0 +1,50 @@
+import threading
+
+from vending_machine.core.vending_machine import VendingMachine
+from .base import Storage
+
+
+class ResidentStorage(Storage):
+    """
+    Keeps one machine in memory on behalf of the CLI commands running
+    inside the daemon, or in a batch. Loads hand out the resident
+    machine, and commits only flag it as dirty; the daemon's writer
+    thread (or the batch, every so often) persists it through the real
+    storage backend afterwards.
+    """
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self.machine = storage.load() if storage.exists() else None
+        self.lock = threading.RLock()
+        self.dirty = threading.Event()
+
+    def exists(self) -> bool:
+        return self.machine is not None
+
+    def load(self) -> VendingMachine:
+        return self.machine
+
+    def save(self, machine: VendingMachine) -> None:
+        # Only happens when a machine gets created, so it's done right
+        # away, and reloaded so backends can hook into its changes.
+        with self.lock, self.storage.locked():
+            self.storage.save(machine)
+            self.machine = self.storage.load()
+
+    def commit(self, machine: VendingMachine) -> None:
+        self.dirty.set()
+
+    def destroy(self) -> None:
+        with self.lock:
+            self.machine = None
+            self.storage.destroy()
+
+    def flush(self) -> None:
+        """
+        Persists the resident machine through the real storage backend.
+        """
+
+        with self.lock, self.storage.locked():
+            if self.machine is not None:
+                self.storage.commit(self.machine)
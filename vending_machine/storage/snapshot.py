@@ -0,0 +1,522 @@
+"""
+Sectioned snapshot layout shared by the JSON based storage backends.
+The first line is a small JSON header holding the balance, the coins
+and bills the machine holds and where each section starts (relative to
+the end of the header), followed by the sections themselves:
+
+    {"version": 3, "balance": "3.00", "coins": {"100": 40, ...},
+     "purchase_count": 2, "sections": {...}, "checksums": {...},
+     "blocks": {"purchases": [...]}, "checksum": 1283719403}
+    {"A1": {"name": "Gatorade (Blue)", "price": "1.75", ...}, ...}
+    {"total": {"units": 2, "revenue": "2.50"}, "by_position": {...}, ...}
+    {"position": "A1", "price": "1.75", "name": "Gatorade (Blue)"}
+    {"position": "B3", "price": "0.75", "name": "Lays"}
+
+Reading the balance only takes the header. Items and sales aggregates
+are parsed the first time they're used, and purchases (one per line)
+are streamed straight from the file, so none of them gets loaded by
+commands that don't need them.
+
+The header carries a CRC32 of itself ("checksum", over the header
+without that field), one per section ("checksums") and one per
+CHUNK_SIZE block of the purchases section ("blocks"). The header and
+the file's length are checked on opening, the items and sales when the
+machine gets built, and each block of purchases before any of its lines
+is used, so a page of them only reads (and checks) as far as it goes.
+Snapshots from before block checksums get their whole purchases
+section checked before the first of them is used. A damaged snapshot
+raises a CorruptStateError; load_snapshot falls back to the backup of
+the previous one (see durability.py), and so does finding the purchases
+damaged later on, for the next load.
+
+Files written before the sectioned layout (a single JSON document) can
+still be read, and so can binary snapshots (see binary.py): the format
+is picked when saving, and detected when loading.
+"""
+
+import json
+import os
+import zlib
+from itertools import chain, count, islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+from vending_machine import STATE_FORMATS
+from vending_machine.core.change import dump_coins, load_coins
+from vending_machine.core.exceptions import CorruptStateError
+from vending_machine.core.purchase import Purchase, PurchaseLog, page
+from vending_machine.core.sales import SalesAggregates
+from vending_machine.core.vending_machine import VendingMachine
+from vending_machine.utils.money import Money
+from .binary import BinaryReader, is_binary, write_binary
+from .durability import atomic_write, backup_path, restore_backup
+
+VERSION = 3
+CHUNK_SIZE = 1 << 16
+FORMATS = STATE_FORMATS
+
+
+class SnapshotReader:
+    """
+    Reads sections out of a snapshot file. The file stays open for as
+    long as the reader lives, so a snapshot replaced on disk in the
+    meantime (by renaming a new one over it) doesn't change what is read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        first_line = self.file.readline()
+        self.header: Dict[str, Any] = json.loads(first_line)
+        self.body_offset = len(first_line)
+
+        if "checksum" in self.header:
+            fields = dict(self.header)
+            checksum = fields.pop("checksum")
+            if zlib.crc32(json.dumps(fields).encode()) != checksum:
+                raise CorruptStateError(f"{path} has a corrupt header.")
+        if self.sectioned:
+            end = max(offset + length for offset, length in self.sections.values())
+            if os.fstat(self.file.fileno()).st_size != self.body_offset + end:
+                raise CorruptStateError(f"{path} is truncated.")
+
+    def __del__(self):
+        if hasattr(self, "file"):
+            self.file.close()
+
+    @property
+    def sectioned(self) -> bool:
+        """
+        False for files written before sections existed.
+        """
+        return "sections" in self.header
+
+    @property
+    def sections(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Where each section starts relative to the end of the header,
+        and how long it is.
+        """
+        return {
+            name: (offset, length)
+            for name, (offset, length) in self.header["sections"].items()
+        }
+
+    def span(self, name: str) -> Tuple[int, int]:
+        """
+        Where a section starts and ends in the file.
+        """
+
+        offset, length = self.sections[name]
+        start = self.body_offset + offset
+        return start, start + length
+
+    def iter_chunks(self, name: str) -> Iterator[bytes]:
+        """
+        Streams the raw bytes of a section, one CHUNK_SIZE block at a
+        time. Seeks before every read, so several iterations can be
+        interleaved. A section with block checksums has every block
+        checked before it's handed out, any other one is checked against
+        its checksum once it's been read to its end.
+        """
+
+        blocks = self.header.get("blocks", {}).get(name)
+        expected = self.header.get("checksums", {}).get(name)
+        checksum = 0
+        position, end = self.span(name)
+        for index in count():
+            if position >= end:
+                break
+            self.file.seek(position)
+            chunk = self.file.read(min(CHUNK_SIZE, end - position))
+            if not chunk:
+                raise CorruptStateError(
+                    f"{self.path} is truncated in its {name} section."
+                )
+            position += len(chunk)
+            if blocks is not None:
+                if index >= len(blocks) or zlib.crc32(chunk) != blocks[index]:
+                    raise CorruptStateError(
+                        f"{self.path} is corrupt in its {name} section."
+                    )
+            elif expected is not None:
+                checksum = zlib.crc32(chunk, checksum)
+            yield chunk
+
+        if blocks is None and expected is not None and checksum != expected:
+            raise CorruptStateError(f"{self.path} is corrupt in its {name} section.")
+
+    def replaced(self) -> bool:
+        """
+        Whether the file at path is no longer the one being read.
+        """
+
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.file.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def verify(self, name: str) -> None:
+        """
+        Reads a section through, checking it against its checksum.
+        """
+
+        for _ in self.iter_chunks(name):
+            pass
+
+    def iter_lines(self, name: str) -> Iterator[bytes]:
+        """
+        Streams a section one line at a time.
+        """
+
+        leftover = b""
+        for chunk in self.iter_chunks(name):
+            lines = (leftover + chunk).split(b"\n")
+            leftover = lines.pop()
+            yield from lines
+        if leftover:
+            yield leftover
+
+    def read(self, name: str) -> Any:
+        """
+        Reads and parses a whole section.
+        """
+
+        return json.loads(b"".join(self.iter_chunks(name)))
+
+    def machine(self) -> VendingMachine:
+        """
+        Builds a machine that loads its sections from this snapshot as
+        they are needed.
+        """
+
+        if not self.sectioned:
+            return VendingMachine.from_json(self.header)
+
+        # The purchases get checked as they're read, but these are small
+        # enough to check before anything gets built on them.
+        for name in ("items", "sales"):
+            if name in self.sections:
+                self.verify(name)
+
+        load_sales = None
+        if "sales" in self.sections:
+            load_sales = lambda: SalesAggregates.from_json(self.read("sales"))
+        coins = self.header.get("coins")
+
+        return VendingMachine(
+            balance=Money.parse(self.header["balance"]),
+            load_items=lambda: VendingMachine.items_from_json(self.read("items")),
+            purchases=SnapshotPurchaseLog(self),
+            load_sales=load_sales,
+            coins=load_coins(coins) if coins is not None else None,
+        )
+
+
+class SnapshotPurchaseLog:
+    """
+    List-like purchase log streaming the purchases section of a snapshot.
+    Purchases appended afterwards are kept in memory until the next
+    snapshot gets written, which copies the existing section over as is
+    instead of parsing it.
+    """
+
+    def __init__(self, reader: SnapshotReader):
+        self.reader = reader
+        self.stored = reader.header["purchase_count"]
+        self.appended = PurchaseLog()
+        self.verified = False
+
+    def _lines(self) -> Iterator[bytes]:
+        # Nothing read from a damaged section is ever acted on. Blocks
+        # get checked as they're read, but snapshots without block
+        # checksums have the whole section checked before its first line.
+        try:
+            if not self.verified and "purchases" not in self.reader.header.get(
+                "blocks", {}
+            ):
+                self.reader.verify("purchases")
+            self.verified = True
+            yield from self.reader.iter_lines("purchases")
+        except CorruptStateError as error:
+            raise recover(self.reader, error) from None
+
+    def __iter__(self) -> Iterator[Purchase]:
+        for line in self._lines():
+            yield Purchase.from_json(json.loads(line))
+        yield from self.appended
+
+    def __len__(self) -> int:
+        return self.stored + len(self.appended)
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        since: Optional[float] = None,
+    ) -> Iterator[Purchase]:
+        """
+        A page of purchases. Without since, the lines before offset get
+        skipped without being parsed.
+        """
+
+        if since is not None or offset >= self.stored:
+            return page(self, offset, limit, since)
+
+        lines = islice(self._lines(), offset, None)
+        purchases = chain(
+            (Purchase.from_json(json.loads(line)) for line in lines), self.appended
+        )
+
+        return page(purchases, 0, limit)
+
+    def __getitem__(self, index: int) -> Purchase:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("purchase index out of range")
+        if index >= self.stored:
+            return self.appended[index - self.stored]
+
+        return next(islice(iter(self), index, None))
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def append(self, purchase: Purchase) -> None:  # pylint: disable=missing-docstring
+        self.appended.append(purchase)
+
+    def extend(
+        self, purchases: Iterable[Purchase]
+    ) -> None:  # pylint: disable=missing-docstring
+        self.appended.extend(purchases)
+
+
+def _extend_blocks(blocks: List[int], length: int, added: bytes) -> List[int]:
+    """
+    The block checksums of a section of length bytes, whose block
+    checksums were blocks, once added is put on the end of it.
+    """
+
+    blocks = list(blocks)
+    view = memoryview(added)
+    used = length % CHUNK_SIZE
+    if used and view:
+        # The last block only gets filled up.
+        blocks[-1] = zlib.crc32(view[: CHUNK_SIZE - used], blocks[-1])
+        view = view[CHUNK_SIZE - used :]
+    for start in range(0, len(view), CHUNK_SIZE):
+        blocks.append(zlib.crc32(view[start : start + CHUNK_SIZE]))
+    return blocks
+
+
+def _purchases_section(purchases) -> Tuple[int, int, List[int], Iterable[bytes]]:
+    """
+    The purchases section's length, checksum, block checksums and an
+    iterable of its bytes. A log streamed from an earlier snapshot gets
+    copied across without being parsed or held in memory, carrying on
+    from the checksums that snapshot has for it.
+    """
+
+    if isinstance(purchases, SnapshotPurchaseLog):
+        reader = purchases.reader
+        start, end = reader.span("purchases")
+        appended = b"".join(
+            json.dumps(purchase.to_json()).encode() + b"\n"
+            for purchase in purchases.appended
+        )
+        checksum = reader.header.get("checksums", {}).get("purchases")
+        blocks = reader.header.get("blocks", {}).get("purchases")
+        if checksum is None or blocks is None:
+            # Written before (block) checksums, so this one time it gets read.
+            checksum, blocks = 0, []
+            for chunk in reader.iter_chunks("purchases"):
+                checksum = zlib.crc32(chunk, checksum)
+                blocks.append(zlib.crc32(chunk))
+        return (
+            end - start + len(appended),
+            zlib.crc32(appended, checksum),
+            _extend_blocks(blocks, end - start, appended),
+            chain(reader.iter_chunks("purchases"), [appended]),
+        )
+
+    section = b"".join(
+        json.dumps(purchase.to_json()).encode() + b"\n" for purchase in purchases
+    )
+    return len(section), zlib.crc32(section), _extend_blocks([], 0, section), [section]
+
+
+def write_snapshot(
+    path: str,
+    machine: VendingMachine,
+    reader: Optional[SnapshotReader] = None,
+    durability: Optional[str] = None,
+    **extra,
+) -> None:
+    """
+    Writes the machine to path in the sectioned layout. The snapshot is
+    written next to it and renamed into place (as durably as durability
+    asks, see durability.py), so the purchases of the snapshot being
+    replaced can be streamed across while writing. If the
+    machine was loaded through reader and its items or sales were never
+    used, they get copied across without parsing them either.
+
+    Any extra keyword arguments are stored in the header.
+    """
+
+    def dump(section: Any) -> bytes:
+        return json.dumps(section).encode() + b"\n"
+
+    # Sections the machine never used can be copied over from the
+    # snapshot it was loaded from, without parsing them.
+    if reader is not None and not machine.items_loaded:
+        items = b"".join(reader.iter_chunks("items"))
+    else:
+        items = dump(
+            {position: item.to_json() for position, item in machine.items.items()}
+        )
+
+    if (
+        reader is not None
+        and not machine.sales_loaded
+        and "sales" in reader.header["sections"]
+    ):
+        sales = b"".join(reader.iter_chunks("sales"))
+    else:
+        sales = dump(machine.sales.to_json())
+
+    purchases_length, purchases_checksum, blocks, purchases = _purchases_section(
+        machine.purchases
+    )
+    header = dict(
+        extra,
+        version=VERSION,
+        balance=str(machine._balance),  # pylint: disable=protected-access
+        coins=dump_coins(machine.coins),
+        purchase_count=len(machine.purchases),
+        sections={
+            "items": [0, len(items)],
+            "sales": [len(items), len(sales)],
+            "purchases": [len(items) + len(sales), purchases_length],
+        },
+        checksums={
+            "items": zlib.crc32(items),
+            "sales": zlib.crc32(sales),
+            "purchases": purchases_checksum,
+        },
+        blocks={"purchases": blocks},
+    )
+    header["checksum"] = zlib.crc32(json.dumps(header).encode())
+
+    try:
+        with atomic_write(path, durability) as file:
+            file.write(json.dumps(header).encode() + b"\n")
+            file.write(items)
+            file.write(sales)
+            for chunk in purchases:
+                file.write(chunk)
+    except CorruptStateError as error:
+        # Only the purchases copied across are checked as they're written.
+        if not isinstance(machine.purchases, SnapshotPurchaseLog):
+            raise
+        raise recover(machine.purchases.reader, error) from None
+
+
+def open_snapshot(path: str) -> Union[SnapshotReader, BinaryReader]:
+    """
+    Opens a snapshot with the reader for whichever format it's in.
+    """
+
+    if is_binary(path):
+        return BinaryReader(path)
+    return SnapshotReader(path)
+
+
+def load_snapshot(
+    path: str,
+) -> Tuple[Union[SnapshotReader, BinaryReader], VendingMachine, bool]:
+    """
+    Opens the snapshot at path and builds its machine. If the snapshot
+    is damaged, say cut short by a crash or not matching its checksums,
+    the backup of the snapshot it replaced is put back and loaded
+    instead. Returns the reader, the machine and whether the backup had
+    to be used. Raises a ValueError if there's no usable backup either.
+    """
+
+    try:
+        reader = open_snapshot(path)
+        return reader, reader.machine(), False
+    except ValueError:
+        if not os.path.isfile(backup_path(path)):
+            raise
+        reader = open_snapshot(backup_path(path))
+        machine = reader.machine()
+
+    restore_backup(path)
+    return reader, machine, True
+
+
+def recover(reader: SnapshotReader, error: CorruptStateError) -> CorruptStateError:
+    """
+    What to raise when the purchases of a snapshot turn out damaged, long
+    after it was loaded. Like load_snapshot does for the rest of the
+    file, the backup of the snapshot it replaced is put back (if there
+    is one, and the damaged snapshot is still in place) so the next load
+    gets the last good copy.
+    """
+
+    if reader.replaced():
+        return CorruptStateError(f"{error} It has been replaced since, try again.")
+    if not os.path.isfile(backup_path(reader.path)):
+        return CorruptStateError(f"{error} There's no backup of it to go back to.")
+
+    restore_backup(reader.path)
+    return CorruptStateError(
+        f"{error} The last good copy of it was put back, so recent changes "
+        f"may be missing. Try again."
+    )
+
+
+def save_snapshot(
+    path: str,
+    machine: VendingMachine,
+    reader: Optional[Union[SnapshotReader, BinaryReader]] = None,
+    state_format: str = "json",
+    durability: Optional[str] = None,
+    **extra,
+) -> None:
+    """
+    Writes the machine to path in the given format. reader is the one
+    the machine was loaded through, if any.
+    """
+
+    if state_format == "binary":
+        write_binary(path, machine, durability, **extra)
+    elif state_format == "json":
+        if not isinstance(reader, SnapshotReader):
+            reader = None
+        write_snapshot(path, machine, reader, durability, **extra)
+    else:
+        raise ValueError(
+            f"Unknown state format, need one of {list(FORMATS)} and got {state_format}"
+        )
+
+
+def reattach(
+    machine: VendingMachine, reader: Union[SnapshotReader, BinaryReader]
+) -> None:
+    """
+    Points the purchase log of a machine that was just written at the
+    new snapshot, so its appended purchases aren't kept in memory (and
+    written again) from then on.
+    """
+
+    if isinstance(machine.purchases, SnapshotPurchaseLog):
+        if isinstance(reader, BinaryReader):
+            machine.purchases = reader.purchases()
+        else:
+            machine.purchases = SnapshotPurchaseLog(reader)
@@ -0,0 +1,414 @@
+import os
+import sqlite3
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+from vending_machine import SQLITE_FILE_LOCATION
+from vending_machine.core.change import Coins
+from vending_machine.core.item import Item
+from vending_machine.core.purchase import Purchase
+from vending_machine.core.sales import SalesAggregates, Tally
+from vending_machine.core.vending_machine import VendingMachine, purchased_positions
+from vending_machine.utils.money import Money
+from .base import Storage
+from .durability import resolve
+from .locking import lock_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS machine (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    balance TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    position TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    price TEXT NOT NULL,
+    remaining_stock INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    position TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    created_at REAL,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS purchases_position ON purchases (position);
+CREATE TABLE IF NOT EXISTS sales (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE TABLE IF NOT EXISTS coins (
+    denomination_cents INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+"""
+
+# What SQLite syncs to disk at each durability level.
+SYNCHRONOUS = {"none": "OFF", "flush": "NORMAL", "fsync": "FULL"}
+
+# Indexes on columns added after the first release of the schema, which
+# can only be created once migrate() has added the column.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS purchases_created_at ON purchases (created_at);
+"""
+
+
+class SqlitePurchaseLog:
+    """
+    List-like view of the purchases table, so a machine can append to
+    and iterate over its purchases without the whole history ever
+    being loaded into memory. Appends join the transaction the storage
+    commits once the rest of the change has been written.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def _select(
+        self, where: str = "", params: tuple = (), limit: str = ""
+    ) -> Iterator[Purchase]:
+        cursor = self.connection.execute(
+            "SELECT position, price_cents, created_at, name FROM purchases "
+            f"{where} ORDER BY id {limit}",
+            params,
+        )
+        for position, price_cents, created_at, name in cursor:
+            yield Purchase(position, Money(price_cents), created_at, name)
+
+    def __iter__(self) -> Iterator[Purchase]:
+        return self._select()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM purchases").fetchone()[0]
+
+    def __getitem__(self, index: int) -> Purchase:
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError("purchase index out of range")
+
+        found = list(self._select(params=(index,), limit="LIMIT 1 OFFSET ?"))
+        if not found:
+            raise IndexError("purchase index out of range")
+
+        return found[0]
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def append(self, purchase: Purchase) -> None:
+        """
+        Inserts the purchase. Committed together with the stock and
+        balance changes by SqliteStorage.
+        """
+
+        self.connection.execute(
+            "INSERT INTO purchases (position, price_cents, created_at, name) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                purchase.position,
+                purchase.price.cents,
+                purchase.timestamp,
+                purchase.name,
+            ),
+        )
+
+    def extend(self, purchases: Iterable[Purchase]) -> None:
+        """
+        Inserts several purchases in one go, committed like append's.
+        """
+
+        self.connection.executemany(
+            "INSERT INTO purchases (position, price_cents, created_at, name) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                (
+                    purchase.position,
+                    purchase.price.cents,
+                    purchase.timestamp,
+                    purchase.name,
+                )
+                for purchase in purchases
+            ),
+        )
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        since: Optional[float] = None,
+    ) -> Iterator[Purchase]:
+        """
+        A page of purchases, filtered and paginated by SQLite.
+        """
+
+        where, params = "", ()
+        if since is not None:
+            where, params = "WHERE created_at >= ?", (since,)
+
+        # SQLite wants a LIMIT before any OFFSET, and -1 means no limit.
+        return self._select(
+            where,
+            params + (-1 if limit is None else limit, offset),
+            limit="LIMIT ? OFFSET ?",
+        )
+
+    def for_position(self, position: str) -> Iterator[Purchase]:
+        """
+        Purchases made from one slot, found through the position index.
+        """
+
+        return self._select("WHERE position = ?", (position,))
+
+    def total_spent(self) -> Money:
+        """
+        Sum of every purchase, computed by SQLite.
+        """
+
+        cents = self.connection.execute(
+            "SELECT COALESCE(SUM(price_cents), 0) FROM purchases"
+        ).fetchone()[0]
+
+        return Money(cents)
+
+
+class SqliteStorage(Storage):
+    """
+    Persists the machine in a SQLite database, with one row per slot
+    and an indexed purchases table. A machine loaded from here writes
+    each change as it happens, as a small transaction touching only the
+    affected rows.
+
+    SQLite looks after its own atomicity; durability (the configured
+    DURABILITY unless given) picks how often it syncs to disk.
+    """
+
+    def __init__(self, path: str = SQLITE_FILE_LOCATION, durability: str = None):
+        self.path = path
+        self.lock_path = lock_path(path)
+        self.durability = durability
+        self._connection: Optional[sqlite3.Connection] = None
+        self._machine: Optional[VendingMachine] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Lazily opened connection, creating the tables if needed.
+        """
+
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute(
+                f"PRAGMA synchronous = {SYNCHRONOUS[resolve(self.durability)]}"
+            )
+            self._connection.executescript(SCHEMA)
+            self._migrate()
+            self._connection.executescript(INDEXES)
+
+        return self._connection
+
+    def _migrate(self) -> None:
+        """
+        Adds columns introduced after a database was first created.
+        """
+
+        columns = {
+            row[1] for row in self._connection.execute("PRAGMA table_info(purchases)")
+        }
+        if "created_at" not in columns:
+            self._connection.execute("ALTER TABLE purchases ADD COLUMN created_at REAL")
+        if "name" not in columns:
+            self._connection.execute("ALTER TABLE purchases ADD COLUMN name TEXT")
+        self._connection.commit()
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def load(self) -> VendingMachine:
+        balance = self.connection.execute(
+            "SELECT balance FROM machine WHERE id = 1"
+        ).fetchone()[0]
+        items = {
+            position: Item(name, Money.parse(price), remaining_stock)
+            for position, name, price, remaining_stock in self.connection.execute(
+                "SELECT position, name, price, remaining_stock FROM items"
+            )
+        }
+
+        # Empty for databases from before coins were tracked, whose
+        # machines start from the float.
+        coins = dict(
+            self.connection.execute("SELECT denomination_cents, count FROM coins")
+        )
+
+        machine = VendingMachine(
+            items=items,
+            balance=Money.parse(balance),
+            purchases=SqlitePurchaseLog(self.connection),
+            load_sales=lambda: self._load_sales(items),
+            coins=coins or None,
+        )
+        machine.on_change = self._write_change
+        self._machine = machine
+
+        return machine
+
+    def _load_sales(self, items: Dict[str, Item]) -> SalesAggregates:
+        sales = SalesAggregates()
+        rows = self.connection.execute(
+            "SELECT kind, key, units, revenue_cents FROM sales"
+        ).fetchall()
+        for kind, key, units, revenue_cents in rows:
+            tally = Tally(units, Money(revenue_cents))
+            if kind == "total":
+                sales.total = tally
+            elif kind == "position":
+                sales.by_position[key] = tally
+            else:
+                sales.by_item[key] = tally
+
+        purchases = SqlitePurchaseLog(self.connection)
+        if not rows and len(purchases) > 0:
+            # The database predates the sales table, so it's filled in once.
+            sales = SalesAggregates.from_purchases(purchases, items)
+            self._write_sales(sales)
+            self.connection.commit()
+
+        return sales
+
+    def _write_tallies(self, rows) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO sales (kind, key, units, revenue_cents) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                (kind, key, tally.units, tally.revenue.cents)
+                for kind, key, tally in rows
+            ),
+        )
+
+    def _write_sales(self, sales: SalesAggregates) -> None:
+        self.connection.execute("DELETE FROM sales")
+        self._write_tallies(
+            [("total", "", sales.total)]
+            + [("position", key, tally) for key, tally in sales.by_position.items()]
+            + [("item", key, tally) for key, tally in sales.by_item.items()]
+        )
+
+    def _write_coins(self, coins: Coins) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO coins (denomination_cents, count) VALUES (?, ?)",
+            coins.items(),
+        )
+
+    def _write_change(
+        self, record: Dict[str, Any]
+    ) -> None:  # pylint: disable=protected-access
+        machine = self._machine
+
+        # Each slot bought from once, however many times it was bought.
+        positions = list(dict.fromkeys(purchased_positions(record)))
+        if positions:
+            items = [machine.items[position] for position in positions]
+            self.connection.executemany(
+                "UPDATE items SET remaining_stock = ? WHERE position = ?",
+                (
+                    (item.remaining_stock, position)
+                    for position, item in zip(positions, items)
+                ),
+            )
+            sales = machine.sales
+            self._write_tallies(
+                [("total", "", sales.total)]
+                + [
+                    ("position", position, sales.by_position[position])
+                    for position in positions
+                ]
+                + [
+                    ("item", name, sales.by_item[name])
+                    for name in dict.fromkeys(item.name for item in items)
+                ]
+            )
+
+        if record["op"] == "restock":
+            rows = []
+            for position in record["slots"]:
+                item = machine.items[position]
+                rows.append(
+                    (item.name, str(item.price), item.remaining_stock, position)
+                )
+            # Updated in place rather than replaced, which keeps the slots
+            # in the order they were created.
+            self.connection.executemany(
+                "UPDATE items SET name = ?, price = ?, remaining_stock = ? "
+                "WHERE position = ?",
+                rows,
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO items (name, price, remaining_stock, position) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+        if "coins" in record:
+            # Every denomination, as a database from before coins were
+            # tracked doesn't have rows for the float yet.
+            self._write_coins(machine.coins)
+
+        self.connection.execute(
+            "UPDATE machine SET balance = ? WHERE id = 1", (str(machine._balance),)
+        )
+        self.connection.commit()
+
+    def save(self, machine: VendingMachine) -> None:  # pylint: disable=protected-access
+        connection = self.connection
+        connection.execute(
+            "INSERT OR REPLACE INTO machine (id, balance) VALUES (1, ?)",
+            (str(machine._balance),),
+        )
+        connection.execute("DELETE FROM items")
+        connection.executemany(
+            "INSERT INTO items (position, name, price, remaining_stock) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                (position, item.name, str(item.price), item.remaining_stock)
+                for position, item in machine.items.items()
+            ),
+        )
+
+        self._write_sales(machine.sales)
+        connection.execute("DELETE FROM coins")
+        self._write_coins(machine.coins)
+
+        if not isinstance(machine.purchases, SqlitePurchaseLog):
+            connection.execute("DELETE FROM purchases")
+            connection.executemany(
+                "INSERT INTO purchases (position, price_cents, created_at, name) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        purchase.position,
+                        purchase.price.cents,
+                        purchase.timestamp,
+                        purchase.name,
+                    )
+                    for purchase in machine.purchases
+                ),
+            )
+
+        connection.commit()
+
+    def commit(self, machine: VendingMachine) -> None:
+        if machine is not self._machine:
+            self.save(machine)
+
+    def destroy(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -1,33 +1,49 @@
+import json
 import time
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, Tuple
 
-
-import vending_machine.ui.colors
-from vending_machine.utils import GLOBAL_LOGGER as logger
+# pylint: disable=import-outside-toplevel
+# The colors (colorama) and the logger (the logging setup) get imported
+# the first time something is printed, so commands that print nothing,
+# like --help, don't pay for them.
 
 USE_COLORS = True
-COLOR_FG_RED = vending_machine.ui.colors.COLORS["red"]
-COLOR_FG_GREEN = vending_machine.ui.colors.COLORS["green"]
-COLOR_FG_YELLOW = vending_machine.ui.colors.COLORS["yellow"]
-COLOR_RESET_ALL = vending_machine.ui.colors.COLORS["reset_all"]
 
-STATUSES = {"info": COLOR_FG_YELLOW, "success": COLOR_FG_GREEN, "error": COLOR_FG_RED}
+STATUSES = {"info": "yellow", "success": "green", "error": "red"}
+
+# How everything gets printed: "text" is colored, timestamped lines,
+# while "ndjson" prints a JSON object per line, and "json" does too but
+# prints listings as one array. Set by the CLI's --output option.
+OUTPUT_FORMATS = ("text", "json", "ndjson")
+OUTPUT = "text"
+
+# The second get_timestamp last formatted, and how it came out.
+_timestamp = (None, "")
 
 
 def get_timestamp():
     """
     Quick utility method to ensure consistently formatted timestamps
-    are able to be logged to the user.
+    are able to be logged to the user. Only formatted once a second,
+    however many lines get printed in it.
     :return:
     """
-    return time.strftime("%H:%M:%S")
+    global _timestamp  # pylint: disable=global-statement
+
+    second = int(time.time())
+    if second != _timestamp[0]:
+        _timestamp = (second, time.strftime("%H:%M:%S", time.localtime(second)))
+    return _timestamp[1]
 
 
 def color(text, color_code):
     """
     Colors a piece of text and returns to the default after
     """
+    from vending_machine.ui.colors import COLORS
 
-    return "{}{}{}".format(color_code, text, COLOR_RESET_ALL)
+    return "{}{}{}".format(color_code, text, COLORS["reset_all"])
 
 
 def fancy_print(status: str, message: str) -> None:
@@ -40,8 +56,13 @@ def fancy_print(status: str, message: str) -> None:
         raise ValueError(
             "Unknown status, need one of {} and got {}".format(STATUSES.keys(), status)
         )
+    if OUTPUT != "text":
+        print_record({"status": status, "message": message})
+        return
+
+    from vending_machine.ui.colors import COLORS
 
-    fancy_status = color(status.upper(), STATUSES[status])
+    fancy_status = color(status.upper(), COLORS[STATUSES[status]])
     msg = "{}: {}".format(fancy_status, message)
     formatted_print(msg)
 
@@ -52,5 +73,93 @@ def formatted_print(message: str) -> None:
     with a timestamp. Doesn't enforce a status or coloring
     of the actual message
     """
+    if OUTPUT != "text":
+        print_record({"status": "info", "message": message})
+        return
+
+    from vending_machine.utils import GLOBAL_LOGGER as logger
 
     logger.info("{} | {}".format(get_timestamp(), message))
+
+
+def formatted_print_many(messages: Iterable[str]) -> None:
+    """
+    Prints each message like formatted_print, but writes them out in
+    batches rather than one line at a time, for listings that can run
+    to thousands of lines.
+    """
+
+    if OUTPUT != "text":
+        _print_lines(
+            json.dumps({"status": "info", "message": message}) for message in messages
+        )
+    else:
+        _print_lines("{} | {}".format(get_timestamp(), message) for message in messages)
+
+
+def print_listing(
+    lines: Iterable[str], statuses: Iterable[Tuple[str, str]] = ()
+) -> None:
+    """
+    Prints a listing of lines like formatted_print_many, followed by
+    status messages like fancy_print's. The machine readable formats get
+    them all as one listing of records, shaped like fancy_print's.
+    """
+
+    if OUTPUT == "text":
+        formatted_print_many(lines)
+        for status, message in statuses:
+            fancy_print(status, message)
+        return
+
+    print_records(
+        {"status": status, "message": message}
+        for status, message in chain((("info", line) for line in lines), statuses)
+    )
+
+
+def print_record(record: Dict[str, Any]) -> None:
+    """
+    Prints a record as a line of JSON, for the machine readable formats.
+    """
+
+    _print_lines([json.dumps(record)])
+
+
+def print_records(records: Iterable[Dict[str, Any]]) -> None:
+    """
+    Prints a listing of records in the machine readable format, a line of
+    JSON each for ndjson, or one array with a record per line for json.
+    Records are written out as they come, never all held at once.
+    """
+
+    lines = (json.dumps(record) for record in records)
+    _print_lines(lines if OUTPUT == "ndjson" else _json_array(lines))
+
+
+def _json_array(lines: Iterator[str]) -> Iterator[str]:
+    yield "["
+    previous = next(lines, None)
+    for line in lines:
+        yield previous + ","
+        previous = line
+    if previous is not None:
+        yield previous
+    yield "]"
+
+
+def _print_lines(lines: Iterable[str]) -> None:
+    from vending_machine.utils import GLOBAL_LOGGER as logger
+    from vending_machine.utils.logger import INFO, buffered_output
+
+    if not logger.isEnabledFor(INFO):
+        return None
+
+    # Records are made directly, rather than through logger.info, which
+    # would look up the calling file and line for every one of them.
+    with buffered_output(logger):
+        for line in lines:
+            logger.handle(
+                logger.makeRecord(logger.name, INFO, __file__, 0, line, (), None)
+            )
+    return None
@@ -1,3 +1,14 @@
-from .money import to_money, add, subtract
+from .money import Money, to_money, add, subtract
 from .utils import position_from_coordinates, coordinates_from_position
-from .logger import GLOBAL_LOGGER
+
+
+def __getattr__(name: str):
+    # The logger sets up colorama and the logging handlers as it's
+    # imported, which commands that never print shouldn't pay for.
+    if name == "GLOBAL_LOGGER":
+        from .logger import GLOBAL_LOGGER  # pylint: disable=import-outside-toplevel
+
+        # Kept as a module attribute so this only runs the first time.
+        globals()["GLOBAL_LOGGER"] = GLOBAL_LOGGER
+        return GLOBAL_LOGGER
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,11 @@
+import atexit
 import logging
 import logging.handlers
+import queue
 import sys
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Iterator, List
 
 # Gotta make it pretty
 import colorama
@@ -40,11 +45,105 @@ if sys.platform == "win32" and not os.environ.get("TERM"):
 elif sys.platform == "win32":
     colorama_wrap = False
 
-stdout_handler = logging.StreamHandler(colorama_stdout)
+# Most lines buffered() holds on to before writing them out anyway.
+MAX_BUFFERED_LINES = 1000
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """
+    Stream handler that, inside buffered(), collects the formatted lines
+    and writes them out together, with one write and flush, instead of
+    one of each per record.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._buffer: List[str] = []
+        self._depth = 0
+
+    @contextmanager
+    def buffered(self) -> Iterator[None]:  # pylint: disable=missing-docstring
+        with self.lock:
+            self._depth += 1
+        try:
+            yield None
+        finally:
+            with self.lock:
+                self._depth -= 1
+                if not self._depth:
+                    self.flush()
+
+    def emit(self, record):
+        if not self._depth:
+            super().emit(record)
+            return
+
+        try:
+            self._buffer.append(self.format(record) + self.terminator)
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+        if len(self._buffer) >= MAX_BUFFERED_LINES:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self._buffer:
+                self.stream.write("".join(self._buffer))
+                self._buffer.clear()
+            super().flush()
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a thread that passes them on to handler, so logging
+    never waits on the terminal or a pipe. Whatever queued up while the
+    last lines were being written goes out together in one write.
+    """
+
+    def __init__(self, handler: BufferedStreamHandler):
+        super().__init__(queue.SimpleQueue())
+        self.handler = handler
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def prepare(self, record):
+        # Records stay in this process, so unlike QueueHandler there's no
+        # need to format and copy them to make them picklable.
+        return record
+
+    def _write_loop(self) -> None:
+        stopped = False
+        while not stopped:
+            records = [self.queue.get()]
+            try:
+                while True:
+                    records.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            with self.handler.buffered():
+                for record in records:
+                    if record is None:
+                        stopped = True
+                    else:
+                        self.handler.handle(record)
+
+    def close(self):
+        """
+        Writes out everything still queued, then stops the thread.
+        """
+
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+        super().close()
+
+
+stdout_handler = BufferedStreamHandler(colorama_stdout)
 stdout_handler.setFormatter(logging.Formatter("%(message)s"))
 stdout_handler.setLevel(NOTICE)
 
-stderr_handler = logging.StreamHandler(sys.stderr)
+stderr_handler = BufferedStreamHandler(sys.stderr)
 stderr_handler.setFormatter(logging.Formatter("%(message)s"))
 stderr_handler.setLevel(WARNING)
 
@@ -77,6 +176,32 @@ def log_to_stdout(logger):
     _swap_handler(logger, stderr_handler, stdout_handler)
 
 
+@contextmanager
+def buffered_output(logger) -> Iterator[None]:
+    """
+    Holds on to what the logger's handlers write until the block
+    finishes, then writes it out in one go.
+    """
+
+    with ExitStack() as stack:
+        for handler in logger.handlers:
+            if isinstance(handler, BufferedStreamHandler):
+                stack.enter_context(handler.buffered())
+        yield None
+
+
+def write_in_background(logger) -> BackgroundHandler:
+    """
+    Moves writing to stdout onto a background thread, which is stopped
+    (after writing out everything logged) when the process exits.
+    """
+
+    background = BackgroundHandler(stdout_handler)
+    _swap_handler(logger, stdout_handler, background)
+    atexit.register(background.close)
+    return background
+
+
 class ColorFilter(logging.Filter):
     def filter(self, record):
 
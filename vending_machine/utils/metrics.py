@@ -0,0 +1,333 @@
+"""
+Opt-in counters and latency histograms for the hot paths. Set
+VENDING_MACHINE_METRICS to a directory and after every command the CLI
+adds what it measured to a Prometheus text file there (metrics.prom,
+totals across commands, for node_exporter's textfile collector or
+anything else that scrapes that format) and appends a JSON summary of
+just that command to commands.ndjson.
+
+Left unset, nothing is measured at all: timed hands back the function
+it decorates untouched and timer is a shared do-nothing block.
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import vending_machine
+
+# Upper bounds (in seconds) of the latency histogram buckets, from a
+# tenth of a millisecond for in memory operations to seconds for saving
+# a long purchase history.
+BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+PREFIX = "vending_machine_"
+
+HELP = {
+    "operation_seconds": "Time taken by each instrumented operation.",
+    "operation_errors_total": "Instrumented operations that raised an error.",
+    "commands_total": "CLI commands run.",
+}
+
+PROMETHEUS_FILE = "metrics.prom"
+TOTALS_FILE = "metrics.json"
+SUMMARIES_FILE = "commands.ndjson"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    How many observations fell in each of the BUCKETS (plus one past the
+    last), along with their count, sum and largest value.
+    """
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:  # pylint: disable=missing-docstring
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Adds the observations of another histogram to this one.
+        """
+
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def to_json(self) -> Dict[str, Any]:  # pylint: disable=missing-docstring
+        return {
+            "counts": self.counts,
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_json(cls, dumped: Dict[str, Any]):  # pylint: disable=missing-docstring
+        histogram = cls()
+        histogram.counts = list(dumped["counts"])
+        histogram.count = dumped["count"]
+        histogram.sum = dumped["sum"]
+        histogram.max = dumped["max"]
+        return histogram
+
+
+class Registry:
+    """
+    Counters and histograms by metric name and labels.
+    """
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def count(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        Adds amount to a counter.
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Records a value in a histogram.
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, operation: str) -> Iterator[None]:
+        """
+        Times the block as the operation, counting an error if it raises.
+        """
+
+        started = time.perf_counter()
+        try:
+            yield None
+        except BaseException:
+            self.count("operation_errors_total", operation=operation)
+            raise
+        finally:
+            self.observe(
+                "operation_seconds", time.perf_counter() - started, operation=operation
+            )
+
+    def merge(self, other: "Registry") -> None:
+        """
+        Adds everything recorded in another registry to this one.
+        """
+
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, histogram in other.histograms.items():
+            self.histograms.setdefault(key, Histogram()).merge(histogram)
+
+    def to_json(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Every counter and histogram, with their names and labels.
+        """
+
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+            "histograms": [
+                {"name": name, "labels": dict(labels), **histogram.to_json()}
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, dumped: Dict[str, List[Dict[str, Any]]]):
+        """
+        Inverse of to_json.
+        """
+
+        registry = cls()
+        for counter in dumped["counters"]:
+            labels = tuple(sorted(counter["labels"].items()))
+            registry.counters[(counter["name"], labels)] = counter["value"]
+        for histogram in dumped["histograms"]:
+            labels = tuple(sorted(histogram["labels"].items()))
+            registry.histograms[(histogram["name"], labels)] = Histogram.from_json(
+                histogram
+            )
+        return registry
+
+    def to_prometheus(self) -> str:
+        """
+        Everything recorded in the Prometheus text exposition format.
+        """
+
+        lines: List[str] = []
+        described = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            describe(name, "counter")
+            lines.append(f"{PREFIX}{name}{format_labels(labels)} {value:g}")
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                bucket_labels = format_labels(labels + (("le", str(bound)),))
+                lines.append(f"{PREFIX}{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(
+                f"{PREFIX}{name}_count{format_labels(labels)} {histogram.count}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: Labels) -> str:
+    """
+    Labels the way Prometheus writes them, like {operation="deposit"}.
+    """
+
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+# Where measurements go, None when they're turned off.
+REGISTRY: Optional[Registry] = (
+    Registry() if vending_machine.METRICS_DIRECTORY else None
+)
+
+
+def instrument(function: Callable, operation: str, registry: Registry) -> Callable:
+    """
+    Wraps the function so every call is timed as the operation.
+    """
+
+    @wraps(function)
+    def timed_function(*args, **kwargs):
+        with registry.timer(operation):
+            return function(*args, **kwargs)
+
+    return timed_function
+
+
+def timed(operation: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing every call to the function as the operation, when
+    metrics are turned on. Otherwise the function is left as it is.
+    """
+
+    def decorate(function: Callable) -> Callable:
+        if REGISTRY is None:
+            return function
+        return instrument(function, operation, REGISTRY)
+
+    return decorate
+
+
+# What timer hands out when metrics are off, reusable any number of times.
+NOT_TIMED = nullcontext()
+
+
+def timer(operation: str):
+    """
+    Times the block as the operation, when metrics are turned on.
+    """
+
+    if REGISTRY is None:
+        return NOT_TIMED
+    return REGISTRY.timer(operation)
+
+
+def _write(path: str, text: str) -> None:
+    # Replaced in one go, so a scrape never sees half a file.
+    partial = path + ".partial"
+    with open(partial, "w") as file:
+        file.write(text)
+    os.replace(partial, path)
+
+
+def export(command: Optional[str], directory: str = None) -> None:
+    """
+    Adds what's been measured since the last export to the totals in the
+    metrics directory, rewriting the Prometheus file from them, and
+    appends a summary of it for the command. Then starts over, for
+    processes like the daemon that run one command after another.
+    """
+
+    if REGISTRY is None:
+        return None
+
+    # Only needed once there's something to write.
+    from vending_machine.storage.locking import (  # pylint: disable=import-outside-toplevel
+        file_lock,
+    )
+
+    directory = directory or vending_machine.METRICS_DIRECTORY
+    os.makedirs(directory, exist_ok=True)
+    if command is not None:
+        REGISTRY.count("commands_total", command=command)
+
+    with file_lock(os.path.join(directory, "metrics.lock")):
+        totals_path = os.path.join(directory, TOTALS_FILE)
+        try:
+            with open(totals_path) as file:
+                totals = Registry.from_json(json.load(file))
+        except (OSError, ValueError, KeyError):
+            totals = Registry()
+        totals.merge(REGISTRY)
+
+        _write(totals_path, json.dumps(totals.to_json()))
+        _write(os.path.join(directory, PROMETHEUS_FILE), totals.to_prometheus())
+        with open(os.path.join(directory, SUMMARIES_FILE), "a") as file:
+            summary = {"command": command, "timestamp": time.time()}
+            summary.update(REGISTRY.to_json())
+            file.write(json.dumps(summary) + "\n")
+
+    REGISTRY.counters.clear()
+    REGISTRY.histograms.clear()
+    return None
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from typing import Union
 
 
 """
@@ -48,3 +49,131 @@ def subtract(first: Decimal, second: Decimal, *args: Decimal) -> Decimal:
         money -= additional_amount
 
     return to_money(money)
+
+
+CENT = Decimal(".01")
+
+
+class Money:
+    """
+    An amount of money as a whole number of cents. Balances, prices and
+    sales totals are kept as Money so purchases only do integer math,
+    and Decimal only comes into play when amounts are read in from the
+    user or a file (rounded the same way to_money rounds) and written
+    back out.
+    """
+
+    __slots__ = ("cents", "_text")
+
+    def __init__(self, cents: int = 0):
+        self.cents = cents
+        self._text = None
+
+    @classmethod
+    def from_decimal(cls, dec: Decimal) -> "Money":
+        """
+        Rounds a decimal to the nearest cent, exactly like to_money.
+        """
+
+        return cls(int(dec.quantize(CENT).scaleb(2)))
+
+    @classmethod
+    def parse(cls, text: str) -> "Money":
+        """
+        Reads an amount written by str(). Anything else that Decimal
+        understands is rounded to the nearest cent.
+        """
+
+        whole, _, fraction = text.partition(".")
+        digits = whole[1:] if whole[:1] == "-" else whole
+        if len(fraction) == 2 and digits.isdigit() and fraction.isdigit():
+            cents = int(digits) * 100 + int(fraction)
+            return cls(-cents if digits is not whole else cents)
+
+        return cls.from_decimal(Decimal(text))
+
+    @classmethod
+    def of(cls, amount: Union["Money", Decimal, int, str]) -> "Money":
+        """
+        Converts anything used for an amount of dollars to Money, leaving
+        Money as is.
+        """
+
+        if isinstance(amount, cls):
+            return amount
+        if isinstance(amount, str):
+            return cls.parse(amount)
+        return cls.from_decimal(Decimal(amount))
+
+    def to_decimal(self) -> Decimal:
+        """
+        The amount as a Decimal with two decimal places.
+        """
+
+        return Decimal(self.cents).scaleb(-2)
+
+    def __str__(self) -> str:
+        if self._text is None:
+            cents = self.cents
+            if cents < 0:
+                self._text = "-%d.%02d" % divmod(-cents, 100)
+            else:
+                self._text = "%d.%02d" % divmod(cents, 100)
+        return self._text
+
+    def __repr__(self) -> str:
+        return "<Money({})>".format(self)
+
+    def __add__(self, other: "Money") -> "Money":
+        return Money(self.cents + other.cents)
+
+    def __radd__(self, other: int) -> "Money":
+        # Only so sum() can start from its default of 0.
+        if other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other: "Money") -> "Money":
+        return Money(self.cents - other.cents)
+
+    def __mul__(self, times: int) -> "Money":
+        return Money(self.cents * times)
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> "Money":
+        return Money(-self.cents)
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        if isinstance(other, (Decimal, int)):
+            return self.to_decimal() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # Equal to Decimal amounts, so has to hash like them too.
+        return hash(self.to_decimal())
+
+    def __lt__(self, other: "Money") -> bool:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents < other.cents
+
+    def __le__(self, other: "Money") -> bool:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents <= other.cents
+
+    def __gt__(self, other: "Money") -> bool:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents > other.cents
+
+    def __ge__(self, other: "Money") -> bool:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents >= other.cents